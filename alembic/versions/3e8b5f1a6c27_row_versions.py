@@ -0,0 +1,28 @@
+"""Row versions for employees and projects
+
+Revision ID: 3e8b5f1a6c27
+Revises: 7a4d2e9b3c18
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3e8b5f1a6c27'
+down_revision: Union[str, None] = '7a4d2e9b3c18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('employees', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('projects', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('projects', 'version')
+    op.drop_column('employees', 'version')
@@ -0,0 +1,32 @@
+"""Project stats summary
+
+Revision ID: 7a4d2e9b3c18
+Revises: 2d9e4b7c1f63
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a4d2e9b3c18'
+down_revision: Union[str, None] = '2d9e4b7c1f63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('project_stats',
+    sa.Column('root_project_id', sa.Integer(), nullable=False),
+    sa.Column('rank', sa.String(), nullable=False),
+    sa.Column('headcount', sa.Integer(), nullable=False),
+    sa.Column('refreshed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('root_project_id', 'rank')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('project_stats')
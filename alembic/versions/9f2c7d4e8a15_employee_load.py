@@ -0,0 +1,50 @@
+"""Employee load counters
+
+Revision ID: 9f2c7d4e8a15
+Revises: 3e8b5f1a6c27
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9f2c7d4e8a15'
+down_revision: Union[str, None] = '3e8b5f1a6c27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('employee_load',
+    sa.Column('employee_id', sa.Integer(), nullable=False),
+    sa.Column('root_project_id', sa.Integer(), nullable=False),
+    sa.Column('is_top_level', sa.Boolean(), nullable=False),
+    sa.Column('subproject_count', sa.Integer(), nullable=False),
+    sa.Column('assignment_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('employee_id', 'root_project_id')
+    )
+    # Начальное заполнение по существующим назначениям; дальше таблицу ведут сервисы
+    op.execute("""
+        INSERT INTO employee_load (employee_id, root_project_id, is_top_level, subproject_count, assignment_count)
+        WITH RECURSIVE roots (id, root_id) AS (
+            SELECT id, id FROM projects WHERE parent_id IS NULL
+            UNION ALL
+            SELECT child.id, roots.root_id FROM projects AS child JOIN roots ON child.parent_id = roots.id
+        )
+        SELECT a.employee_id, roots.root_id,
+               MAX(CASE WHEN p.parent_id IS NULL THEN 1 ELSE 0 END) = 1,
+               SUM(CASE WHEN p.parent_id = roots.root_id THEN 1 ELSE 0 END),
+               COUNT(*)
+        FROM employee_project_assignments AS a
+        JOIN projects AS p ON p.id = a.project_id
+        JOIN roots ON roots.id = a.project_id
+        GROUP BY a.employee_id, roots.root_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('employee_load')
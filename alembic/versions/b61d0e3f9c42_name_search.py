@@ -0,0 +1,53 @@
+"""Name search indexes
+
+Revision ID: b61d0e3f9c42
+Revises: 9f2c7d4e8a15
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b61d0e3f9c42'
+down_revision: Union[str, None] = '9f2c7d4e8a15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('employees', 'projects')
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for table in TABLES:
+            op.create_index(f'ix_{table}_name_trgm', table, ['name'], postgresql_using='gin',
+                            postgresql_ops={'name': 'gin_trgm_ops'})
+    elif dialect == 'sqlite':
+        for table in TABLES:
+            op.execute(f"CREATE VIRTUAL TABLE {table}_fts USING fts5("
+                       f"name, content='{table}', content_rowid='id', tokenize='trigram')")
+            op.execute(f"CREATE TRIGGER {table}_fts_insert AFTER INSERT ON {table} BEGIN "
+                       f"INSERT INTO {table}_fts (rowid, name) VALUES (new.id, new.name); END")
+            op.execute(f"CREATE TRIGGER {table}_fts_delete AFTER DELETE ON {table} BEGIN "
+                       f"INSERT INTO {table}_fts ({table}_fts, rowid, name) VALUES ('delete', old.id, old.name); END")
+            op.execute(f"CREATE TRIGGER {table}_fts_update AFTER UPDATE OF name ON {table} BEGIN "
+                       f"INSERT INTO {table}_fts ({table}_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+                       f"INSERT INTO {table}_fts (rowid, name) VALUES (new.id, new.name); END")
+            # Индекс по уже существующим строкам
+            op.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for table in TABLES:
+            op.drop_index(f'ix_{table}_name_trgm', table_name=table)
+    elif dialect == 'sqlite':
+        for table in TABLES:
+            for trigger in ('insert', 'delete', 'update'):
+                op.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{trigger}")
+            op.execute(f"DROP TABLE IF EXISTS {table}_fts")
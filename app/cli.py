@@ -0,0 +1,185 @@
+"""
+Командная строка сервиса:
+
+    python -m app serve --workers 4 --port 8000
+    python -m app import unit.ndjson
+    python -m app export-snapshot snapshot.ndjson.gz
+    python -m app restore-snapshot snapshot.ndjson.gz
+    python -m app audit
+    python -m app rebuild-employee-load
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import sys
+
+from app.settings import load_settings
+
+
+def serve(args):
+    import uvicorn
+
+    # Настройки проверяются до запуска воркеров: ошибка конфигурации видна сразу, а не в каждом процессе
+    load_settings()
+
+    uvicorn.run(
+        "app.main:create_app",
+        factory=True,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop="uvloop" if importlib.util.find_spec("uvloop") else "auto",
+        http="httptools" if importlib.util.find_spec("httptools") else "auto",
+        log_level=args.log_level,
+        access_log=args.access_log,
+        proxy_headers=True,
+    )
+
+
+def import_file(args):
+    from app.database import Database
+    from app.services.import_service import ImportService
+    from app.utils.streaming import PARSERS, iter_file_chunks, iter_lines
+
+    data_format = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+
+    async def run():
+        database = Database(load_settings(slow_query_log=False))
+        try:
+            async with database.session_factory() as db:
+                with open(args.path, "rb") as file:
+                    rows = PARSERS[data_format](iter_lines(iter_file_chunks(file)))
+                    return await ImportService(db, batch_size=args.batch_size).import_rows(rows)
+        finally:
+            await database.dispose()
+
+    summary = asyncio.run(run())
+    print(json.dumps(summary.model_dump(), ensure_ascii=False, indent=2))
+
+
+def export_snapshot(args):
+    from app.database import Database
+    from app.services.snapshot_service import SnapshotService
+
+    async def run():
+        database = Database(load_settings(slow_query_log=False))
+        try:
+            with open(args.path, "wb") as file:
+                async for chunk in SnapshotService(database, batch_size=args.batch_size).export(args.level):
+                    file.write(chunk)
+        finally:
+            await database.dispose()
+
+    asyncio.run(run())
+
+
+def restore_snapshot(args):
+    from app.database import Database
+    from app.services.snapshot_service import SnapshotService
+    from app.utils.streaming import iter_file_chunks
+
+    async def run():
+        database = Database(load_settings(slow_query_log=False))
+        try:
+            with open(args.path, "rb") as file:
+                return await SnapshotService(database, batch_size=args.batch_size).restore(iter_file_chunks(file))
+        finally:
+            await database.dispose()
+
+    print(json.dumps(asyncio.run(run()), indent=2))
+
+
+def audit(args):
+    from app.database import Database
+    from app.services.audit_service import AuditService
+
+    async def run():
+        database = Database(load_settings(slow_query_log=False))
+        try:
+            async with database.read_session_factory() as db:
+                return await AuditService(db).audit_rank_rules()
+        finally:
+            await database.dispose()
+
+    report = asyncio.run(run())
+    print(json.dumps(report.model_dump(), ensure_ascii=False, indent=2))
+    # Ненулевой код возврата позволяет запускать аудит по расписанию и реагировать на нарушения
+    if report.violations:
+        sys.exit(1)
+
+
+def rebuild_load(args):
+    from app.database import Database
+    from app.services.load_service import rebuild_employee_load
+
+    async def run():
+        database = Database(load_settings(slow_query_log=False))
+        try:
+            async with database.session_factory() as db:
+                rows = await rebuild_employee_load(db)
+                await db.commit()
+                return {"rows": rows}
+        finally:
+            await database.dispose()
+
+    print(json.dumps(asyncio.run(run()), indent=2))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app", description="Сервис учета сотрудников и проектов")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Запустить HTTP-сервер")
+    serve_parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    serve_parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    serve_parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+                              help="Количество процессов-воркеров (по умолчанию WEB_CONCURRENCY или число CPU)")
+    serve_parser.add_argument("--log-level", default="info")
+    serve_parser.add_argument("--access-log", action=argparse.BooleanOptionalAction, default=False)
+    serve_parser.set_defaults(handler=serve)
+
+    import_parser = commands.add_parser(
+        "import", help="Импортировать проекты, сотрудников и назначения из CSV/NDJSON",
+        description="Каждая строка содержит поле type: project (key, name, parent_key), "
+                    "employee (key, name, rank) или assignment (employee_key, project_key, ignore_conflicts). "
+                    "Разделы идут в этом порядке, родительский проект - раньше подпроектов; "
+                    "перечисление проектов по уровням дерева дает самые крупные пачки вставки.",
+    )
+    import_parser.add_argument("path")
+    import_parser.add_argument("--format", choices=["ndjson", "csv"],
+                               help="Формат файла (по умолчанию по расширению)")
+    import_parser.add_argument("--batch-size", type=int, default=1000)
+    import_parser.set_defaults(handler=import_file)
+
+    export_parser = commands.add_parser("export-snapshot", help="Выгрузить снимок таблиц в gzip NDJSON")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--batch-size", type=int, default=5000)
+    export_parser.add_argument("--level", type=int, default=6, choices=range(0, 10), metavar="0-9",
+                               help="Степень сжатия gzip")
+    export_parser.set_defaults(handler=export_snapshot)
+
+    restore_parser = commands.add_parser(
+        "restore-snapshot", help="Заменить содержимое таблиц снимком (одной транзакцией)"
+    )
+    restore_parser.add_argument("path")
+    restore_parser.add_argument("--batch-size", type=int, default=5000)
+    restore_parser.set_defaults(handler=restore_snapshot)
+
+    audit_parser = commands.add_parser(
+        "audit", help="Проверить все назначения на соответствие правилам рангов (код 1 при нарушениях)"
+    )
+    audit_parser.set_defaults(handler=audit)
+
+    rebuild_parser = commands.add_parser(
+        "rebuild-employee-load", help="Пересчитать счетчики employee_load по назначениям (одной транзакцией)"
+    )
+    rebuild_parser.set_defaults(handler=rebuild_load)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.handler(args)
@@ -1,22 +1,222 @@
-import os
-from os import getenv
+import asyncio
+import functools
+import inspect
+from contextvars import ContextVar
+from typing import Optional
 
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from fastapi import Request
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
 from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
-load_dotenv()
-SQLALCHEMY_DATABASE_URL = os.getenv('DATABASE_URL')
+from app import queries
+from app.settings import Settings
+from app.utils.read_your_writes import wrote_recently
+from app.utils.slow_query import SlowQueryLogger
 
-engine = create_async_engine(SQLALCHEMY_DATABASE_URL, echo=True)
 
-AsyncSessionLocal = sessionmaker(
-    bind=engine,
-    class_=AsyncSession,
-    expire_on_commit=False
-)
+def build_engine(database_url: str, settings: Settings) -> AsyncEngine:
+    """
+    Создает движок с параметрами пула, кэша выражений и PRAGMA SQLite из настроек.
+    """
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    kwargs = {
+        "echo": settings.db_echo,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "pool_recycle": settings.db_pool_recycle,
+    }
 
+    pool_class = url.get_dialect().get_pool_class(url)
+    if backend == "sqlite" and url.database not in (None, "", ":memory:"):
+        # Для файловой SQLite диалект по умолчанию не держит соединения; пул избавляет
+        # от повторного открытия файла и PRAGMA на каждом запросе
+        pool_class = AsyncAdaptedQueuePool
+        kwargs["poolclass"] = pool_class
+    if issubclass(pool_class, QueuePool):
+        kwargs.update(
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+        )
 
-async def get_db():
-    async with AsyncSessionLocal() as session:
+    if url.get_driver_name() == "asyncpg":
+        kwargs["connect_args"] = {"prepared_statement_cache_size": settings.db_statement_cache_size}
+
+    engine = create_async_engine(url, **kwargs)
+
+    if backend == "sqlite":
+        @event.listens_for(engine.sync_engine, "connect")
+        def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+            cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+            cursor.execute(f"PRAGMA cache_size={settings.sqlite_cache_size}")
+            cursor.close()
+
+    # Запросы дольше порога попадают в лог вместе с параметрами, маршрутом и планом выполнения
+    if settings.slow_query_log:
+        SlowQueryLogger(
+            threshold_ms=settings.slow_query_threshold_ms,
+            redact_params=settings.slow_query_redact_params,
+            explain=settings.slow_query_explain,
+        ).install(engine)
+
+    return engine
+
+
+class Database:
+    """
+    Движки и фабрики сессий одного процесса. Создается при старте приложения
+    (lifespan) и освобождается при его остановке, а не при импорте модуля.
+    """
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.engine = build_engine(settings.database_url, settings)
+        self.session_factory = sessionmaker(
+            bind=self.engine,
+            class_=AsyncSession,
+            expire_on_commit=False
+        )
+
+        # Без реплики чтение идет через основной движок
+        self.replica_engine = None
+        self.read_session_factory = self.session_factory
+        if settings.database_replica_url:
+            self.replica_engine = build_engine(settings.database_replica_url, settings)
+            self.read_session_factory = sessionmaker(
+                bind=self.replica_engine,
+                class_=AsyncSession,
+                expire_on_commit=False
+            )
+
+    @property
+    def engines(self):
+        return [engine for engine in (self.engine, self.replica_engine) if engine is not None]
+
+    async def warm_up(self):
+        """
+        Заранее открывает соединения пула и прогоняет горячие запросы, чтобы первые
+        запросы клиентов не платили за установку соединений и компиляцию SQL.
+        """
+        async def touch(session_factory):
+            async with session_factory() as session:
+                for statement in queries.warm_up_statements():
+                    await session.execute(statement)
+
+        for session_factory, engine in ((self.session_factory, self.engine),
+                                        (self.read_session_factory, self.replica_engine)):
+            if engine is None:
+                continue
+            connections = self.settings.db_pool_size if isinstance(engine.pool, QueuePool) else 1
+            await asyncio.gather(*(touch(session_factory) for _ in range(connections)))
+
+    async def dispose(self):
+        for engine in self.engines:
+            await engine.dispose()
+
+
+def get_database(request: Request) -> Database:
+    return request.app.state.database
+
+
+# Сессии, выданные в рамках текущего запроса: маршрут освобождает их сразу после обработчика
+_request_sessions: ContextVar[Optional[list]] = ContextVar("request_sessions", default=None)
+
+
+class LazySession:
+    """
+    Прокси AsyncSession: сессия создается при первом обращении, а соединение из пула
+    берется только при первом запросе к базе. release() возвращает соединение в пул,
+    не дожидаясь конца запроса; при повторном обращении сессия будет открыта заново.
+    """
+
+    def __init__(self, session_factory):
+        self._session_factory = session_factory
+        self._session = None
+
+    @property
+    def session(self) -> AsyncSession:
+        if self._session is None:
+            self._session = self._session_factory()
+        return self._session
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    async def release(self):
+        if self._session is not None:
+            session, self._session = self._session, None
+            await session.close()
+
+
+def _lazy_session(session_factory) -> LazySession:
+    session = LazySession(session_factory)
+    sessions = _request_sessions.get()
+    if sessions is not None:
+        sessions.append(session)
+    return session
+
+
+async def get_db(request: Request):
+    session = _lazy_session(get_database(request).session_factory)
+    try:
+        yield session
+    finally:
+        await session.release()
+
+
+async def get_read_db(request: Request):
+    """
+    Сессия только для чтения: реплика, если она настроена и клиент недавно ничего не записывал.
+    Записи и проверки правил назначения всегда используют get_db и основную базу.
+    """
+    database = get_database(request)
+    session_factory = database.read_session_factory
+    if wrote_recently(request, database.settings.read_your_writes_seconds):
+        session_factory = database.session_factory
+    session = _lazy_session(session_factory)
+    try:
         yield session
+    finally:
+        await session.release()
+
+
+def _release_sessions_after(endpoint):
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            for session in _request_sessions.get() or ():
+                await session.release()
+
+    return wrapper
+
+
+class SessionScopedRoute(APIRoute):
+    """
+    Маршрут, который возвращает соединения в пул сразу после работы обработчика,
+    а не после сериализации ответа и закрытия зависимостей.
+    """
+
+    def __init__(self, path, endpoint, **kwargs):
+        if inspect.iscoroutinefunction(endpoint):
+            endpoint = _release_sessions_after(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def scoped_handler(request):
+            token = _request_sessions.set([])
+            try:
+                return await handler(request)
+            finally:
+                _request_sessions.reset(token)
+
+        return scoped_handler
@@ -1,27 +1,45 @@
-from fastapi import Depends, APIRouter
+from fastapi import Depends, APIRouter, Query, Response
 
+from app.database import SessionScopedRoute
 from app.schemas.assignment import EmployeeProjectAssignmentCreate, EmployeeProjectAssignmentDelete, \
-    EmployeeProjectAssignmentByRank
+    EmployeeProjectAssignmentByRank, AssignmentChanges
 from app.services.assignment_service import AssignmentService
+from app.services.job_service import JobService
+from app.utils.admission import admission
+from app.utils.compression import compressible
 
-router = APIRouter()
+router = APIRouter(route_class=SessionScopedRoute)
 
 
-@router.post("/add-employee-to-project")
+@router.post("/add-employee-to-project", dependencies=[Depends(admission("interactive"))])
 async def add_employee_to_project(data: EmployeeProjectAssignmentCreate,
                                   service=Depends(AssignmentService.get_dependency)):
     return await service.add_employee_to_project(data)
 
 
-@router.delete("/delete-employee-to-project")
+@router.delete("/delete-employee-to-project", dependencies=[Depends(admission("interactive"))])
 async def remove_employee_from_project(data: EmployeeProjectAssignmentDelete,
                                        service=Depends(AssignmentService.get_dependency)):
     return await service.remove_employee_from_project(data)
 
 
-@router.post("/assign-employees-by-rank/")
+@router.post("/assign-employees-by-rank/", dependencies=[Depends(admission("batch"))])
 async def assign_employees_by_rank(
         assignment_data: EmployeeProjectAssignmentByRank,
+        response: Response,
+        run_async: bool = Query(False, alias="async"),
         service=Depends(AssignmentService.get_dependency),
+        jobs=Depends(JobService.get_dependency),
 ):
+    if run_async:
+        # Назначение выполняется фоновым заданием, прогресс доступен по GET /api/jobs/{job_id}
+        response.status_code = 202
+        return await jobs.start_assign_by_rank_job(assignment_data)
     return await service.assign_employees_by_rank(assignment_data)
+
+
+@router.get("/assignments/changes", response_model=AssignmentChanges,
+            dependencies=[Depends(admission("list")), Depends(compressible)])
+async def get_assignment_changes(since: int = Query(0, ge=0), limit: int = Query(1000, ge=1, le=10000),
+                                 service=Depends(AssignmentService.get_read_dependency)):
+    return await service.get_changes(since, limit)
@@ -0,0 +1,15 @@
+from fastapi import Depends, APIRouter
+
+from app.database import SessionScopedRoute
+from app.schemas.audit import RankAudit
+from app.services.audit_service import AuditService
+from app.utils.admission import admission
+from app.utils.compression import compressible
+
+router = APIRouter(route_class=SessionScopedRoute)
+
+
+@router.get("/audit/rank-rules", response_model=RankAudit,
+            dependencies=[Depends(admission("batch")), Depends(compressible)])
+async def audit_rank_rules(service=Depends(AuditService.get_read_dependency)):
+    return await service.audit_rank_rules()
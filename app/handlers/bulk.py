@@ -0,0 +1,40 @@
+from typing import Literal
+
+from fastapi import Depends, APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+from app.database import SessionScopedRoute
+from app.schemas.import_export import ImportSummary
+from app.services.import_service import ImportService
+from app.services.snapshot_service import SnapshotService
+from app.utils.admission import admission, streaming_admission
+from app.utils.streaming import PARSERS, iter_lines
+
+router = APIRouter(route_class=SessionScopedRoute)
+
+
+@router.post("/import", response_model=ImportSummary, dependencies=[Depends(admission("batch"))])
+async def import_data(request: Request, data_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+                      service=Depends(ImportService.get_dependency)):
+    """
+    Импорт из тела запроса (NDJSON или CSV с колонкой type): сначала проекты, затем сотрудники и назначения.
+    Тело читается потоком, без загрузки файла целиком.
+    """
+    return await service.import_rows(PARSERS[data_format](iter_lines(request.stream())))
+
+
+@router.get("/snapshot")
+async def export_snapshot(slot=Depends(streaming_admission("batch")), service=Depends(SnapshotService.get_dependency)):
+    """
+    Снимок проектов, сотрудников и назначений: gzip-поток NDJSON, по секции на таблицу.
+    Восстанавливается командой python -m app restore-snapshot.
+    Слот пакетной группы занят, пока отдается тело.
+    """
+    return StreamingResponse(
+        slot.wrap(service.export()),
+        media_type="application/gzip",
+        headers={"Content-Disposition": 'attachment; filename="snapshot.ndjson.gz"'},
+        # Если тело так и не начали читать (клиент отключился сразу), слот освобождается здесь
+        background=BackgroundTask(slot.release),
+    )
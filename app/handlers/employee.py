@@ -1,34 +1,59 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import Depends, APIRouter
+from fastapi import Depends, APIRouter, Query, Header, Response
 
-from ..schemas.employee import EmployeeCreate, EmployeeOut
+from ..database import SessionScopedRoute
+from ..schemas.employee import EmployeeCreate, EmployeeOut, AssignableProjects, EmployeeSearchPage
 from ..services.employee_service import EmployeeService
+from ..services.search_service import SearchService
+from ..utils.admission import admission
+from ..utils.compression import compressible
+from ..utils.etag import etag, parse_if_match
 
-router = APIRouter()
+router = APIRouter(route_class=SessionScopedRoute)
 
 
-@router.post("/employees/", response_model=EmployeeOut)
+@router.post("/employees/", response_model=EmployeeOut, dependencies=[Depends(admission("interactive"))])
 async def create_employee(employee: EmployeeCreate, service=Depends(EmployeeService.get_dependency)):
     return await service.create_employee(employee)
 
 
-@router.get("/employees/", response_model=List[EmployeeOut])
-async def get_employees(service=Depends(EmployeeService.get_dependency)):
+@router.get("/employees/", response_model=List[EmployeeOut],
+            dependencies=[Depends(admission("list")), Depends(compressible)])
+async def get_employees(service=Depends(EmployeeService.get_read_dependency)):
     return await service.get_employees()
 
 
-@router.get("/employees/{employee_id}", response_model=EmployeeOut)
-async def get_employee(employee_id: int, service=Depends(EmployeeService.get_dependency)):
-    return await service.get_employee(employee_id)
+# Объявлен раньше /employees/{employee_id}, иначе "search" будет разобран как идентификатор
+@router.get("/employees/search", response_model=EmployeeSearchPage, dependencies=[Depends(admission("interactive"))])
+async def search_employees(q: str = Query(..., min_length=1, max_length=200), limit: int = Query(20, ge=1, le=100),
+                           offset: int = Query(0, ge=0), service=Depends(SearchService.get_read_dependency)):
+    return await service.search_employees(q, limit, offset)
 
 
-@router.put("/employees/{employee_id}", response_model=EmployeeOut)
-async def update_employee(employee_id: int, updated_employee: EmployeeCreate,
+@router.get("/employees/{employee_id}", response_model=EmployeeOut, dependencies=[Depends(admission("interactive"))])
+async def get_employee(employee_id: int, response: Response, service=Depends(EmployeeService.get_read_dependency)):
+    employee, version = await service.get_employee(employee_id)
+    response.headers["ETag"] = etag(version)
+    return employee
+
+
+@router.put("/employees/{employee_id}", response_model=EmployeeOut, dependencies=[Depends(admission("interactive"))])
+async def update_employee(employee_id: int, updated_employee: EmployeeCreate, response: Response,
+                          if_match: Optional[str] = Header(None),
                           service=Depends(EmployeeService.get_dependency)):
-    return await service.update_employee(employee_id, updated_employee)
+    employee, version = await service.update_employee(employee_id, updated_employee, parse_if_match(if_match))
+    response.headers["ETag"] = etag(version)
+    return employee
 
 
-@router.delete("/employees/{employee_id}")
+@router.delete("/employees/{employee_id}", dependencies=[Depends(admission("interactive"))])
 async def delete_employee(employee_id: int, service=Depends(EmployeeService.get_dependency)):
     return await service.delete_employee(employee_id)
+
+
+@router.get("/employees/{employee_id}/assignable-projects", response_model=AssignableProjects,
+            dependencies=[Depends(admission("list")), Depends(compressible)])
+async def get_assignable_projects(employee_id: int, include_rejected: bool = Query(False),
+                                  service=Depends(EmployeeService.get_read_dependency)):
+    return await service.get_assignable_projects(employee_id, include_rejected)
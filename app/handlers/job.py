@@ -0,0 +1,13 @@
+from fastapi import Depends, APIRouter
+
+from app.database import SessionScopedRoute
+from app.schemas.job import JobOut
+from app.services.job_service import JobService
+from app.utils.admission import admission
+
+router = APIRouter(route_class=SessionScopedRoute)
+
+
+@router.get("/jobs/{job_id}", response_model=JobOut, dependencies=[Depends(admission("interactive"))])
+async def get_job(job_id: int, service=Depends(JobService.get_dependency)):
+    return await service.get_job(job_id)
@@ -0,0 +1,14 @@
+from fastapi import Depends, APIRouter
+
+from app.database import SessionScopedRoute
+from app.schemas.policy import PolicySimulationRequest, PolicySimulationResult
+from app.services.policy_service import PolicyService
+from app.utils.admission import admission
+
+router = APIRouter(route_class=SessionScopedRoute)
+
+
+@router.post("/rank-policy/simulate", response_model=PolicySimulationResult,
+             dependencies=[Depends(admission("batch"))])
+async def simulate_rank_policy(request: PolicySimulationRequest, service=Depends(PolicyService.get_read_dependency)):
+    return await service.simulate(request)
@@ -1,31 +1,78 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import Depends, HTTPException, APIRouter
+from fastapi import Depends, HTTPException, APIRouter, Query, Header, Response
 
-from ..schemas.project import ProjectOut, ProjectCreate
+from ..database import SessionScopedRoute
+from ..schemas.assignment import AutoStaffRequest, AutoStaffResult
+from ..schemas.project import ProjectOut, ProjectCreate, ProjectStats, ForestStats, ProjectMove, ProjectMoveResult, \
+    ProjectSearchPage
+from ..services.assignment_service import AssignmentService
 from ..services.project_service import ProjectService
+from ..services.search_service import SearchService
+from ..services.stats_service import StatsService
+from ..utils.admission import admission
+from ..utils.compression import compressible
+from ..utils.etag import etag, parse_if_match
 
-router = APIRouter()
+router = APIRouter(route_class=SessionScopedRoute)
 
 
-@router.get("/projects/", response_model=List[ProjectOut])
-async def get_all_projects(service=Depends(ProjectService.get_dependency)):
+@router.get("/projects/", response_model=List[ProjectOut],
+            dependencies=[Depends(admission("list")), Depends(compressible)])
+async def get_all_projects(service=Depends(ProjectService.get_read_dependency)):
     try:
         return await service.get_all_projects()
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 
-@router.post("/projects/", response_model=ProjectOut)
+@router.post("/projects/", response_model=ProjectOut, dependencies=[Depends(admission("interactive"))])
 async def create_project(project: ProjectCreate, service=Depends(ProjectService.get_dependency)):
     return await service.create_project(project)
 
 
-@router.get("/projects/{project_id}", response_model=ProjectOut)
-async def get_project(project_id: int, service=Depends(ProjectService.get_dependency)):
-    return await service.get_project(project_id)
+# Объявлены раньше /projects/{project_id}, иначе "stats" и "search" будут разобраны как идентификатор
+@router.get("/projects/search", response_model=ProjectSearchPage, dependencies=[Depends(admission("interactive"))])
+async def search_projects(q: str = Query(..., min_length=1, max_length=200), limit: int = Query(20, ge=1, le=100),
+                          offset: int = Query(0, ge=0), service=Depends(SearchService.get_read_dependency)):
+    return await service.search_projects(q, limit, offset)
 
 
-@router.delete("/projects/{project_id}")
+@router.get("/projects/stats", response_model=ForestStats,
+            dependencies=[Depends(admission("list")), Depends(compressible)])
+async def get_forest_stats(live: bool = Query(False), service=Depends(StatsService.get_read_dependency)):
+    return await service.get_forest_stats(live)
+
+
+@router.get("/projects/{project_id}/stats", response_model=ProjectStats,
+            dependencies=[Depends(admission("interactive"))])
+async def get_project_stats(project_id: int, service=Depends(StatsService.get_read_dependency)):
+    return await service.get_project_stats(project_id)
+
+
+@router.get("/projects/{project_id}", response_model=ProjectOut, dependencies=[Depends(admission("interactive"))])
+async def get_project(project_id: int, response: Response, service=Depends(ProjectService.get_read_dependency)):
+    project, version = await service.get_project(project_id)
+    response.headers["ETag"] = etag(version)
+    return project
+
+
+@router.patch("/projects/{project_id}", response_model=ProjectMoveResult,
+              dependencies=[Depends(admission("interactive"))])
+async def move_project(project_id: int, move: ProjectMove, response: Response,
+                       if_match: Optional[str] = Header(None), service=Depends(ProjectService.get_dependency)):
+    result, version = await service.move_project(project_id, move, parse_if_match(if_match))
+    response.headers["ETag"] = etag(version)
+    return result
+
+
+@router.delete("/projects/{project_id}", dependencies=[Depends(admission("interactive"))])
 async def delete_project(project_id: int, service=Depends(ProjectService.get_dependency)):
     return await service.delete_project(project_id)
+
+
+@router.post("/projects/{project_id}/auto-staff", response_model=AutoStaffResult,
+             dependencies=[Depends(admission("batch"))])
+async def auto_staff_project(project_id: int, request: AutoStaffRequest,
+                             service=Depends(AssignmentService.get_dependency)):
+    return await service.auto_staff(project_id, request)
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from app.database import SessionScopedRoute
+from app.services.change_stream import sse_frames
+
+router = APIRouter(route_class=SessionScopedRoute)
+
+
+@router.get("/stream")
+async def stream_changes(request: Request):
+    """
+    Server-Sent Events: изменения назначений (event: assignment) и дерева проектов (event: project).
+    Долгое соединение не занимает слот ограничения нагрузки и соединение с базой: журналы
+    опрашивает один фоновый читатель процесса, число клиентов ограничено STREAM_MAX_CLIENTS.
+    """
+    stream = getattr(request.app.state, "change_stream", None)
+    if stream is None:
+        raise HTTPException(status_code=503, detail="Change stream is not available")
+
+    subscription, cursors = await stream.subscribe()
+    if subscription is None:
+        raise HTTPException(status_code=503, detail="Too many stream clients",
+                            headers={"Retry-After": str(request.app.state.settings.admission_retry_after_seconds)})
+
+    heartbeat = request.app.state.settings.stream_heartbeat_seconds
+    return StreamingResponse(
+        sse_frames(stream, subscription, cursors, heartbeat),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,15 +1,89 @@
+from contextlib import asynccontextmanager
+from typing import Optional
+
 from fastapi import FastAPI
 from starlette.responses import RedirectResponse
 
-from app.handlers import project, employee, assignment
+from app.database import Database
+from app.handlers import project, employee, assignment, job, bulk, stream, audit, policy
+from app.services.change_stream import ChangeStream
+from app.services.job_service import JobRunner
+from app.services.stats_service import ProjectStatsRefresher
+from app.settings import Settings, load_settings
+from app.utils.admission import AdmissionController
+from app.utils.compression import CompressionMiddleware
+from app.utils.hierarchy import HierarchyIndex, HierarchyReconciler
+from app.utils.read_your_writes import ReadYourWritesMiddleware
+from app.utils.slow_query import RequestContextMiddleware
+
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """
+    Создает приложение. Движки базы создаются при старте (lifespan) и закрываются при остановке,
+    поэтому каждый процесс-воркер настраивается и подключается самостоятельно.
+    Если настройки не переданы, они читаются из окружения в момент старта.
+    """
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        app.state.settings = settings or load_settings()
+        app.state.database = Database(app.state.settings)
+        if app.state.settings.admission_enabled:
+            app.state.admission = AdmissionController.from_settings(app.state.settings)
+        app.state.hierarchy = HierarchyIndex() if app.state.settings.hierarchy_index_enabled else None
+        app.state.hierarchy_reconciler = None
+        if app.state.hierarchy is not None and app.state.settings.hierarchy_reconcile_seconds:
+            app.state.hierarchy_reconciler = HierarchyReconciler(app.state.database.session_factory,
+                                                                 app.state.hierarchy,
+                                                                 app.state.settings.hierarchy_reconcile_seconds)
+        app.state.job_runner = JobRunner.from_settings(app.state.database.session_factory, app.state.settings)
+        app.state.change_stream = ChangeStream.from_settings(app.state.database.session_factory, app.state.settings)
+        app.state.stats_refresher = None
+        if app.state.settings.project_stats_refresh_seconds:
+            app.state.stats_refresher = ProjectStatsRefresher(app.state.database.session_factory,
+                                                              app.state.settings.project_stats_refresh_seconds)
+        try:
+            if app.state.settings.db_warm_up:
+                await app.state.database.warm_up()
+            if app.state.hierarchy is not None:
+                await app.state.hierarchy.load(app.state.database.session_factory)
+            if app.state.hierarchy_reconciler:
+                app.state.hierarchy_reconciler.start()
+            app.state.job_runner.start()
+            app.state.change_stream.start()
+            if app.state.stats_refresher:
+                app.state.stats_refresher.start()
+            yield
+        finally:
+            if app.state.hierarchy_reconciler:
+                await app.state.hierarchy_reconciler.stop()
+            if app.state.stats_refresher:
+                await app.state.stats_refresher.stop()
+            await app.state.change_stream.stop()
+            await app.state.job_runner.stop()
+            await app.state.database.dispose()
+
+    app = FastAPI(lifespan=lifespan)
+    app.state.settings = settings
+
+    app.add_middleware(RequestContextMiddleware)
+    app.add_middleware(ReadYourWritesMiddleware)
+    app.add_middleware(CompressionMiddleware)
+
+    app.include_router(project.router, prefix="/api", tags=["Projects"])
+    app.include_router(employee.router, prefix="/api", tags=["Employee"])
+    app.include_router(assignment.router, prefix="/api", tags=["Assignment"])
+    app.include_router(job.router, prefix="/api", tags=["Jobs"])
+    app.include_router(bulk.router, prefix="/api", tags=["Bulk"])
+    app.include_router(stream.router, prefix="/api", tags=["Stream"])
+    app.include_router(audit.router, prefix="/api", tags=["Audit"])
+    app.include_router(policy.router, prefix="/api", tags=["Rank policy"])
 
-app = FastAPI()
+    @app.get("/", include_in_schema=False)
+    def redirect_to_docs():
+        return RedirectResponse(url="/docs")
 
-app.include_router(project.router, prefix="/api", tags=["Projects"])
-app.include_router(employee.router, prefix="/api", tags=["Employee"])
-app.include_router(assignment.router, prefix="/api", tags=["Assignment"])
+    return app
 
 
-@app.get("/", include_in_schema=False)
-def redirect_to_docs():
-    return RedirectResponse(url="/docs")
+app = create_app()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, DateTime, JSON, Text, DDL, Index, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, backref
 
@@ -11,8 +11,10 @@ class EmployeeORM(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String)
     rank = Column(String)
+    # Версия строки для оптимистичной блокировки: растет на каждом изменении, отдается как ETag
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
-    projects = relationship("EmployeeProjectAssignmentORM", back_populates="employee")
+    projects = relationship("EmployeeProjectAssignmentORM", back_populates="employee", cascade="all, delete-orphan")
 
     def __repr__(self):
         return f"EmployeeORM(id={self.id}, name={self.name}, rank={self.rank})"
@@ -24,6 +26,7 @@ class ProjectORM(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String)
     parent_id = Column(Integer, ForeignKey('projects.id', ondelete="CASCADE"), nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     parent = relationship(
         'ProjectORM',
@@ -54,3 +57,125 @@ class EmployeeProjectAssignmentORM(Base):
 
     def __repr__(self):
         return f"EmployeeProjectAssignmentORM(employee_id={self.employee_id}, project_id={self.project_id})"
+
+
+class AssignmentJobORM(Base):
+    __tablename__ = 'assignment_jobs'
+
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, nullable=False)
+    rank = Column(String, nullable=False)
+    ignore_conflicts = Column(Boolean, nullable=False, default=False)
+    # queued -> running -> done | failed | interrupted
+    status = Column(String, nullable=False, default="queued")
+    total = Column(Integer, nullable=False, default=0)
+    processed = Column(Integer, nullable=False, default=0)
+    assigned = Column(Integer, nullable=False, default=0)
+    skipped_employees = Column(JSON, nullable=False, default=list)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"AssignmentJobORM(id={self.id}, status={self.status}, processed={self.processed}/{self.total})"
+
+
+class AssignmentEventORM(Base):
+    """
+    Журнал изменений назначений, только добавление. id служит курсором ленты изменений:
+    запись событий идет под lock_event_log, поэтому id выдаются в порядке коммитов.
+    Внешних ключей нет: события переживают удаление сотрудника или проекта.
+    """
+    __tablename__ = 'assignment_events'
+
+    id = Column(Integer, primary_key=True)
+    employee_id = Column(Integer, nullable=False)
+    project_id = Column(Integer, nullable=False)
+    # assigned | removed
+    action = Column(String, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return (f"AssignmentEventORM(id={self.id}, action={self.action}, employee_id={self.employee_id}, "
+                f"project_id={self.project_id})")
+
+
+class ProjectEventORM(Base):
+    """
+    Журнал изменений дерева проектов, только добавление. Удаление проекта - одно событие,
+    подпроекты удаляются вместе с ним.
+    """
+    __tablename__ = 'project_events'
+
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, nullable=False)
+    parent_id = Column(Integer, nullable=True)
+    # created | deleted | moved (parent_id - новый родитель) | restored (дерево заменено снимком, project_id = 0)
+    action = Column(String, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"ProjectEventORM(id={self.id}, action={self.action}, project_id={self.project_id})"
+
+
+class ProjectStatsORM(Base):
+    """
+    Периодически пересчитываемая сводка: число разных сотрудников каждого ранга в дереве верхнеуровневого проекта.
+    """
+    __tablename__ = 'project_stats'
+
+    root_project_id = Column(Integer, primary_key=True)
+    rank = Column(String, primary_key=True)
+    headcount = Column(Integer, nullable=False)
+    refreshed_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"ProjectStatsORM(root_project_id={self.root_project_id}, rank={self.rank}, headcount={self.headcount})"
+
+
+class EmployeeLoadORM(Base):
+    """
+    Денормализованные счетчики назначений сотрудника по деревьям проектов, обновляются в той же
+    транзакции, что и назначения: участвует ли он в самом верхнеуровневом проекте, в скольких
+    прямых подпроектах и сколько у него назначений в дереве всего. Правила рангов проверяются по ним
+    одним чтением по первичному ключу.
+    """
+    __tablename__ = 'employee_load'
+
+    employee_id = Column(Integer, primary_key=True)
+    root_project_id = Column(Integer, primary_key=True)
+    is_top_level = Column(Boolean, nullable=False, default=False)
+    subproject_count = Column(Integer, nullable=False, default=0)
+    assignment_count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return (f"EmployeeLoadORM(employee_id={self.employee_id}, root_project_id={self.root_project_id}, "
+                f"is_top_level={self.is_top_level}, subproject_count={self.subproject_count})")
+
+
+# Поиск по имени. В PostgreSQL - GIN-индексы pg_trgm по колонке name, их ведет сама база.
+# В SQLite - внешние FTS5-таблицы с токенизатором trigram, синхронизируемые триггерами
+# на любые изменения строк, в том числе пакетные вставки импорта и восстановления снимка.
+SEARCHABLE_TABLES = (EmployeeORM.__table__, ProjectORM.__table__)
+
+event.listen(Base.metadata, "before_create",
+             DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"))
+
+for _table in SEARCHABLE_TABLES:
+    Index(f"ix_{_table.name}_name_trgm", _table.c.name, postgresql_using="gin",
+          postgresql_ops={"name": "gin_trgm_ops"}).ddl_if(dialect="postgresql")
+
+    for _statement in (
+        f"CREATE VIRTUAL TABLE {_table.name}_fts USING fts5("
+        f"name, content='{_table.name}', content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER {_table.name}_fts_insert AFTER INSERT ON {_table.name} BEGIN "
+        f"INSERT INTO {_table.name}_fts (rowid, name) VALUES (new.id, new.name); END",
+        f"CREATE TRIGGER {_table.name}_fts_delete AFTER DELETE ON {_table.name} BEGIN "
+        f"INSERT INTO {_table.name}_fts ({_table.name}_fts, rowid, name) VALUES ('delete', old.id, old.name); END",
+        f"CREATE TRIGGER {_table.name}_fts_update AFTER UPDATE OF name ON {_table.name} BEGIN "
+        f"INSERT INTO {_table.name}_fts ({_table.name}_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+        f"INSERT INTO {_table.name}_fts (rowid, name) VALUES (new.id, new.name); END",
+    ):
+        event.listen(_table, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+    event.listen(_table, "after_drop", DDL(f"DROP TABLE IF EXISTS {_table.name}_fts").execute_if(dialect="sqlite"))
@@ -0,0 +1,101 @@
+"""
+Горячие запросы сервисов, объявленные один раз через lambda_stmt.
+
+Конструкция select(...) из лямбды строится только при первом вызове: дальше SQLAlchemy
+берет готовый ключ кэша и скомпилированный SQL, подставляя лишь значения параметров.
+Одинаковый текст запроса позволяет asyncpg переиспользовать подготовленные выражения.
+"""
+from sqlalchemy import lambda_stmt
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload, aliased
+
+from app.models import EmployeeORM, ProjectORM, EmployeeProjectAssignmentORM
+
+
+def project_by_id(project_id: int):
+    return lambda_stmt(lambda: select(ProjectORM).where(ProjectORM.id == project_id))
+
+
+def employee_by_id(employee_id: int):
+    return lambda_stmt(lambda: select(EmployeeORM).where(EmployeeORM.id == employee_id))
+
+
+def employee_with_projects(employee_id: int):
+    return lambda_stmt(
+        lambda: select(EmployeeORM)
+        .where(EmployeeORM.id == employee_id)
+        .options(selectinload(EmployeeORM.projects).selectinload(EmployeeProjectAssignmentORM.project))
+    )
+
+
+def assignment_by_key(employee_id: int, project_id: int):
+    return lambda_stmt(
+        lambda: select(EmployeeProjectAssignmentORM)
+        .where(EmployeeProjectAssignmentORM.project_id == project_id,
+               EmployeeProjectAssignmentORM.employee_id == employee_id)
+    )
+
+
+def assignments_with_projects(employee_id: int):
+    return lambda_stmt(
+        lambda: select(EmployeeProjectAssignmentORM)
+        .where(EmployeeProjectAssignmentORM.employee_id == employee_id)
+        .options(selectinload(EmployeeProjectAssignmentORM.project))
+    )
+
+
+def _ancestors_select(parent_id: int):
+    ancestors = (
+        select(ProjectORM.id, ProjectORM.parent_id)
+        .where(ProjectORM.id == parent_id)
+        .cte(name="ancestors", recursive=True)
+    )
+    parent = aliased(ProjectORM)
+    # UNION вместо UNION ALL: рекурсия завершится даже на зацикленных данных
+    ancestors = ancestors.union(
+        select(parent.id, parent.parent_id).join(ancestors, parent.id == ancestors.c.parent_id)
+    )
+    return select(ancestors.c.id)
+
+
+def ancestor_ids(parent_id: int):
+    """
+    Все предки проекта, начиная с его родителя, одним рекурсивным запросом.
+    """
+    return lambda_stmt(lambda: _ancestors_select(parent_id))
+
+
+def _root_select(project_id: int):
+    chain = (
+        select(ProjectORM.id, ProjectORM.parent_id)
+        .where(ProjectORM.id == project_id)
+        .cte(name="chain", recursive=True)
+    )
+    parent = aliased(ProjectORM)
+    chain = chain.union(
+        select(parent.id, parent.parent_id).join(chain, parent.id == chain.c.parent_id)
+    )
+    return select(chain.c.id).where(chain.c.parent_id.is_(None))
+
+
+def root_id(project_id: int):
+    """
+    Верхнеуровневый проект дерева, в которое входит проект (сам проект, если он верхнеуровневый).
+    """
+    return lambda_stmt(lambda: _root_select(project_id))
+
+
+def warm_up_statements():
+    """
+    Горячие запросы с заведомо несуществующими идентификаторами: их выполнение при старте
+    заполняет кэш компиляции SQLAlchemy и кэш подготовленных выражений соединения.
+    """
+    return [
+        project_by_id(0),
+        employee_by_id(0),
+        employee_with_projects(0),
+        assignment_by_key(0, 0),
+        assignments_with_projects(0),
+        ancestor_ids(0),
+        root_id(0),
+    ]
@@ -1,6 +1,9 @@
-from typing import Optional
+from datetime import datetime
+from typing import Annotated, Dict, List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from app.schemas.employee import Rank
 
 
 class EmployeeProjectAssignmentCreate(BaseModel):
@@ -17,3 +20,38 @@ class EmployeeProjectAssignmentDelete(BaseModel):
     project_id: int
     employee_id: int
 
+class AssignmentEventOut(BaseModel):
+    id: int
+    employee_id: int
+    project_id: int
+    action: str
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class AssignmentChanges(BaseModel):
+    events: List[AssignmentEventOut]
+    next_cursor: int
+    has_more: bool
+
+class AutoStaffRequest(BaseModel):
+    # Сколько сотрудников каждого ранга должно быть на проекте, с учетом уже назначенных
+    targets: Dict[Rank, Annotated[int, Field(ge=0)]]
+    # Из кого выбирать; по умолчанию - все сотрудники нужных рангов
+    candidate_ids: Optional[List[int]] = None
+    dry_run: bool = False
+
+class RankStaffing(BaseModel):
+    rank: Rank
+    target: int
+    already_assigned: int
+    selected: List[int]
+    # Скольких не хватило до цели: подходящих кандидатов меньше, чем нужно
+    shortfall: int
+
+class AutoStaffResult(BaseModel):
+    project_id: int
+    ranks: List[RankStaffing]
+    assigned: int
+    dry_run: bool
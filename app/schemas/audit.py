@@ -0,0 +1,21 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class RankViolation(BaseModel):
+    employee_id: int
+    name: Optional[str] = None
+    rank: Optional[str] = None
+    # top_level_limit | subproject_limit | subproject_outside_top_level | unsupported_rank
+    rule: str
+    # Верхнеуровневый проект для subproject_limit, подпроект для subproject_outside_top_level
+    project_id: Optional[int] = None
+    observed: Optional[int] = None
+    limit: Optional[int] = None
+    message: str
+
+
+class RankAudit(BaseModel):
+    violations: List[RankViolation]
+    employees: int
@@ -27,4 +27,33 @@ class EmployeeOut(BaseModel):
     projects: Optional[List['ProjectOut']] = []
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class AssignableProject(BaseModel):
+    id: int
+    name: str
+    parent_id: Optional[int] = None
+    # Причина отказа; заполнена только для недоступных проектов
+    reason: Optional[str] = None
+
+
+class AssignableProjects(BaseModel):
+    employee_id: int
+    rank: Rank
+    assignable: List[AssignableProject]
+    rejected: Optional[List[AssignableProject]] = None
+
+
+class EmployeeSearchHit(BaseModel):
+    id: int
+    name: str
+    rank: Rank
+    # Релевантность: больше - ближе к запросу
+    score: float
+
+
+class EmployeeSearchPage(BaseModel):
+    items: List[EmployeeSearchHit]
+    # Смещение следующей страницы; None - страниц больше нет
+    next_offset: Optional[int] = None
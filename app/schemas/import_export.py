@@ -0,0 +1,18 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class RejectedRow(BaseModel):
+    line: int
+    type: Optional[str] = None
+    reason: str
+
+
+class ImportSummary(BaseModel):
+    projects: int
+    employees: int
+    assignments: int
+    rejected: int
+    # Подробности по первым отклоненным строкам; общее число - в rejected
+    rejected_rows: List[RejectedRow] = []
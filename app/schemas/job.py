@@ -0,0 +1,27 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class SkippedEmployee(BaseModel):
+    employee_id: int
+    name: Optional[str] = None
+    conflict_details: str
+
+
+class JobOut(BaseModel):
+    id: int
+    status: str
+    project_id: int
+    rank: str
+    total: int
+    processed: int
+    assigned: int
+    progress_percent: float
+    throughput_per_second: Optional[float] = None
+    skipped_employees: List[SkippedEmployee] = []
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,37 @@
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from app.schemas.employee import Rank
+
+
+class RankLimitsOverride(BaseModel):
+    # Не переданные поля остаются как в действующей политике; null в max_* снимает ограничение
+    max_top_level: Optional[int] = Field(default=None, ge=0)
+    max_subprojects: Optional[int] = Field(default=None, ge=0)
+    requires_top_level: Optional[bool] = None
+
+
+class PolicySimulationRequest(BaseModel):
+    rank_changes: Dict[int, Rank] = Field(default_factory=dict)
+    limits: Dict[Rank, RankLimitsOverride] = Field(default_factory=dict)
+    # Сколько затронутых сотрудников перечислить поименно; итоговые счетчики считаются по всем
+    max_listed: int = Field(default=1000, ge=0)
+
+
+class EmployeeImpact(BaseModel):
+    employee_id: int
+    rank_before: Optional[str] = None
+    rank_after: Optional[str] = None
+    rules: List[str]
+
+
+class PolicySimulationResult(BaseModel):
+    employees_evaluated: int
+    assignments_evaluated: int
+    violating_before: int
+    violating_after: int
+    violating_after_by_rank: Dict[str, int]
+    newly_violating: List[EmployeeImpact]
+    resolved: List[EmployeeImpact]
+    elapsed_ms: float
@@ -1,4 +1,5 @@
-from typing import List, Optional
+from datetime import datetime
+from typing import Dict, List, Optional
 from pydantic import BaseModel, Field
 
 
@@ -26,3 +27,54 @@ class ProjectOut(BaseModel):
 
 
 ProjectOut.model_rebuild()
+
+
+class ProjectStats(BaseModel):
+    project_id: int
+    name: str
+    # Разные сотрудники, назначенные на проект или любой его подпроект
+    headcount: int
+    by_rank: Dict[str, int] = Field(default_factory=dict)
+
+
+class ForestStats(BaseModel):
+    projects: List[ProjectStats]
+    # Время пересчета сводной таблицы; None - посчитано по живым данным
+    refreshed_at: Optional[datetime] = None
+
+
+class ProjectMove(BaseModel):
+    # Новый родитель; null делает проект верхнеуровневым
+    parent_id: Optional[int]
+    ignore_conflicts: bool = False
+
+
+class ProjectMoveConflict(BaseModel):
+    employee_id: int
+    name: Optional[str] = None
+    rank: Optional[str] = None
+    # Правила, которые сотрудник начнет нарушать после переноса (имена как в аудите)
+    rules: List[str]
+    messages: List[str]
+
+
+class ProjectMoveResult(BaseModel):
+    project: ProjectOut
+    moved: bool
+    # Сотрудники, назначенные в переносимое поддерево
+    employees_checked: int
+    conflicts: List[ProjectMoveConflict] = Field(default_factory=list)
+
+
+class ProjectSearchHit(BaseModel):
+    id: int
+    name: str
+    parent_id: Optional[int] = None
+    # Релевантность: больше - ближе к запросу
+    score: float
+
+
+class ProjectSearchPage(BaseModel):
+    items: List[ProjectSearchHit]
+    # Смещение следующей страницы; None - страниц больше нет
+    next_offset: Optional[int] = None
@@ -1,133 +1,132 @@
-from fastapi import HTTPException, Depends
+import heapq
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Depends, Request
+from sqlalchemy import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
-from app import models
-from app.database import get_db
-from app.models import EmployeeORM, ProjectORM, EmployeeProjectAssignmentORM
+from app import models, queries
+from app.database import get_db, get_read_db
+from app.models import EmployeeORM, ProjectORM, EmployeeProjectAssignmentORM, AssignmentEventORM
 from app.schemas.assignment import EmployeeProjectAssignmentCreate, EmployeeProjectAssignmentDelete, \
-    EmployeeProjectAssignmentByRank
-from app.utils.restrictions import is_assignment_allowed
+    EmployeeProjectAssignmentByRank, AssignmentChanges, AutoStaffRequest, AutoStaffResult, RankStaffing
+from app.services.change_stream import lock_event_log
+from app.utils.clock import utcnow
+from app.services.load_service import BATCH_SIZE, adjust_employee_load, load_assignment_profile, \
+    load_assignment_profiles, resolve_root_id
+from app.utils.forest import load_forest
+from app.utils.hierarchy import HierarchyIndex, current_forest, get_hierarchy
+from app.utils.rank_rules import AssignmentProfile, check_assignment
 
 
 class AssignmentService:
 
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, hierarchy: Optional[HierarchyIndex] = None):
         self.db = db
+        self.hierarchy = hierarchy
+
+    @classmethod
+    def get_dependency(cls, request: Request, db: AsyncSession = Depends(get_db)):
+        return cls(db, get_hierarchy(request))
 
     @classmethod
-    def get_dependency(cls, db: AsyncSession = Depends(get_db)):
-        return cls(db)
+    def get_read_dependency(cls, request: Request, db: AsyncSession = Depends(get_read_db)):
+        return cls(db, get_hierarchy(request))
+
+    async def record_events(self, action: str, pairs):
+        """
+        Пишет события ленты изменений для пар (employee_id, project_id) одной пачкой.
+        События фиксируются той же транзакцией, что и сами изменения.
+        """
+        created_at = utcnow()
+        rows = [{"employee_id": employee_id, "project_id": project_id, "action": action, "created_at": created_at}
+                for employee_id, project_id in pairs]
+        if rows:
+            await lock_event_log(self.db)
+            await self.db.execute(insert(AssignmentEventORM.__table__), rows)
 
     async def add_employee_to_project(self, data: EmployeeProjectAssignmentCreate):
-        query = (
-            select(ProjectORM)
-            .filter(ProjectORM.id == data.project_id)
-        )
-        result = await self.db.execute(query)
+        result = await self.db.execute(queries.project_by_id(data.project_id))
         db_project = result.scalar_one_or_none()
         if not db_project:
             raise HTTPException(status_code=404, detail="Project not found")
 
-        query = (
-            select(EmployeeORM)
-            .filter(EmployeeORM.id == data.employee_id)
-        )
-        result = await self.db.execute(query)
+        result = await self.db.execute(queries.employee_by_id(data.employee_id))
         db_employee = result.scalar_one_or_none()
         if not db_employee:
             raise HTTPException(status_code=404, detail="Employee not found")
 
-        query = (
-            select(models.EmployeeProjectAssignmentORM)
-            .filter(models.EmployeeProjectAssignmentORM.project_id == data.project_id,
-                    models.EmployeeProjectAssignmentORM.employee_id == data.employee_id)
-        )
-        result = await self.db.execute(query)
+        result = await self.db.execute(queries.assignment_by_key(data.employee_id, data.project_id))
         existing_assignment = result.scalar_one_or_none()
 
         if existing_assignment:
             raise HTTPException(status_code=400, detail="EmployeeORM already assigned to this project")
 
+        root_id = await resolve_root_id(self.db, db_project)
         if not data.ignore_conflicts:
-            is_allowed, conflict_reason = await is_assignment_allowed(db=self.db, employee=db_employee,
-                                                                      project=db_project)
+            # Правила проверяются по счетчикам employee_load, а не по всем назначениям сотрудника
+            if root_id is None:
+                raise HTTPException(status_code=400, detail="Проект не принадлежит ни одному верхнеуровневому проекту")
+            profile = await load_assignment_profile(self.db, db_employee.id)
+            is_allowed, conflict_reason = check_assignment(db_employee.rank, profile, db_project.parent_id, root_id)
             if not is_allowed:
                 raise HTTPException(status_code=400, detail=conflict_reason)
 
         new_assignment = models.EmployeeProjectAssignmentORM(employee_id=data.employee_id, project_id=data.project_id)
 
         self.db.add(new_assignment)
+        if root_id is not None:
+            await adjust_employee_load(self.db, [data.employee_id], db_project.parent_id, root_id, 1)
+        await self.record_events("assigned", [(data.employee_id, data.project_id)])
         await self.db.commit()
 
         return {"message": "Employee added to project successfully"}
 
     async def remove_employee_from_project(self, data: EmployeeProjectAssignmentDelete):
-        query = (
-            select(ProjectORM)
-            .filter(ProjectORM.id == data.project_id)
-        )
-        result = await self.db.execute(query)
+        result = await self.db.execute(queries.project_by_id(data.project_id))
         db_project = result.scalar_one_or_none()
         if not db_project:
             raise HTTPException(status_code=404, detail="Project not found")
 
-        query = (
-            select(EmployeeORM)
-            .filter(EmployeeORM.id == data.employee_id)
-        )
-        result = await self.db.execute(query)
+        result = await self.db.execute(queries.employee_by_id(data.employee_id))
         db_employee = result.scalar_one_or_none()
 
         if not db_employee:
             raise HTTPException(status_code=404, detail="EmployeeORM not found")
 
-        query = (
-            select(EmployeeProjectAssignmentORM)
-            .filter(EmployeeProjectAssignmentORM.project_id == data.project_id,
-                    EmployeeProjectAssignmentORM.employee_id == data.employee_id)
-        )
-
-        result = await self.db.execute(query)
+        result = await self.db.execute(queries.assignment_by_key(data.employee_id, data.project_id))
         existing_assignment = result.scalar_one_or_none()
 
         if not existing_assignment:
             raise HTTPException(status_code=404, detail="Assignment not found")
 
         await self.db.delete(existing_assignment)
+        root_id = await resolve_root_id(self.db, db_project)
+        if root_id is not None:
+            await adjust_employee_load(self.db, [data.employee_id], db_project.parent_id, root_id, -1)
+        await self.record_events("removed", [(data.employee_id, data.project_id)])
         await self.db.commit()
         return {"message": "Employee removed from project successfully"}
 
     async def assign_employees_by_rank(self, assignment_data: EmployeeProjectAssignmentByRank):
-        result = await self.db.execute(select(ProjectORM).filter(ProjectORM.id == assignment_data.project_id))
+        result = await self.db.execute(queries.project_by_id(assignment_data.project_id))
         project = result.scalar_one_or_none()
 
         if not project:
             raise HTTPException(status_code=404, detail="Project not found")
 
-        result = await self.db.execute(select(EmployeeORM).filter(EmployeeORM.rank == assignment_data.rank))
-        employees = result.scalars().all()
+        result = await self.db.execute(
+            select(EmployeeORM.id, EmployeeORM.name, EmployeeORM.rank)
+            .filter(EmployeeORM.rank == assignment_data.rank)
+            .order_by(EmployeeORM.id)
+        )
+        employees = result.all()
 
         if not employees:
             raise HTTPException(status_code=404, detail=f"No employees with rank {assignment_data.rank} found")
 
-        skipped_employees = []
-        for employee in employees:
-            is_allowed, conflict_details = await is_assignment_allowed(self.db, employee, project)
-
-            if not is_allowed and not assignment_data.ignore_conflicts:
-                skipped_employees.append({
-                    "employee_id": employee.id,
-                    "name": employee.name,
-                    "conflict_details": conflict_details,
-                })
-                continue
-
-            new_assignment = EmployeeProjectAssignmentORM(
-                employee_id=employee.id,
-                project_id=project.id,
-            )
-            self.db.add(new_assignment)
+        skipped_employees, _ = await self.assign_employees(project, employees, assignment_data.ignore_conflicts)
 
         await self.db.commit()
 
@@ -135,3 +134,184 @@ class AssignmentService:
             "message": f"Employees with rank {assignment_data.rank} processed for project {assignment_data.project_id}",
             "skipped_employees": skipped_employees,
         }
+
+    async def assign_employees(self, project: ProjectORM, employees, ignore_conflicts: bool):
+        """
+        Назначает на проект сотрудников из строк (id, name, rank) без коммита.
+        Уже назначенные на этот проект пропускаются. Правила проверяются по счетчикам employee_load,
+        загруженным одним запросом на пачку сотрудников. Возвращает пропущенных по правилам и число назначенных.
+        """
+        root_id = await resolve_root_id(self.db, project)
+        skipped_employees = []
+        assigned_ids = []
+        for start in range(0, len(employees), BATCH_SIZE):
+            batch = employees[start:start + BATCH_SIZE]
+            batch_ids = [employee_id for employee_id, _, _ in batch]
+            result = await self.db.execute(
+                select(EmployeeProjectAssignmentORM.employee_id)
+                .filter(EmployeeProjectAssignmentORM.project_id == project.id,
+                        EmployeeProjectAssignmentORM.employee_id.in_(batch_ids))
+            )
+            already_assigned = set(result.scalars().all())
+            profiles = await load_assignment_profiles(self.db, set(batch_ids) - already_assigned)
+
+            for employee_id, name, rank in batch:
+                if employee_id in already_assigned:
+                    continue
+                profile = profiles[employee_id]
+                is_allowed, conflict_details = check_assignment(rank, profile, project.parent_id, root_id)
+
+                if not is_allowed and not ignore_conflicts:
+                    skipped_employees.append({
+                        "employee_id": employee_id,
+                        "name": name,
+                        "conflict_details": conflict_details,
+                    })
+                    continue
+
+                if root_id is not None:
+                    profile.add(project.id, project.parent_id, root_id)
+                already_assigned.add(employee_id)
+                assigned_ids.append(employee_id)
+
+        if assigned_ids:
+            await self.db.execute(
+                insert(EmployeeProjectAssignmentORM.__table__),
+                [{"employee_id": employee_id, "project_id": project.id} for employee_id in assigned_ids],
+            )
+            if root_id is not None:
+                await adjust_employee_load(self.db, assigned_ids, project.parent_id, root_id, 1)
+        await self.record_events("assigned", [(employee_id, project.id) for employee_id in assigned_ids])
+        return skipped_employees, len(assigned_ids)
+
+    async def load_profiles(self, forest, ranks, candidate_ids=None) -> Dict[int, Tuple[str, AssignmentProfile]]:
+        """
+        Ранг и сводка назначений каждого сотрудника указанных рангов (или только из candidate_ids)
+        одним запросом: сотрудники соединяются со своими назначениями. Если лес - индекс процесса
+        и он не знает какого-то из назначенных проектов, лес читается из базы.
+        """
+        query = (
+            select(EmployeeORM.id, EmployeeORM.rank, EmployeeProjectAssignmentORM.project_id)
+            .outerjoin(EmployeeProjectAssignmentORM, EmployeeProjectAssignmentORM.employee_id == EmployeeORM.id)
+            .filter(EmployeeORM.rank.in_(ranks))
+        )
+        if candidate_ids is not None:
+            query = query.filter(EmployeeORM.id.in_(candidate_ids))
+        result = await self.db.execute(query)
+        rows = result.all()
+        if not all(project_id is None or forest.contains(project_id) for _, _, project_id in rows):
+            forest = await load_forest(self.db)
+
+        profiles: Dict[int, Tuple[str, AssignmentProfile]] = {}
+        for employee_id, rank, project_id in rows:
+            if employee_id not in profiles:
+                profiles[employee_id] = (rank, AssignmentProfile())
+            if project_id is not None:
+                profiles[employee_id][1].add(project_id, forest.parent_of(project_id), forest.root_of(project_id))
+        return profiles
+
+    async def auto_staff(self, project_id: int, request: AutoStaffRequest) -> AutoStaffResult:
+        """
+        Доукомплектовывает проект до заданного числа сотрудников каждого ранга.
+        Сводки назначений кандидатов строятся одним запросом, каждый кандидат проверяется в памяти,
+        из подходящих выбираются наименее загруженные (меньше всего назначений, при равенстве - меньший id).
+        Кандидат получает одно новое назначение, поэтому выбор по рангам независим.
+        Корни проектов берутся из индекса иерархии, догнанного по журналу, а без него - из леса в базе.
+        Все выбранные назначения пишутся одной пачкой в одной транзакции.
+        """
+        result = await self.db.execute(queries.project_by_id(project_id))
+        project = result.scalar_one_or_none()
+        if not project:
+            raise HTTPException(status_code=404, detail="Project not found")
+
+        forest = await current_forest(self.db, self.hierarchy)
+        if not forest.contains(project.id):
+            forest = await load_forest(self.db)
+        root_id = forest.root_of(project.id)
+        if root_id is None:
+            raise HTTPException(status_code=400, detail="Проект не принадлежит ни одному верхнеуровневому проекту")
+
+        ranks = [rank.value for rank in request.targets]
+        candidate_ids = None if request.candidate_ids is None else set(request.candidate_ids)
+        profiles = await self.load_profiles(forest, ranks, candidate_ids)
+
+        if candidate_ids is not None:
+            # Кандидаты других рангов в сводки не попадают, поэтому существование проверяется отдельно
+            missing = candidate_ids - set(profiles)
+            if missing:
+                result = await self.db.execute(select(EmployeeORM.id).filter(EmployeeORM.id.in_(missing)))
+                unknown = sorted(missing - set(result.scalars().all()))
+                if unknown:
+                    raise HTTPException(status_code=400, detail=f"Unknown employees: {unknown[:20]}")
+
+        # Уже назначенные на проект засчитываются в цель, даже если они не входят в пул кандидатов
+        result = await self.db.execute(
+            select(EmployeeORM.id, EmployeeORM.rank)
+            .join(EmployeeProjectAssignmentORM, EmployeeProjectAssignmentORM.employee_id == EmployeeORM.id)
+            .filter(EmployeeProjectAssignmentORM.project_id == project.id, EmployeeORM.rank.in_(ranks))
+        )
+        assigned_here: Dict[str, set] = {rank: set() for rank in ranks}
+        for employee_id, rank in result.all():
+            assigned_here[rank].add(employee_id)
+
+        candidates: Dict[str, List[Tuple[int, int]]] = {rank: [] for rank in ranks}
+        for employee_id, (rank, profile) in profiles.items():
+            if employee_id in assigned_here[rank]:
+                continue
+            is_allowed, _ = check_assignment(rank, profile, project.parent_id, root_id)
+            if is_allowed:
+                candidates[rank].append((profile.assigned, employee_id))
+
+        staffing: List[RankStaffing] = []
+        selected_ids: List[int] = []
+        for rank, target in request.targets.items():
+            already_assigned = len(assigned_here[rank.value])
+            needed = max(target - already_assigned, 0)
+            # Частичная сортировка: нужны только needed наименее загруженных
+            selected = [employee_id for _, employee_id in heapq.nsmallest(needed, candidates[rank.value])]
+            selected_ids.extend(selected)
+            staffing.append(RankStaffing(
+                rank=rank,
+                target=target,
+                already_assigned=already_assigned,
+                selected=selected,
+                shortfall=needed - len(selected),
+            ))
+
+        if selected_ids and not request.dry_run:
+            await self.db.execute(
+                insert(EmployeeProjectAssignmentORM.__table__),
+                [{"employee_id": employee_id, "project_id": project.id} for employee_id in selected_ids],
+            )
+            await adjust_employee_load(self.db, selected_ids, project.parent_id, root_id, 1)
+            await self.record_events("assigned", [(employee_id, project.id) for employee_id in selected_ids])
+            await self.db.commit()
+
+        return AutoStaffResult(
+            project_id=project.id,
+            ranks=staffing,
+            assigned=0 if request.dry_run else len(selected_ids),
+            dry_run=request.dry_run,
+        )
+
+    async def get_changes(self, since: int, limit: int) -> AssignmentChanges:
+        """
+        События ленты с id больше курсора since, не более limit за запрос.
+        Клиент передает next_cursor в следующий запрос, пока has_more истинно.
+        id растут в порядке коммитов (см. lock_event_log), поэтому событие не появится позади курсора.
+        """
+        result = await self.db.execute(
+            select(AssignmentEventORM)
+            .filter(AssignmentEventORM.id > since)
+            .order_by(AssignmentEventORM.id)
+            .limit(limit + 1)
+        )
+        events = result.scalars().all()
+        has_more = len(events) > limit
+        events = events[:limit]
+
+        return AssignmentChanges(
+            events=events,
+            next_cursor=events[-1].id if events else since,
+            has_more=has_more,
+        )
@@ -0,0 +1,143 @@
+from fastapi import Depends
+from sqlalchemy import Integer, String, case, exists, func, literal_column, null, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.database import get_read_db
+from app.models import EmployeeORM, ProjectORM, EmployeeProjectAssignmentORM
+from app.schemas.audit import RankAudit, RankViolation
+
+SUPPORTED_RANKS = ("1", "2", "3", "4")
+
+MESSAGES = {
+    ("top_level_limit", "2"): "Ранг 2: нельзя участвовать более чем в 3 верхнеуровневых проектах",
+    ("top_level_limit", "3"): "Ранг 3: нельзя участвовать более чем в 2 верхнеуровневых проектах",
+    ("top_level_limit", "4"): "Ранг 4: нельзя участвовать более чем в 1 верхнеуровневом проекте и 1 подпроекте",
+    ("subproject_limit", "3"): "Ранг 3: нельзя участвовать более чем в 2 подпроектах одного верхнеуровневого проекта",
+    ("subproject_limit", "4"): "Ранг 4: нельзя участвовать более чем в 1 верхнеуровневом проекте и 1 подпроекте",
+    ("subproject_outside_top_level", "3"):
+        "Ранг 3: подпроект не принадлежит верхнеуровневому проекту, в котором участвует сотрудник",
+    ("subproject_outside_top_level", "4"): "Ранг 4: нельзя назначить проект без основного верхнеуровневого проекта",
+}
+UNSUPPORTED_RANK_MESSAGE = "Неподдерживаемый ранг сотрудника"
+
+
+def _const(value):
+    # Константы встраиваются в текст запроса: типы параметров внутри UNION и CASE PostgreSQL вывести не может
+    if isinstance(value, str):
+        return literal_column(f"'{value}'", String)
+    return literal_column(str(value), Integer)
+
+
+def _audit_query():
+    """
+    Все нарушения правил рангов одним запросом: рекурсивный CTE находит корень каждого проекта,
+    дальше каждое правило - группировка назначений, результаты объединяются UNION ALL.
+    Подходит и для PostgreSQL, и для SQLite.
+    """
+    projects = ProjectORM.__table__
+    assignments = EmployeeProjectAssignmentORM.__table__
+    employees = EmployeeORM.__table__
+
+    roots = (
+        select(projects.c.id, projects.c.id.label("root_id"))
+        .where(projects.c.parent_id.is_(None))
+        .cte(name="roots", recursive=True)
+    )
+    child = projects.alias("child")
+    roots = roots.union_all(select(child.c.id, roots.c.root_id).join(roots, child.c.parent_id == roots.c.id))
+
+    # Назначение с рангом сотрудника, родителем проекта и его корнем
+    assigned = (
+        select(assignments.c.employee_id, assignments.c.project_id, employees.c.rank,
+               projects.c.parent_id, roots.c.root_id)
+        .join(employees, employees.c.id == assignments.c.employee_id)
+        .join(projects, projects.c.id == assignments.c.project_id)
+        .join(roots, roots.c.id == assignments.c.project_id)
+        .cte(name="assigned")
+    )
+    top = assigned.alias("top")
+    other = assigned.alias("other")
+
+    def in_assigned_top(row):
+        return exists().where(top.c.employee_id == row.c.employee_id, top.c.project_id == row.c.root_id,
+                              top.c.parent_id.is_(None))
+
+    top_limit = case((assigned.c.rank == "2", _const(3)), (assigned.c.rank == "3", _const(2)),
+                     (assigned.c.rank == "4", _const(1)))
+    top_level = (
+        select(assigned.c.employee_id, _const("top_level_limit").label("rule"), null().label("project_id"),
+               func.count().label("observed"), top_limit.label("limit"))
+        .where(assigned.c.parent_id.is_(None))
+        .group_by(assigned.c.employee_id, assigned.c.rank)
+        .having(func.count() > top_limit)
+    )
+
+    # Прямые подпроекты верхнеуровневого проекта, в котором участвует сотрудник
+    sub_limit = case((assigned.c.rank == "3", _const(2)), (assigned.c.rank == "4", _const(1)))
+    subprojects = (
+        select(assigned.c.employee_id, _const("subproject_limit").label("rule"), assigned.c.root_id,
+               func.count(), sub_limit)
+        .where(assigned.c.parent_id == assigned.c.root_id, in_assigned_top(assigned))
+        .group_by(assigned.c.employee_id, assigned.c.rank, assigned.c.root_id)
+        .having(func.count() > sub_limit)
+    )
+
+    # Подпроект вне назначенных верхнеуровневых проектов. Первое назначение разрешено всегда,
+    # поэтому единственное назначение сотрудника нарушением не считается
+    outside = (
+        select(assigned.c.employee_id, _const("subproject_outside_top_level").label("rule"), assigned.c.project_id,
+               null(), null())
+        .where(
+            assigned.c.rank.in_(("3", "4")),
+            assigned.c.parent_id.is_not(None),
+            ~in_assigned_top(assigned),
+            exists().where(other.c.employee_id == assigned.c.employee_id,
+                           other.c.project_id != assigned.c.project_id),
+        )
+    )
+
+    unsupported = (
+        select(assigned.c.employee_id, _const("unsupported_rank").label("rule"), null(), func.count(), null())
+        .where(func.coalesce(assigned.c.rank, "").not_in(SUPPORTED_RANKS))
+        .group_by(assigned.c.employee_id)
+    )
+
+    violations = union_all(top_level, subprojects, outside, unsupported).subquery("violations")
+    return (
+        select(violations.c.employee_id, employees.c.name, employees.c.rank, violations.c.rule,
+               violations.c.project_id, violations.c.observed, violations.c.limit)
+        .join(employees, employees.c.id == violations.c.employee_id)
+        .order_by(violations.c.employee_id, violations.c.rule, violations.c.project_id)
+    )
+
+
+class AuditService:
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    @classmethod
+    def get_read_dependency(cls, db: AsyncSession = Depends(get_read_db)):
+        return cls(db)
+
+    async def audit_rank_rules(self) -> RankAudit:
+        """
+        Проверяет все назначения в базе на соответствие правилам рангов и возвращает каждое нарушение:
+        сотрудника, правило, проект (для правил по проектам), фактическое значение и предел.
+        """
+        result = await self.db.execute(_audit_query())
+        violations = [
+            RankViolation(
+                employee_id=row.employee_id,
+                name=row.name,
+                rank=row.rank,
+                rule=row.rule,
+                project_id=row.project_id,
+                observed=row.observed,
+                limit=row.limit,
+                message=MESSAGES.get((row.rule, row.rank), UNSUPPORTED_RANK_MESSAGE),
+            )
+            for row in result.all()
+        ]
+        return RankAudit(violations=violations, employees=len({violation.employee_id for violation in violations}))
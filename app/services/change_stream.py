@@ -0,0 +1,156 @@
+import asyncio
+import json
+import logging
+from typing import AsyncIterator
+
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models import AssignmentEventORM, ProjectEventORM
+from app.utils.broadcast import Broadcaster, Subscription
+
+logger = logging.getLogger("app.change_stream")
+
+# Тип события потока -> журнал, из которого оно читается. Дерево проектов идет первым:
+# назначение на новый проект приходит клиенту после события о самом проекте
+SOURCES = {
+    "project": ProjectEventORM,
+    "assignment": AssignmentEventORM,
+}
+
+# Ключ транзакционной advisory-блокировки журналов событий (PostgreSQL)
+EVENT_LOG_LOCK_KEY = 0x65766C67
+
+
+async def lock_event_log(db: AsyncSession):
+    """
+    Вызывается перед записью событий в журналы. id событий выдаются при вставке, а видны они
+    после коммита, поэтому без блокировки меньший id мог бы закоммититься позже уже отданного
+    большего, и курсор id > since пропустил бы его навсегда. Транзакционная блокировка держится
+    до коммита: транзакции, пишущие события, выстраиваются друг за другом, и id растут в порядке коммитов.
+    В SQLite запись и так идет одной транзакцией за раз.
+    """
+    if db.bind.dialect.name == "postgresql":
+        await db.execute(select(func.pg_advisory_xact_lock(EVENT_LOG_LOCK_KEY)))
+
+
+class ChangeStream:
+    """
+    Читает журналы assignment_events и project_events и раздает новые события подписчикам процесса.
+    Источник - база, а не сами обработчики, поэтому клиент видит изменения, сделанные любым воркером,
+    фоновым заданием или импортом. Пока подписчиков нет, журналы не опрашиваются.
+    """
+
+    def __init__(self, session_factory, broadcaster: Broadcaster, poll_interval: float = 1.0,
+                 batch_size: int = 500):
+        self.session_factory = session_factory
+        self.broadcaster = broadcaster
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.cursors = {}
+        self._task = None
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_settings(cls, session_factory, settings) -> "ChangeStream":
+        broadcaster = Broadcaster(settings.stream_buffer_size, settings.stream_max_clients)
+        return cls(session_factory, broadcaster, settings.stream_poll_interval_seconds)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def subscribe(self):
+        """
+        Подписывает клиента и возвращает подписку вместе с курсорами журналов на момент подключения:
+        клиент получит все события после этих курсоров.
+        """
+        async with self._lock:
+            if not self.broadcaster.subscribers:
+                # Журналы не читались, пока подписчиков не было: начинаем с текущего конца
+                await self._reset_cursors()
+            subscription = self.broadcaster.subscribe()
+            return subscription, {f"{name}_cursor": cursor for name, cursor in self.cursors.items()}
+
+    async def _run(self):
+        while True:
+            await self.broadcaster.wait_for_subscribers()
+            try:
+                while self.broadcaster.subscribers:
+                    async with self._lock:
+                        await self.poll()
+                    await asyncio.sleep(self.poll_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Change stream polling failed")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _reset_cursors(self):
+        async with self.session_factory() as db:
+            for name, model in SOURCES.items():
+                result = await db.execute(select(func.coalesce(func.max(model.id), 0)))
+                self.cursors[name] = result.scalar_one()
+
+    async def poll(self) -> int:
+        """
+        Забирает новые события каждого журнала порциями и публикует их. Возвращает число событий.
+        """
+        published = 0
+        async with self.session_factory() as db:
+            for name, model in SOURCES.items():
+                while True:
+                    result = await db.execute(
+                        select(model).filter(model.id > self.cursors[name]).order_by(model.id).limit(self.batch_size)
+                    )
+                    events = result.scalars().all()
+                    for event in events:
+                        self.broadcaster.publish({"event": name, "id": event.id, "data": _event_data(event)})
+                    if events:
+                        self.cursors[name] = events[-1].id
+                        published += len(events)
+                    if len(events) < self.batch_size:
+                        break
+        return published
+
+
+def _event_data(event) -> dict:
+    data = {column.name: getattr(event, column.name) for column in event.__table__.c}
+    data["created_at"] = event.created_at.isoformat()
+    return data
+
+
+def _frame(event: str, data: dict, event_id: str = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def sse_frames(stream: ChangeStream, subscription: Subscription, cursors: dict,
+                     heartbeat_seconds: float) -> AsyncIterator[str]:
+    """
+    Кадры Server-Sent Events для одного клиента. Первым идет ready с курсорами журналов:
+    пропущенное до подключения клиент добирает через GET /api/assignments/changes.
+    Отключенный за медленное чтение клиент получает dropped, и поток завершается.
+    """
+    try:
+        yield _frame("ready", cursors)
+        while True:
+            message = await subscription.get(heartbeat_seconds)
+            if subscription.dropped:
+                yield _frame("dropped", {"reason": "Client is too slow, reconnect and resync"})
+                return
+            if message is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield _frame(message["event"], message["data"], f"{message['event']}:{message['id']}")
+    finally:
+        stream.broadcaster.unsubscribe(subscription)
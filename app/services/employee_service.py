@@ -1,23 +1,35 @@
-from fastapi import HTTPException, Depends
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, Depends, Request
+from sqlalchemy import delete, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 
-from app import models
-from app.database import get_db
-from app.models import EmployeeORM, EmployeeProjectAssignmentORM
-from app.schemas.employee import EmployeeCreate, EmployeeOut
+from app import models, queries
+from app.database import get_db, get_read_db
+from app.models import EmployeeORM, EmployeeLoadORM, EmployeeProjectAssignmentORM, ProjectORM
+from app.schemas.employee import EmployeeCreate, EmployeeOut, AssignableProjects, AssignableProject
 from app.schemas.project import ProjectOut
+from app.services.assignment_service import AssignmentService
+from app.utils.forest import Forest
+from app.utils.hierarchy import HierarchyIndex, get_hierarchy
+from app.utils.rank_rules import AssignmentProfile, check_assignment
 
 
 class EmployeeService:
 
-    def __init__(self, db):
+    def __init__(self, db, hierarchy: Optional[HierarchyIndex] = None):
         self.db = db
+        self.hierarchy = hierarchy
+
+    @classmethod
+    def get_dependency(cls, request: Request, db: AsyncSession = Depends(get_db)):
+        return cls(db, get_hierarchy(request))
 
     @classmethod
-    def get_dependency(cls, db: AsyncSession = Depends(get_db)):
-        return cls(db)
+    def get_read_dependency(cls, request: Request, db: AsyncSession = Depends(get_read_db)):
+        return cls(db, get_hierarchy(request))
 
     async def create_employee(self, employee: EmployeeCreate) -> EmployeeOut:
         db_employee = models.EmployeeORM(name=employee.name, rank=employee.rank)
@@ -51,14 +63,11 @@ class EmployeeService:
             for employee in db_employee
         ]
 
-    async def get_employee(self, employee_id: int) -> EmployeeOut:
-        query = (
-            select(EmployeeORM)
-            .filter(EmployeeORM.id == employee_id)
-            .options(selectinload(EmployeeORM.projects).selectinload(EmployeeProjectAssignmentORM.project))
-        )
-
-        result = await self.db.execute(query)
+    async def get_employee(self, employee_id: int) -> Tuple[EmployeeOut, int]:
+        """
+        Сотрудник с проектами и текущая версия строки для ETag.
+        """
+        result = await self.db.execute(queries.employee_with_projects(employee_id))
         db_employee = result.scalar_one_or_none()
 
         if not db_employee:
@@ -67,29 +76,36 @@ class EmployeeService:
         projects = [ProjectOut(id=item.project.id, name=item.project.name, parent_id=item.project.parent_id) for item in
                     db_employee.projects]
 
-        return EmployeeOut(id=db_employee.id, name=db_employee.name, rank=db_employee.rank, projects=projects)
-
-    async def update_employee(self, employee_id: int, updated_employee: EmployeeCreate):
+        return EmployeeOut(id=db_employee.id, name=db_employee.name, rank=db_employee.rank,
+                           projects=projects), db_employee.version
+
+    async def update_employee(self, employee_id: int, updated_employee: EmployeeCreate,
+                              expected_versions: Optional[List[int]] = None) -> Tuple[EmployeeOut, int]:
+        """
+        Обновляет сотрудника одним условным UPDATE с увеличением версии, без блокировок.
+        С If-Match (expected_versions) строка меняется, только если ее версия не изменилась
+        с момента чтения клиентом; иначе 412.
+        """
         query = (
-            select(EmployeeORM)
-            .filter(EmployeeORM.id == employee_id)
-            .options(selectinload(EmployeeORM.projects).selectinload(EmployeeProjectAssignmentORM.project))
+            update(EmployeeORM)
+            .where(EmployeeORM.id == employee_id)
+            .values(name=updated_employee.name, rank=updated_employee.rank, version=EmployeeORM.version + 1)
+            .returning(EmployeeORM.version)
         )
+        if expected_versions is not None:
+            query = query.where(EmployeeORM.version.in_(expected_versions))
 
         result = await self.db.execute(query)
-        db_employee = result.scalar_one_or_none()
-        projects = [ProjectOut(id=item.project.id, name=item.project.name) for item in
-                    db_employee.projects]
-        self.db.add(db_employee)
-        if not db_employee:
-            raise HTTPException(status_code=404, detail="Employee not found")
-
-        db_employee.name = updated_employee.name
-        db_employee.rank = updated_employee.rank
+        version = result.scalar_one_or_none()
+        if version is None:
+            result = await self.db.execute(select(EmployeeORM.id).filter(EmployeeORM.id == employee_id))
+            if result.scalar_one_or_none() is None:
+                raise HTTPException(status_code=404, detail="Employee not found")
+            raise HTTPException(status_code=412, detail="Employee was modified by another request")
+
+        employee_out, _ = await self.get_employee(employee_id)
         await self.db.commit()
-        await self.db.refresh(db_employee)
-        return EmployeeOut(id=db_employee.id, name=db_employee.name, rank=db_employee.rank,
-                           projects=projects)
+        return employee_out, version
 
     async def delete_employee(self, employee_id: int):
         query = (
@@ -102,6 +118,61 @@ class EmployeeService:
         if not db_employee:
             raise HTTPException(status_code=404, detail="EmployeeORM not found")
 
+        if db_employee.projects:
+            await self.db.execute(delete(EmployeeLoadORM).where(EmployeeLoadORM.employee_id == employee_id))
+            # Назначения снимаются каскадом: лента получает по событию removed на каждое
+            await AssignmentService(self.db).record_events(
+                "removed", [(employee_id, assignment.project_id) for assignment in db_employee.projects]
+            )
         await self.db.delete(db_employee)
         await self.db.commit()
         return {"message": "Employee deleted successfully"}
+
+    async def get_assignable_projects(self, employee_id: int, include_rejected: bool = False) -> AssignableProjects:
+        """
+        Проекты, на которые сотрудника можно назначить без нарушения правил ранга.
+        Сотрудник, его назначения и список проектов читаются тремя запросами, дальше каждый проект
+        проверяется в памяти по сводке назначений. Корни берутся из индекса иерархии, догнанного
+        по журналу project_events; если индекса нет или он не знает какого-то проекта,
+        лес строится из прочитанного списка.
+        """
+        result = await self.db.execute(queries.employee_by_id(employee_id))
+        db_employee = result.scalar_one_or_none()
+        if not db_employee:
+            raise HTTPException(status_code=404, detail="Employee not found")
+
+        result = await self.db.execute(
+            select(EmployeeProjectAssignmentORM.project_id).filter(EmployeeProjectAssignmentORM.employee_id == employee_id)
+        )
+        assigned_ids = set(result.scalars().all())
+
+        forest = self.hierarchy if self.hierarchy is not None and await self.hierarchy.sync(self.db) else None
+        result = await self.db.execute(select(ProjectORM.id, ProjectORM.parent_id, ProjectORM.name))
+        rows = result.all()
+        if forest is None or not all(forest.contains(project_id) for project_id, _, _ in rows):
+            forest = Forest.from_rows((project_id, parent_id) for project_id, parent_id, _ in rows)
+
+        profile = AssignmentProfile()
+        for project_id in assigned_ids:
+            profile.add(project_id, forest.parent_of(project_id), forest.root_of(project_id))
+
+        assignable, rejected = [], []
+        for project_id, parent_id, name in rows:
+            if project_id in assigned_ids:
+                continue
+            root_id = forest.root_of(project_id)
+            if root_id is None:
+                is_allowed, reason = False, "Проект не принадлежит ни одному верхнеуровневому проекту"
+            else:
+                is_allowed, reason = check_assignment(db_employee.rank, profile, parent_id, root_id)
+            if is_allowed:
+                assignable.append(AssignableProject(id=project_id, name=name, parent_id=parent_id))
+            elif include_rejected:
+                rejected.append(AssignableProject(id=project_id, name=name, parent_id=parent_id, reason=reason))
+
+        return AssignableProjects(
+            employee_id=db_employee.id,
+            rank=db_employee.rank,
+            assignable=assignable,
+            rejected=rejected if include_rejected else None,
+        )
@@ -0,0 +1,244 @@
+from typing import AsyncIterable, Dict, List, Optional, Tuple
+
+from fastapi import Depends
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.models import EmployeeORM, ProjectORM, EmployeeProjectAssignmentORM
+from app.schemas.employee import Rank
+from app.schemas.import_export import ImportSummary, RejectedRow
+from app.services.assignment_service import AssignmentService
+from app.services.load_service import rebuild_employee_load
+from app.services.project_service import ProjectService
+from app.utils.rank_rules import AssignmentProfile, check_assignment
+from app.utils.streaming import Row
+
+# Порядок разделов файла: проекты, затем сотрудники, затем назначения
+SECTIONS = ("project", "employee", "assignment")
+
+BATCH_SIZE = 1000
+MAX_REPORTED_REJECTIONS = 1000
+
+RANKS = {rank.value for rank in Rank}
+
+
+class Rejected(Exception):
+    pass
+
+
+class _ImportState:
+    """
+    Внешние ключи уже вставленных объектов и сводки назначений сотрудников.
+    Строки файла в памяти не накапливаются: держатся только идентификаторы и текущие пачки.
+    """
+
+    def __init__(self):
+        # ключ проекта -> (id, parent_id, id корневого проекта)
+        self.projects: Dict[str, Tuple[int, Optional[int], int]] = {}
+        # ключ сотрудника -> (id, ранг)
+        self.employees: Dict[str, Tuple[int, str]] = {}
+        self.profiles: Dict[int, AssignmentProfile] = {}
+        self.assigned: Dict[int, set] = {}
+
+        self.pending_projects: List[Tuple[str, str, Optional[str]]] = []
+        self.pending_project_keys = set()
+        self.pending_employees: List[Tuple[str, str, str]] = []
+        self.pending_employee_keys = set()
+        self.pending_assignments: List[dict] = []
+
+        self.counts = {section: 0 for section in SECTIONS}
+        self.rejected = 0
+        self.rejected_rows: List[RejectedRow] = []
+
+
+class ImportService:
+
+    def __init__(self, db: AsyncSession, batch_size: int = BATCH_SIZE):
+        self.db = db
+        self.batch_size = batch_size
+
+    @classmethod
+    def get_dependency(cls, db: AsyncSession = Depends(get_db)):
+        return cls(db)
+
+    async def import_rows(self, rows: AsyncIterable[Row]) -> ImportSummary:
+        """
+        Импортирует поток строк в порядке разделов. Проекты ссылаются на родителя по внешнему ключу,
+        назначения - на ключи сотрудника и проекта из этого же файла. Правила рангов проверяются
+        по сводкам назначений в памяти. Весь импорт выполняется одной транзакцией,
+        некорректные строки пропускаются и попадают в сводку.
+        """
+        state = _ImportState()
+        section = 0
+
+        try:
+            async for row in rows:
+                try:
+                    if row.error:
+                        raise Rejected(row.error)
+                    record_type = row.record.get("type")
+                    if record_type not in SECTIONS:
+                        raise Rejected(f"Unknown record type: {record_type!r}")
+
+                    record_section = SECTIONS.index(record_type)
+                    if record_section < section:
+                        raise Rejected(f"{record_type} rows must precede {SECTIONS[section]} rows")
+                    while section < record_section:
+                        await self._flush(state, SECTIONS[section])
+                        section += 1
+
+                    await getattr(self, f"_add_{record_type}")(state, row.record)
+                except Rejected as exc:
+                    self._reject(state, row, str(exc))
+
+            for name in SECTIONS[section:]:
+                await self._flush(state, name)
+            await rebuild_employee_load(self.db, state.assigned)
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+
+        return ImportSummary(
+            projects=state.counts["project"],
+            employees=state.counts["employee"],
+            assignments=state.counts["assignment"],
+            rejected=state.rejected,
+            rejected_rows=state.rejected_rows,
+        )
+
+    @staticmethod
+    def _reject(state: _ImportState, row: Row, reason: str):
+        state.rejected += 1
+        if len(state.rejected_rows) < MAX_REPORTED_REJECTIONS:
+            record_type = row.record.get("type") if row.record else None
+            state.rejected_rows.append(RejectedRow(line=row.line, type=record_type, reason=reason))
+
+    async def _flush(self, state: _ImportState, section: str):
+        match section:
+            case "project":
+                await self._flush_projects(state)
+            case "employee":
+                await self._flush_employees(state)
+            case "assignment":
+                await self._flush_assignments(state)
+
+    async def _add_project(self, state: _ImportState, record: dict):
+        key, name, parent_key = _text(record, "key"), _text(record, "name"), _text(record, "parent_key")
+        if not key or not name:
+            raise Rejected("Project requires key and name")
+        if key in state.projects or key in state.pending_project_keys:
+            raise Rejected(f"Duplicate project key {key!r}")
+        if parent_key is not None and parent_key not in state.projects:
+            if parent_key not in state.pending_project_keys:
+                raise Rejected(f"Unknown parent_key {parent_key!r}: parents must precede their subprojects")
+            # Родитель еще в текущей пачке: вставляем ее, чтобы узнать его id
+            await self._flush_projects(state)
+
+        state.pending_projects.append((key, name, parent_key))
+        state.pending_project_keys.add(key)
+        if len(state.pending_projects) >= self.batch_size:
+            await self._flush_projects(state)
+
+    async def _flush_projects(self, state: _ImportState):
+        if not state.pending_projects:
+            return
+        pending, state.pending_projects = state.pending_projects, []
+        state.pending_project_keys.clear()
+
+        rows = [
+            {"name": name, "parent_id": state.projects[parent_key][0] if parent_key else None}
+            for _, name, parent_key in pending
+        ]
+        ids = await self._insert_returning_ids(ProjectORM.__table__, rows)
+        for (key, _, parent_key), row, project_id in zip(pending, rows, ids):
+            root_id = state.projects[parent_key][2] if parent_key else project_id
+            state.projects[key] = (project_id, row["parent_id"], root_id)
+        # События created пишутся до событий assigned: в ленте проект появляется раньше назначений на него
+        await ProjectService(self.db).record_events(
+            "created", [(project_id, row["parent_id"]) for row, project_id in zip(rows, ids)]
+        )
+        state.counts["project"] += len(ids)
+
+    async def _add_employee(self, state: _ImportState, record: dict):
+        key, name, rank = _text(record, "key"), _text(record, "name"), _text(record, "rank")
+        if not key or not name:
+            raise Rejected("Employee requires key and name")
+        if rank not in RANKS:
+            raise Rejected(f"Unsupported rank {rank!r}")
+        if key in state.employees or key in state.pending_employee_keys:
+            raise Rejected(f"Duplicate employee key {key!r}")
+
+        state.pending_employees.append((key, name, rank))
+        state.pending_employee_keys.add(key)
+        if len(state.pending_employees) >= self.batch_size:
+            await self._flush_employees(state)
+
+    async def _flush_employees(self, state: _ImportState):
+        if not state.pending_employees:
+            return
+        pending, state.pending_employees = state.pending_employees, []
+        state.pending_employee_keys.clear()
+
+        ids = await self._insert_returning_ids(
+            EmployeeORM.__table__, [{"name": name, "rank": rank} for _, name, rank in pending]
+        )
+        for (key, _, rank), employee_id in zip(pending, ids):
+            state.employees[key] = (employee_id, rank)
+        state.counts["employee"] += len(ids)
+
+    async def _add_assignment(self, state: _ImportState, record: dict):
+        employee_key, project_key = _text(record, "employee_key"), _text(record, "project_key")
+        if employee_key not in state.employees:
+            raise Rejected(f"Unknown employee_key {employee_key!r}")
+        if project_key not in state.projects:
+            raise Rejected(f"Unknown project_key {project_key!r}")
+
+        employee_id, rank = state.employees[employee_key]
+        project_id, parent_id, root_id = state.projects[project_key]
+        assigned = state.assigned.setdefault(employee_id, set())
+        if project_id in assigned:
+            raise Rejected("Employee already assigned to this project")
+
+        profile = state.profiles.setdefault(employee_id, AssignmentProfile())
+        if not _flag(record, "ignore_conflicts"):
+            is_allowed, conflict_reason = check_assignment(rank, profile, parent_id, root_id)
+            if not is_allowed:
+                raise Rejected(conflict_reason)
+
+        profile.add(project_id, parent_id, root_id)
+        assigned.add(project_id)
+        state.pending_assignments.append({"employee_id": employee_id, "project_id": project_id})
+        if len(state.pending_assignments) >= self.batch_size:
+            await self._flush_assignments(state)
+
+    async def _flush_assignments(self, state: _ImportState):
+        if not state.pending_assignments:
+            return
+        pending, state.pending_assignments = state.pending_assignments, []
+
+        await self.db.execute(insert(EmployeeProjectAssignmentORM.__table__), pending)
+        # Импортированные назначения попадают в ленту изменений так же, как назначения через API
+        await AssignmentService(self.db).record_events(
+            "assigned", [(row["employee_id"], row["project_id"]) for row in pending]
+        )
+        state.counts["assignment"] += len(pending)
+
+    async def _insert_returning_ids(self, table, rows: List[dict]) -> List[int]:
+        result = await self.db.execute(insert(table).returning(table.c.id, sort_by_parameter_order=True), rows)
+        return list(result.scalars().all())
+
+
+def _text(record: dict, field: str) -> Optional[str]:
+    value = record.get(field)
+    if value is None:
+        return None
+    return str(value).strip() or None
+
+
+def _flag(record: dict, field: str) -> bool:
+    value = record.get(field)
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes")
+    return bool(value)
@@ -0,0 +1,222 @@
+import asyncio
+import logging
+from typing import Optional
+
+from fastapi import HTTPException, Depends, Request
+from sqlalchemy import func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app import queries
+from app.database import get_db
+from app.models import AssignmentJobORM, EmployeeORM
+from app.schemas.assignment import EmployeeProjectAssignmentByRank
+from app.schemas.job import JobOut
+from app.services.assignment_service import AssignmentService
+from app.utils.clock import utcnow
+
+logger = logging.getLogger("app.jobs")
+
+FINISHED_STATUSES = ("done", "failed", "interrupted")
+
+
+class JobService:
+
+    def __init__(self, db: AsyncSession, runner: Optional["JobRunner"] = None):
+        self.db = db
+        self.runner = runner
+
+    @classmethod
+    def get_dependency(cls, request: Request, db: AsyncSession = Depends(get_db)):
+        return cls(db, getattr(request.app.state, "job_runner", None))
+
+    async def start_assign_by_rank_job(self, assignment_data: EmployeeProjectAssignmentByRank):
+        """
+        Проверяет входные данные так же, как синхронный режим, сохраняет задание и ставит его в очередь.
+        """
+        if self.runner is None:
+            raise HTTPException(status_code=503, detail="Background jobs are not available")
+
+        result = await self.db.execute(queries.project_by_id(assignment_data.project_id))
+        if not result.scalar_one_or_none():
+            raise HTTPException(status_code=404, detail="Project not found")
+
+        result = await self.db.execute(
+            select(func.count(EmployeeORM.id)).filter(EmployeeORM.rank == assignment_data.rank)
+        )
+        total = result.scalar_one()
+        if not total:
+            raise HTTPException(status_code=404, detail=f"No employees with rank {assignment_data.rank} found")
+
+        job = AssignmentJobORM(
+            project_id=assignment_data.project_id,
+            rank=assignment_data.rank,
+            ignore_conflicts=assignment_data.ignore_conflicts,
+            status="queued",
+            total=total,
+            processed=0,
+            assigned=0,
+            skipped_employees=[],
+            created_at=utcnow(),
+        )
+        self.db.add(job)
+        await self.db.commit()
+
+        self.runner.submit(job.id)
+        return {"job_id": job.id, "status": job.status}
+
+    async def get_job(self, job_id: int) -> JobOut:
+        job = await self.db.get(AssignmentJobORM, job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+
+        throughput = None
+        if job.started_at is not None:
+            elapsed = ((job.finished_at or utcnow()) - job.started_at).total_seconds()
+            if elapsed > 0:
+                throughput = round(job.processed / elapsed, 2)
+
+        return JobOut(
+            id=job.id,
+            status=job.status,
+            project_id=job.project_id,
+            rank=job.rank,
+            total=job.total,
+            processed=job.processed,
+            assigned=job.assigned,
+            progress_percent=round(100 * job.processed / job.total, 1) if job.total else 100.0,
+            throughput_per_second=throughput,
+            skipped_employees=job.skipped_employees,
+            error=job.error,
+            created_at=job.created_at,
+            started_at=job.started_at,
+            finished_at=job.finished_at,
+        )
+
+
+class JobRunner:
+    """
+    Фоновые обработчики заданий назначения по рангу внутри процесса.
+    Сотрудники обрабатываются порциями, каждая порция фиксируется отдельной транзакцией
+    вместе с прогрессом задания, поэтому соединение и блокировки не удерживаются на все время работы.
+    """
+
+    def __init__(self, session_factory, chunk_size: int = 500, workers: int = 1):
+        self.session_factory = session_factory
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._tasks = []
+        self._current = set()
+
+    @classmethod
+    def from_settings(cls, session_factory, settings) -> "JobRunner":
+        return cls(session_factory, settings.job_chunk_size, settings.job_workers)
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """
+        Останавливает обработчики; начатые и ожидающие задания этого процесса помечаются как прерванные.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        unfinished = set(self._current)
+        while not self._queue.empty():
+            unfinished.add(self._queue.get_nowait())
+        self._current.clear()
+        if not unfinished:
+            return
+
+        async with self.session_factory() as db:
+            await db.execute(
+                update(AssignmentJobORM)
+                .where(AssignmentJobORM.id.in_(unfinished), AssignmentJobORM.status.notin_(FINISHED_STATUSES))
+                .values(status="interrupted", finished_at=utcnow())
+            )
+            await db.commit()
+
+    def submit(self, job_id: int):
+        self._queue.put_nowait(job_id)
+
+    async def join(self):
+        await self._queue.join()
+
+    async def _work(self):
+        while True:
+            job_id = await self._queue.get()
+            self._current.add(job_id)
+            try:
+                await self.run(job_id)
+            except Exception:
+                logger.exception("Assignment job %s crashed", job_id)
+            finally:
+                self._current.discard(job_id)
+                self._queue.task_done()
+
+    async def run(self, job_id: int):
+        async with self.session_factory() as db:
+            job = await db.get(AssignmentJobORM, job_id)
+            if job is None or job.status != "queued":
+                return
+
+            job.status = "running"
+            job.started_at = utcnow()
+            try:
+                await self._process(db, job)
+            except Exception as exc:
+                await db.rollback()
+                job = await db.get(AssignmentJobORM, job_id)
+                job.status = "failed"
+                job.error = str(exc)
+                job.finished_at = utcnow()
+                await db.commit()
+                raise
+
+    async def _process(self, db: AsyncSession, job: AssignmentJobORM):
+        job_id, project_id = job.id, job.project_id
+
+        result = await db.execute(queries.project_by_id(project_id))
+        project = result.scalar_one_or_none()
+        if project is None:
+            raise LookupError(f"Project {project_id} not found")
+
+        result = await db.execute(
+            select(EmployeeORM.id).filter(EmployeeORM.rank == job.rank).order_by(EmployeeORM.id)
+        )
+        employee_ids = result.scalars().all()
+        job.total = len(employee_ids)
+        await db.commit()
+
+        service = AssignmentService(db)
+        for start in range(0, len(employee_ids), self.chunk_size):
+            chunk_ids = employee_ids[start:start + self.chunk_size]
+            result = await db.execute(
+                select(EmployeeORM.id, EmployeeORM.name, EmployeeORM.rank)
+                .filter(EmployeeORM.id.in_(chunk_ids))
+                .order_by(EmployeeORM.id)
+            )
+            employees = result.all()
+
+            skipped, assigned = await service.assign_employees(project, employees, job.ignore_conflicts)
+            job.processed += len(chunk_ids)
+            job.assigned += assigned
+            # Новый список, чтобы JSON-колонка попала в UPDATE
+            job.skipped_employees = job.skipped_employees + skipped
+            await db.commit()
+
+            # Обработанная порция больше не нужна: не даем карте идентичности расти вместе с заданием
+            db.expunge_all()
+            job = await db.get(AssignmentJobORM, job_id)
+            result = await db.execute(queries.project_by_id(project_id))
+            project = result.scalar_one_or_none()
+            if project is None:
+                raise LookupError(f"Project {project_id} was deleted")
+
+        job.status = "done"
+        job.finished_at = utcnow()
+        await db.commit()
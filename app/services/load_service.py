@@ -0,0 +1,182 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, delete, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app import queries
+from app.models import EmployeeLoadORM, EmployeeProjectAssignmentORM, ProjectORM
+from app.utils.rank_rules import AssignmentProfile
+
+BATCH_SIZE = 5000
+
+
+async def resolve_root_id(db: AsyncSession, project: ProjectORM) -> Optional[int]:
+    """
+    Корень дерева проекта; для подпроекта - одним рекурсивным запросом.
+    """
+    if project.parent_id is None:
+        return project.id
+    result = await db.execute(queries.root_id(project.id))
+    return result.scalar_one_or_none()
+
+
+async def load_assignment_profile(db: AsyncSession, employee_id: int) -> AssignmentProfile:
+    """
+    Сводка назначений сотрудника для проверки правил ранга: одно чтение по первичному ключу employee_load.
+    """
+    load = EmployeeLoadORM.__table__
+    result = await db.execute(
+        select(load.c.root_project_id, load.c.is_top_level, load.c.subproject_count, load.c.assignment_count)
+        .where(load.c.employee_id == employee_id)
+    )
+    return AssignmentProfile.from_counters(result.all())
+
+
+async def load_assignment_profiles(db: AsyncSession, employee_ids: Iterable[int]) -> Dict[int, AssignmentProfile]:
+    """
+    Сводки назначений нескольких сотрудников из employee_load: один запрос на пачку из BATCH_SIZE сотрудников.
+    Сотрудник без назначений получает пустую сводку.
+    """
+    employee_ids = list(employee_ids)
+    counters: Dict[int, list] = {employee_id: [] for employee_id in employee_ids}
+    load = EmployeeLoadORM.__table__
+    for start in range(0, len(employee_ids), BATCH_SIZE):
+        result = await db.execute(
+            select(load.c.employee_id, load.c.root_project_id, load.c.is_top_level, load.c.subproject_count,
+                   load.c.assignment_count)
+            .where(load.c.employee_id.in_(employee_ids[start:start + BATCH_SIZE]))
+        )
+        for employee_id, *row in result.all():
+            counters[employee_id].append(row)
+    return {employee_id: AssignmentProfile.from_counters(rows) for employee_id, rows in counters.items()}
+
+
+async def adjust_employee_load(db: AsyncSession, employee_ids: Iterable[int], parent_id: Optional[int],
+                               root_id: int, delta: int):
+    """
+    Учитывает назначение (delta=1) или снятие (delta=-1) сотрудников с одного проекта.
+    Вызывается в транзакции самого изменения; строки без назначений удаляются.
+    """
+    rows = [{"employee_id": employee_id, "root_project_id": root_id} for employee_id in employee_ids]
+    if not rows:
+        return
+
+    is_top_level = parent_id is None
+    subprojects = 1 if parent_id == root_id else 0
+    load = EmployeeLoadORM.__table__
+
+    dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+    statement = dialect.insert(load).values(
+        is_top_level=is_top_level and delta > 0,
+        subproject_count=max(subprojects * delta, 0),
+        assignment_count=max(delta, 0),
+    )
+    update_top_level = {"is_top_level": delta > 0} if is_top_level else {}
+    statement = statement.on_conflict_do_update(
+        index_elements=[load.c.employee_id, load.c.root_project_id],
+        set_={
+            **update_top_level,
+            "subproject_count": load.c.subproject_count + subprojects * delta,
+            "assignment_count": load.c.assignment_count + delta,
+        },
+    )
+    await db.execute(statement, rows)
+
+    if delta < 0:
+        await db.execute(
+            delete(load).where(load.c.root_project_id == root_id, load.c.assignment_count <= 0,
+                               load.c.employee_id.in_([row["employee_id"] for row in rows]))
+        )
+
+
+def _subtree_ids(project_id: int):
+    projects = ProjectORM.__table__
+    tree = select(projects.c.id).where(projects.c.id == project_id).cte(name="tree", recursive=True)
+    child = projects.alias("child")
+    tree = tree.union(select(child.c.id).join(tree, child.c.parent_id == tree.c.id))
+    return select(tree.c.id)
+
+
+async def employees_in_subtree(db: AsyncSession, project_id: int) -> List[int]:
+    """
+    Сотрудники, назначенные на проект или любой его подпроект: их счетчики меняются
+    при удалении или переносе поддерева.
+    """
+    assignments = EmployeeProjectAssignmentORM.__table__
+    result = await db.execute(
+        select(assignments.c.employee_id).distinct().where(assignments.c.project_id.in_(_subtree_ids(project_id)))
+    )
+    return list(result.scalars().all())
+
+
+async def assignments_in_subtree(db: AsyncSession, project_id: int) -> List[Tuple[int, int]]:
+    """
+    Пары (employee_id, project_id) назначений на проект и его подпроекты: при удалении поддерева
+    они снимаются каскадом и попадают в ленту событиями removed.
+    """
+    assignments = EmployeeProjectAssignmentORM.__table__
+    result = await db.execute(
+        select(assignments.c.employee_id, assignments.c.project_id)
+        .where(assignments.c.project_id.in_(_subtree_ids(project_id)))
+        .order_by(assignments.c.project_id, assignments.c.employee_id)
+    )
+    return [tuple(row) for row in result.all()]
+
+
+def _counters_select(employee_ids=None):
+    """
+    Счетчики employee_load, посчитанные по назначениям: рекурсивный CTE находит корень каждого проекта.
+    """
+    projects = ProjectORM.__table__
+    assignments = EmployeeProjectAssignmentORM.__table__
+
+    roots = (
+        select(projects.c.id, projects.c.id.label("root_id"))
+        .where(projects.c.parent_id.is_(None))
+        .cte(name="roots", recursive=True)
+    )
+    child = projects.alias("child")
+    roots = roots.union_all(select(child.c.id, roots.c.root_id).join(roots, child.c.parent_id == roots.c.id))
+
+    query = (
+        select(
+            assignments.c.employee_id,
+            roots.c.root_id,
+            func.max(case((projects.c.parent_id.is_(None), 1), else_=0)) == 1,
+            func.sum(case((projects.c.parent_id == roots.c.root_id, 1), else_=0)),
+            func.count(),
+        )
+        .join(projects, projects.c.id == assignments.c.project_id)
+        .join(roots, roots.c.id == assignments.c.project_id)
+        .group_by(assignments.c.employee_id, roots.c.root_id)
+    )
+    if employee_ids is not None:
+        query = query.where(assignments.c.employee_id.in_(employee_ids))
+    return query
+
+
+async def rebuild_employee_load(db: AsyncSession, employee_ids=None) -> int:
+    """
+    Пересчитывает employee_load по назначениям: для перечисленных сотрудников или целиком.
+    Исправляет расхождения после массовых изменений в обход сервисов. Без коммита,
+    возвращает число записанных строк.
+    """
+    load = EmployeeLoadORM.__table__
+    columns = [load.c.employee_id, load.c.root_project_id, load.c.is_top_level, load.c.subproject_count,
+               load.c.assignment_count]
+
+    if employee_ids is None:
+        await db.execute(delete(load))
+        result = await db.execute(load.insert().from_select(columns, _counters_select()))
+        return result.rowcount
+
+    employee_ids = list(employee_ids)
+    written = 0
+    for start in range(0, len(employee_ids), BATCH_SIZE):
+        batch = employee_ids[start:start + BATCH_SIZE]
+        await db.execute(delete(load).where(load.c.employee_id.in_(batch)))
+        result = await db.execute(load.insert().from_select(columns, _counters_select(batch)))
+        written += result.rowcount
+    return written
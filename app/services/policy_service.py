@@ -0,0 +1,186 @@
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.database import get_read_db
+from app.models import EmployeeORM, EmployeeProjectAssignmentORM
+from app.schemas.policy import EmployeeImpact, PolicySimulationRequest, PolicySimulationResult
+from app.utils.forest import load_forest
+from app.utils.hierarchy import HierarchyIndex, current_forest, get_hierarchy
+from app.utils.rank_rules import DEFAULT_POLICY, RankLimits
+
+STREAM_BATCH_SIZE = 10000
+
+
+class AssignmentStats:
+    """
+    Сводки назначений всех сотрудников в параллельных массивах (по элементу на сотрудника):
+    назначений всего, верхнеуровневых проектов, наибольшее число прямых подпроектов в одном
+    из назначенных верхнеуровневых проектов и подпроектов вне назначенных верхнеуровневых.
+    Сводка не зависит от ранга и лимитов, поэтому любая политика проверяется по ней за O(1) на сотрудника.
+    """
+
+    def __init__(self):
+        self.employee_ids = array("q")
+        self.total = array("l")
+        self.top_level = array("l")
+        self.max_subprojects = array("l")
+        self.outside = array("l")
+        self.assignments = 0
+
+    def append(self, employee_id: int, project_ids: List[int], forest):
+        top_level = set()
+        for project_id in project_ids:
+            if forest.parent_of(project_id) is None:
+                top_level.add(project_id)
+
+        subprojects: Dict[int, int] = {}
+        outside = 0
+        for project_id in project_ids:
+            parent_id = forest.parent_of(project_id)
+            if parent_id is None:
+                continue
+            root_id = forest.root_of(project_id)
+            if root_id not in top_level:
+                outside += 1
+            elif parent_id == root_id:
+                subprojects[root_id] = subprojects.get(root_id, 0) + 1
+
+        self.employee_ids.append(employee_id)
+        self.total.append(len(project_ids))
+        self.top_level.append(len(top_level))
+        self.max_subprojects.append(max(subprojects.values(), default=0))
+        self.outside.append(outside)
+        self.assignments += len(project_ids)
+
+
+def violated_rules(limits: Optional[RankLimits], total: int, top_level: int, max_subprojects: int,
+                   outside: int) -> List[str]:
+    """
+    Нарушенные правила по сводке сотрудника; имена правил совпадают с аудитом.
+    """
+    if limits is None:
+        return ["unsupported_rank"]
+
+    rules = []
+    if limits.max_top_level is not None and top_level > limits.max_top_level:
+        rules.append("top_level_limit")
+    if limits.max_subprojects is not None and max_subprojects > limits.max_subprojects:
+        rules.append("subproject_limit")
+    # Первое назначение разрешено всегда, поэтому единственный подпроект нарушением не считается
+    if limits.requires_top_level and outside and total > 1:
+        rules.append("subproject_outside_top_level")
+    return rules
+
+
+def apply_overrides(request: PolicySimulationRequest) -> Dict[str, RankLimits]:
+    policy = dict(DEFAULT_POLICY)
+    for rank, override in request.limits.items():
+        current = policy.get(rank.value, RankLimits(None, None, False))
+        policy[rank.value] = current._replace(**{
+            field: getattr(override, field)
+            for field in override.model_fields_set
+            if not (field == "requires_top_level" and override.requires_top_level is None)
+        })
+    return policy
+
+
+class PolicyService:
+
+    def __init__(self, db: AsyncSession, hierarchy: Optional[HierarchyIndex] = None):
+        self.db = db
+        self.hierarchy = hierarchy
+
+    @classmethod
+    def get_read_dependency(cls, request: Request, db: AsyncSession = Depends(get_read_db)):
+        return cls(db, get_hierarchy(request))
+
+    async def load_stats(self) -> Tuple[AssignmentStats, Dict[int, str]]:
+        """
+        Сводки назначений и ранги сотрудников. Дерево берется из индекса иерархии процесса, догнанного
+        по журналу; назначение на проект, которого индекс не знает, - повод прочитать лес из базы.
+        """
+        result = await self.db.execute(select(EmployeeORM.id, EmployeeORM.rank))
+        ranks = dict(result.all())
+
+        stats = await self._stream_stats(await current_forest(self.db, self.hierarchy))
+        if stats is None:
+            stats = await self._stream_stats(await load_forest(self.db))
+        return stats, ranks
+
+    async def _stream_stats(self, forest) -> Optional[AssignmentStats]:
+        index = forest if isinstance(forest, HierarchyIndex) else None
+        stats = AssignmentStats()
+        # Назначения читаются потоком, упорядоченные по сотруднику: в памяти только текущий сотрудник
+        result = await self.db.stream(
+            select(EmployeeProjectAssignmentORM.employee_id, EmployeeProjectAssignmentORM.project_id)
+            .order_by(EmployeeProjectAssignmentORM.employee_id)
+            .execution_options(yield_per=STREAM_BATCH_SIZE)
+        )
+        current_id, project_ids = None, []
+        async for partition in result.partitions():
+            for employee_id, project_id in partition:
+                if index is not None and not index.contains(project_id):
+                    await result.close()
+                    return None
+                if employee_id != current_id:
+                    if project_ids:
+                        stats.append(current_id, project_ids, forest)
+                    current_id, project_ids = employee_id, []
+                project_ids.append(project_id)
+        if project_ids:
+            stats.append(current_id, project_ids, forest)
+        return stats
+
+    async def simulate(self, request: PolicySimulationRequest) -> PolicySimulationResult:
+        """
+        Показывает, кто начнет или перестанет нарушать правила при новых рангах и лимитах.
+        Назначения читаются один раз в компактные сводки, затем текущая и предлагаемая политика
+        проверяются одним проходом по массивам.
+        """
+        started = time.perf_counter()
+        stats, ranks = await self.load_stats()
+
+        unknown = sorted(set(request.rank_changes) - set(ranks))
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown employees: {unknown[:20]}")
+
+        policy = apply_overrides(request)
+        rank_changes = {employee_id: rank.value for employee_id, rank in request.rank_changes.items()}
+
+        violating_before = violating_after = 0
+        by_rank: Dict[str, int] = {}
+        newly_violating, resolved = [], []
+        for index, employee_id in enumerate(stats.employee_ids):
+            profile = (stats.total[index], stats.top_level[index], stats.max_subprojects[index], stats.outside[index])
+            rank_before = ranks.get(employee_id)
+            rank_after = rank_changes.get(employee_id, rank_before)
+
+            before = violated_rules(DEFAULT_POLICY.get(rank_before), *profile)
+            after = violated_rules(policy.get(rank_after), *profile)
+            violating_before += bool(before)
+            if after:
+                violating_after += 1
+                by_rank[rank_after] = by_rank.get(rank_after, 0) + 1
+
+            if after and not before and len(newly_violating) < request.max_listed:
+                newly_violating.append(EmployeeImpact(employee_id=employee_id, rank_before=rank_before,
+                                                      rank_after=rank_after, rules=after))
+            elif before and not after and len(resolved) < request.max_listed:
+                resolved.append(EmployeeImpact(employee_id=employee_id, rank_before=rank_before,
+                                               rank_after=rank_after, rules=before))
+
+        return PolicySimulationResult(
+            employees_evaluated=len(stats.employee_ids),
+            assignments_evaluated=stats.assignments,
+            violating_before=violating_before,
+            violating_after=violating_after,
+            violating_after_by_rank=by_rank,
+            newly_violating=newly_violating,
+            resolved=resolved,
+            elapsed_ms=round((time.perf_counter() - started) * 1000, 1),
+        )
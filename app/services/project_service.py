@@ -1,31 +1,77 @@
-from typing import List
+from typing import List, Optional, Tuple
 
-from fastapi import HTTPException, Depends
+from fastapi import HTTPException, Depends, Request
+from sqlalchemy import func, insert, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 
-from ..database import get_db
-from ..models import ProjectORM
-from ..schemas.project import ProjectOut, ProjectCreate
+from .. import queries
+from ..database import get_db, get_read_db
+from ..models import EmployeeORM, ProjectORM, ProjectEventORM, EmployeeProjectAssignmentORM
+from ..schemas.project import ProjectOut, ProjectCreate, ProjectMove, ProjectMoveConflict, ProjectMoveResult
+from ..utils.clock import utcnow
+from ..utils.forest import load_forest
+from ..utils.hierarchy import HierarchyIndex, current_forest, get_hierarchy
+from ..utils.rank_rules import DEFAULT_POLICY
+from .audit_service import MESSAGES, UNSUPPORTED_RANK_MESSAGE
+from .change_stream import lock_event_log
+from .assignment_service import AssignmentService
+from .load_service import _subtree_ids, assignments_in_subtree, employees_in_subtree, rebuild_employee_load
+from .policy_service import AssignmentStats, violated_rules
+
+# Ключ транзакционной advisory-блокировки переносов в дереве проектов (PostgreSQL)
+TREE_LOCK_KEY = 0x74726565
 
 
 class ProjectService:
-    def __init__(self, db):
+    def __init__(self, db, hierarchy: Optional[HierarchyIndex] = None):
         self.db = db
+        self.hierarchy = hierarchy
+
+    @classmethod
+    def get_dependency(cls, request: Request, db: AsyncSession = Depends(get_db)):
+        return cls(db, get_hierarchy(request))
 
     @classmethod
-    def get_dependency(cls, db: AsyncSession = Depends(get_db)):
-        return cls(db)
+    def get_read_dependency(cls, request: Request, db: AsyncSession = Depends(get_read_db)):
+        return cls(db, get_hierarchy(request))
+
+    async def record_event(self, action: str, project_id: int, parent_id):
+        """
+        Пишет событие изменения дерева проектов той же транзакцией, что и само изменение.
+        """
+        await self.record_events(action, [(project_id, parent_id)])
+
+    async def record_events(self, action: str, pairs):
+        """
+        Пишет события дерева проектов для пар (project_id, parent_id) одной пачкой.
+        """
+        created_at = utcnow()
+        rows = [{"project_id": project_id, "parent_id": parent_id, "action": action, "created_at": created_at}
+                for project_id, parent_id in pairs]
+        if rows:
+            await lock_event_log(self.db)
+            await self.db.execute(insert(ProjectEventORM.__table__), rows)
+
+    async def lock_tree(self):
+        """
+        Выстраивает переносы проектов друг за другом до коммита. Без этого встречные переносы
+        (A под B и B под A) проверяют цикл по данным до коммита друг друга и оба проходят.
+        В PostgreSQL - транзакционная advisory-блокировка; в SQLite единственную блокировку записи
+        транзакция получает на UPDATE, поэтому цикл перепроверяется после него (см. move_project).
+        """
+        if self.db.bind.dialect.name == "postgresql":
+            await self.db.execute(select(func.pg_advisory_xact_lock(TREE_LOCK_KEY)))
 
     async def get_all_projects(self) -> List[ProjectOut]:
         """
         Получает список всех верхнеуровневых проектов с их подпроектами.
         """
-        # Получение верхнеуровневых проектов
+        # Получение верхнеуровневых проектов вместе с подпроектами: два запроса независимо от числа корней
         result = await self.db.execute(
             select(ProjectORM)
-            .options(selectinload(ProjectORM.parent))
+            .options(selectinload(ProjectORM.subprojects))
             .filter(ProjectORM.parent_id.is_(None))
         )
         db_projects = result.scalars().all()
@@ -36,16 +82,10 @@ class ProjectService:
         projects_out = []
 
         for project in db_projects:
-            # Получение подпроектов для текущего верхнеуровневого проекта
-            subprojects = await self.db.execute(
-                select(ProjectORM).filter(ProjectORM.parent_id == project.id)
-            )
-            subprojects = subprojects.scalars().all()
-
             # Формируем вложенные подпроекты
             subproject_outs = [
                 ProjectOut(id=sub.id, name=sub.name, parent_id=sub.parent_id)
-                for sub in subprojects
+                for sub in project.subprojects
             ]
 
             # Формируем верхнеуровневый проект с вложенными подпроектами
@@ -68,10 +108,14 @@ class ProjectService:
         # Создание объекта ORM
         db_project = ProjectORM(name=project.name, parent_id=project.parent_id)
         self.db.add(db_project)
+        await self.db.flush()
+        await self.record_event("created", db_project.id, db_project.parent_id)
 
         # Коммит изменений и обновление объекта
         await self.db.commit()
         await self.db.refresh(db_project)
+        if self.hierarchy is not None:
+            self.hierarchy.add(db_project.id, db_project.parent_id)
 
         # Возврат объекта схемы
         return ProjectOut(
@@ -80,9 +124,10 @@ class ProjectService:
             parent_id=db_project.parent_id
         )
 
-    async def get_project(self, project_id: int) -> ProjectOut:
+    async def get_project(self, project_id: int) -> Tuple[ProjectOut, int]:
         """
-        Получает проект с указанным ID, включая родительский и дочерние проекты.
+        Получает проект с указанным ID, включая родительский и дочерние проекты,
+        и текущую версию строки для ETag.
         """
         # Запрос проекта с родителем и дочерними проектами
         query = (
@@ -107,7 +152,7 @@ class ProjectService:
                     name=db_project.parent.name,
                     parent_id=db_project.parent.parent_id
                 )
-            )
+            ), db_project.version
 
         # Если проект основной, добавляем дочерние проекты
         subprojects = [
@@ -118,7 +163,7 @@ class ProjectService:
             name=db_project.name,
             parent_id=db_project.parent_id,
             subprojects=subprojects
-        )
+        ), db_project.version
 
     async def delete_project(self, project_id: int) -> dict:
         """
@@ -131,7 +176,144 @@ class ProjectService:
         if db_project is None:
             raise HTTPException(status_code=404, detail="Project not found")
 
+        # Назначения поддерева удаляются вместе с проектом: счетчики их сотрудников пересчитываются,
+        # а в ленту пишутся события removed, чтобы подписчики не хранили снятые каскадом назначения
+        removed = await assignments_in_subtree(self.db, db_project.id)
+        employee_ids = sorted({employee_id for employee_id, _ in removed})
+
         # Удаление проекта
         await self.db.delete(db_project)
+        await self.db.flush()
+        if employee_ids:
+            await rebuild_employee_load(self.db, employee_ids)
+        await AssignmentService(self.db).record_events("removed", removed)
+        await self.record_event("deleted", db_project.id, db_project.parent_id)
         await self.db.commit()
+        if self.hierarchy is not None:
+            self.hierarchy.remove(db_project.id)
         return {"message": "Project deleted successfully"}
+
+    async def move_project(self, project_id: int, move: ProjectMove,
+                           expected_versions: Optional[List[int]] = None) -> Tuple[ProjectMoveResult, int]:
+        """
+        Переносит проект вместе с поддеревом под другого родителя.
+        Цикл проверяется одним запросом предков нового родителя; затем правила рангов
+        пересчитываются разом для всех сотрудников, назначенных в поддерево, по лесу до и после переноса.
+        Новые нарушения возвращаются конфликтом 409, с ignore_conflicts перенос выполняется все равно.
+        Перенос применяется условным UPDATE по прочитанной версии: параллельное изменение проекта
+        дает 412 (с If-Match) или 409. Переносы выполняются под lock_tree, а цикл перепроверяется
+        после UPDATE, поэтому встречные переносы не могут вместе образовать цикл.
+        """
+        result = await self.db.execute(queries.project_by_id(project_id))
+        db_project = result.scalar_one_or_none()
+        if db_project is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+        version = db_project.version
+        if expected_versions is not None and version not in expected_versions:
+            raise HTTPException(status_code=412, detail="Project was modified by another request")
+
+        await self.lock_tree()
+        if move.parent_id is not None:
+            result = await self.db.execute(queries.ancestor_ids(move.parent_id))
+            ancestor_ids = set(result.scalars().all())
+            if not ancestor_ids:
+                raise HTTPException(status_code=404, detail="Parent project not found")
+            if db_project.id in ancestor_ids:
+                raise HTTPException(status_code=400, detail="Проект нельзя перенести в его собственное поддерево")
+
+        if move.parent_id == db_project.parent_id:
+            return ProjectMoveResult(project=ProjectOut(id=db_project.id, name=db_project.name,
+                                                        parent_id=db_project.parent_id),
+                                     moved=False, employees_checked=0), version
+
+        conflicts, employees_checked = await self.find_move_conflicts(db_project.id, move.parent_id)
+        if conflicts and not move.ignore_conflicts:
+            raise HTTPException(status_code=409, detail={
+                "message": "Перенос нарушит правила рангов",
+                "conflicts": [conflict.model_dump() for conflict in conflicts],
+            })
+
+        result = await self.db.execute(
+            update(ProjectORM)
+            .where(ProjectORM.id == db_project.id, ProjectORM.version == version)
+            .values(parent_id=move.parent_id, version=ProjectORM.version + 1)
+            .returning(ProjectORM.version)
+        )
+        new_version = result.scalar_one_or_none()
+        if new_version is None:
+            raise HTTPException(status_code=412 if expected_versions is not None else 409,
+                                detail="Project was modified by another request")
+
+        if move.parent_id is not None:
+            # Встречный перенос мог закоммититься между проверкой и UPDATE (SQLite): теперь он виден
+            result = await self.db.execute(queries.ancestor_ids(move.parent_id))
+            if db_project.id in set(result.scalars().all()):
+                await self.db.rollback()
+                raise HTTPException(status_code=409, detail="Проект был перенесен параллельным запросом, "
+                                                            "перенос образовал бы цикл")
+
+        # Корни назначений поддерева изменились: счетчики его сотрудников пересчитываются в той же транзакции
+        employee_ids = await employees_in_subtree(self.db, db_project.id)
+        if employee_ids:
+            await rebuild_employee_load(self.db, employee_ids)
+
+        project_out = ProjectOut(id=db_project.id, name=db_project.name, parent_id=move.parent_id)
+        await self.record_event("moved", db_project.id, move.parent_id)
+        await self.db.commit()
+        if self.hierarchy is not None:
+            self.hierarchy.move(db_project.id, move.parent_id)
+
+        return ProjectMoveResult(project=project_out, moved=True, employees_checked=employees_checked,
+                                 conflicts=conflicts), new_version
+
+    async def find_move_conflicts(self, project_id: int, parent_id):
+        """
+        Сотрудники из переносимого поддерева, которые после переноса начнут нарушать правила рангов.
+        Назначения всех затронутых сотрудников читаются одним запросом; поддерево отбирается
+        рекурсивным запросом в базе, лес (индекс процесса или, если он не знает какого-то из проектов
+        сотрудников, лес из базы) нужен только для профилей до и после переноса.
+        """
+        subtree_employees = (
+            select(EmployeeProjectAssignmentORM.employee_id)
+            .filter(EmployeeProjectAssignmentORM.project_id.in_(_subtree_ids(project_id)))
+        )
+        result = await self.db.execute(
+            select(EmployeeORM.id, EmployeeORM.name, EmployeeORM.rank, EmployeeProjectAssignmentORM.project_id)
+            .join(EmployeeProjectAssignmentORM, EmployeeProjectAssignmentORM.employee_id == EmployeeORM.id)
+            .filter(EmployeeORM.id.in_(subtree_employees))
+            .order_by(EmployeeORM.id)
+        )
+        employees = {}
+        for employee_id, name, rank, assigned_project_id in result.all():
+            employees.setdefault(employee_id, (name, rank, []))[2].append(assigned_project_id)
+
+        known_ids = {project_id} if parent_id is None else {project_id, parent_id}
+        for _, _, project_ids in employees.values():
+            known_ids.update(project_ids)
+        forest = await current_forest(self.db, self.hierarchy)
+        if not all(forest.contains(known_id) for known_id in known_ids):
+            forest = await load_forest(self.db)
+        moved_forest = forest.moved(project_id, parent_id)
+
+        before, after = AssignmentStats(), AssignmentStats()
+        for employee_id, (_, _, project_ids) in employees.items():
+            before.append(employee_id, project_ids, forest)
+            after.append(employee_id, project_ids, moved_forest)
+
+        conflicts = []
+        for index, (employee_id, (name, rank, _)) in enumerate(employees.items()):
+            limits = DEFAULT_POLICY.get(rank)
+            rules_before = violated_rules(limits, before.total[index], before.top_level[index],
+                                          before.max_subprojects[index], before.outside[index])
+            rules_after = violated_rules(limits, after.total[index], after.top_level[index],
+                                         after.max_subprojects[index], after.outside[index])
+            new_rules = [rule for rule in rules_after if rule not in rules_before]
+            if new_rules:
+                conflicts.append(ProjectMoveConflict(
+                    employee_id=employee_id,
+                    name=name,
+                    rank=rank,
+                    rules=new_rules,
+                    messages=[MESSAGES.get((rule, rank), UNSUPPORTED_RANK_MESSAGE) for rule in new_rules],
+                ))
+        return conflicts, len(employees)
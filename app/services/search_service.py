@@ -0,0 +1,83 @@
+from fastapi import Depends
+from sqlalchemy import column, func, literal, literal_column, or_, table
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.database import get_read_db
+from app.models import EmployeeORM, ProjectORM
+from app.schemas.employee import EmployeeSearchHit, EmployeeSearchPage
+from app.schemas.project import ProjectSearchHit, ProjectSearchPage
+
+# Токенизатор trigram не находит запросы короче трех символов; такие запросы идут простым LIKE
+MIN_TRIGRAM_LENGTH = 3
+
+
+def _like_pattern(q: str) -> str:
+    escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _fts_phrase(q: str) -> str:
+    # Запрос целиком - одна фраза FTS5: операторы и спецсимволы пользователя не интерпретируются
+    return '"' + q.replace('"', '""') + '"'
+
+
+class SearchService:
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    @classmethod
+    def get_read_dependency(cls, db: AsyncSession = Depends(get_read_db)):
+        return cls(db)
+
+    def _name_search(self, model, columns, q: str, limit: int, offset: int):
+        """
+        Поиск по имени, упорядоченный по релевантности, затем по id.
+        PostgreSQL: подстрока (ILIKE) или нечеткое совпадение (%) по GIN-индексу pg_trgm, ранг - similarity.
+        SQLite: фраза в FTS5-таблице с токенизатором trigram, ранг - bm25.
+        Запрашивается на строку больше страницы, чтобы узнать, есть ли следующая.
+        """
+        name = model.name
+        if self.db.bind.dialect.name == "postgresql":
+            score = func.similarity(name, q)
+            query = select(*columns, score.label("score")).where(
+                or_(name.ilike(_like_pattern(q), escape="\\"), name.op("%")(q))
+            )
+        elif len(q) >= MIN_TRIGRAM_LENGTH:
+            fts = table(f"{model.__tablename__}_fts", column("rowid"))
+            fts_ref = literal_column(fts.name)
+            # bm25 отрицателен и тем меньше, чем лучше совпадение
+            score = -func.bm25(fts_ref)
+            query = (
+                select(*columns, score.label("score"))
+                .select_from(model)
+                .join(fts, fts.c.rowid == model.id)
+                .where(fts_ref.op("MATCH")(_fts_phrase(q)))
+            )
+        else:
+            score = literal(1.0)
+            query = select(*columns, score.label("score")).where(name.like(_like_pattern(q), escape="\\"))
+
+        return query.order_by(score.desc(), model.id).limit(limit + 1).offset(offset)
+
+    async def search_employees(self, q: str, limit: int, offset: int) -> EmployeeSearchPage:
+        result = await self.db.execute(
+            self._name_search(EmployeeORM, (EmployeeORM.id, EmployeeORM.name, EmployeeORM.rank), q, limit, offset)
+        )
+        rows = result.all()
+        return EmployeeSearchPage(
+            items=[EmployeeSearchHit(id=row.id, name=row.name, rank=row.rank, score=row.score) for row in rows[:limit]],
+            next_offset=offset + limit if len(rows) > limit else None,
+        )
+
+    async def search_projects(self, q: str, limit: int, offset: int) -> ProjectSearchPage:
+        result = await self.db.execute(
+            self._name_search(ProjectORM, (ProjectORM.id, ProjectORM.name, ProjectORM.parent_id), q, limit, offset)
+        )
+        rows = result.all()
+        return ProjectSearchPage(
+            items=[ProjectSearchHit(id=row.id, name=row.name, parent_id=row.parent_id, score=row.score)
+                   for row in rows[:limit]],
+            next_offset=offset + limit if len(rows) > limit else None,
+        )
@@ -0,0 +1,219 @@
+import json
+import zlib
+from typing import AsyncIterable, AsyncIterator, Dict, List
+
+from fastapi import Request
+from sqlalchemy import delete, func, insert, literal, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.database import Database, get_database
+from app.models import EmployeeORM, ProjectORM, ProjectEventORM, EmployeeProjectAssignmentORM
+from app.services.change_stream import lock_event_log
+from app.services.load_service import rebuild_employee_load
+from app.utils.clock import utcnow
+from app.utils.streaming import iter_lines
+
+SNAPSHOT_FORMAT = "accounting-snapshot"
+SNAPSHOT_VERSION = 1
+
+# Порядок зависимостей: проекты и сотрудники раньше назначений
+TABLES = [ProjectORM.__table__, EmployeeORM.__table__, EmployeeProjectAssignmentORM.__table__]
+
+BATCH_SIZE = 5000
+# gzip-контейнер для zlib
+GZIP_WBITS = 31
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _projects_parents_first():
+    """
+    Проекты в порядке глубины: родитель всегда вставляется при восстановлении раньше подпроектов,
+    даже если после переноса ветки его id больше.
+    """
+    projects = ProjectORM.__table__
+    tree = (
+        select(projects.c.id, literal(0).label("depth"))
+        .where(projects.c.parent_id.is_(None))
+        .cte(name="tree", recursive=True)
+    )
+    tree = tree.union_all(
+        select(projects.c.id, (tree.c.depth + 1).label("depth"))
+        .join(tree, projects.c.parent_id == tree.c.id)
+    )
+    return (
+        select(*projects.c)
+        .join(tree, tree.c.id == projects.c.id)
+        .order_by(tree.c.depth, projects.c.id)
+    )
+
+
+def _export_query(table):
+    if table is ProjectORM.__table__:
+        return _projects_parents_first()
+    return select(*table.c).order_by(*table.primary_key.columns)
+
+
+def _line(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+
+
+class SnapshotService:
+    """
+    Снимок основных таблиц: gzip-поток NDJSON, по секции на таблицу.
+    Секция начинается строкой {"table", "columns"}, строки идут массивами значений,
+    в конце секции - {"end", "rows"} с числом строк для проверки при восстановлении.
+    """
+
+    def __init__(self, database: Database, batch_size: int = BATCH_SIZE):
+        self.database = database
+        self.batch_size = batch_size
+
+    @classmethod
+    def get_dependency(cls, request: Request):
+        return cls(get_database(request))
+
+    async def export(self, compression_level: int = 6) -> AsyncIterator[bytes]:
+        """
+        Читает таблицы серверными курсорами порциями по batch_size и отдает сжатые байты по мере готовности.
+        Чтение идет с реплики, если она настроена.
+        """
+        compressor = zlib.compressobj(compression_level, zlib.DEFLATED, GZIP_WBITS)
+
+        async with self.database.read_session_factory() as session:
+            if session.bind.dialect.name == "postgresql":
+                # Все секции читаются из одного согласованного снимка базы
+                await session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+
+            yield compressor.compress(_line({"format": SNAPSHOT_FORMAT, "version": SNAPSHOT_VERSION}))
+            for table in TABLES:
+                columns = [column.name for column in table.c]
+                buffer = _line({"table": table.name, "columns": columns})
+                rows = 0
+
+                result = await session.stream(
+                    _export_query(table).execution_options(yield_per=self.batch_size)
+                )
+                async for partition in result.partitions():
+                    buffer += b"".join(_line(list(row)) for row in partition)
+                    rows += len(partition)
+                    chunk = compressor.compress(buffer)
+                    buffer = b""
+                    if chunk:
+                        yield chunk
+
+                chunk = compressor.compress(buffer + _line({"end": table.name, "rows": rows}))
+                if chunk:
+                    yield chunk
+
+        yield compressor.flush()
+
+    async def restore(self, chunks: AsyncIterable[bytes]) -> Dict[str, int]:
+        """
+        Заменяет содержимое таблиц снимком в одной транзакции: очищает их, вставляет секции
+        пачками в порядке зависимостей и сверяет число строк с заголовками и с итогом в базе.
+        Событие restored в журнале project_events сообщает индексам иерархии воркеров, что дерево заменено.
+        При любой ошибке транзакция откатывается и данные остаются прежними.
+        """
+        async with self.database.session_factory() as session:
+            try:
+                for table in reversed(TABLES):
+                    await session.execute(delete(table))
+                restored = await self._load(session, iter_lines(_decompressed(chunks)))
+
+                for table in TABLES:
+                    result = await session.execute(select(func.count()).select_from(table))
+                    count = result.scalar_one()
+                    if count != restored[table.name]:
+                        raise SnapshotError(f"{table.name}: expected {restored[table.name]} rows, found {count}")
+
+                await _reset_sequences(session)
+                await rebuild_employee_load(session)
+                await lock_event_log(session)
+                await session.execute(insert(ProjectEventORM.__table__).values(
+                    project_id=0, parent_id=None, action="restored", created_at=utcnow()
+                ))
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+
+        return restored
+
+    async def _load(self, session: AsyncSession, lines: AsyncIterable[str]) -> Dict[str, int]:
+        tables = {table.name: table for table in TABLES}
+        restored: Dict[str, int] = {}
+        header_seen = False
+        table = None
+        columns: List[str] = []
+        batch: List[dict] = []
+        rows = 0
+
+        async for line in lines:
+            if not line.strip():
+                continue
+            value = json.loads(line)
+
+            if not header_seen:
+                if not isinstance(value, dict) or value.get("format") != SNAPSHOT_FORMAT:
+                    raise SnapshotError("Not a snapshot file")
+                if value.get("version") != SNAPSHOT_VERSION:
+                    raise SnapshotError(f"Unsupported snapshot version {value.get('version')}")
+                header_seen = True
+
+            elif isinstance(value, list):
+                if table is None:
+                    raise SnapshotError("Row outside of a table section")
+                batch.append(dict(zip(columns, value)))
+                rows += 1
+                if len(batch) >= self.batch_size:
+                    await session.execute(insert(table), batch)
+                    batch = []
+
+            elif "table" in value:
+                if table is not None or value["table"] not in tables:
+                    raise SnapshotError(f"Unexpected section {value['table']!r}")
+                table = tables[value["table"]]
+                if TABLES.index(table) != len(restored):
+                    raise SnapshotError(f"Section {table.name!r} is out of dependency order")
+                columns, rows = value["columns"], 0
+
+            elif "end" in value:
+                if table is None or value["end"] != table.name:
+                    raise SnapshotError(f"Unexpected end of section {value['end']!r}")
+                if batch:
+                    await session.execute(insert(table), batch)
+                    batch = []
+                if rows != value["rows"]:
+                    raise SnapshotError(f"{table.name}: section declares {value['rows']} rows, read {rows}")
+                restored[table.name] = rows
+                table = None
+
+        if table is not None or len(restored) != len(TABLES):
+            raise SnapshotError("Snapshot is truncated")
+        return restored
+
+
+async def _decompressed(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    decompressor = zlib.decompressobj(GZIP_WBITS)
+    async for chunk in chunks:
+        yield decompressor.decompress(chunk)
+    yield decompressor.flush()
+    if not decompressor.eof:
+        raise SnapshotError("Snapshot is truncated")
+
+
+async def _reset_sequences(session: AsyncSession):
+    """
+    После вставки явных id счетчики PostgreSQL продолжаются с максимального id.
+    """
+    if session.bind.dialect.name != "postgresql":
+        return
+    for table in (ProjectORM.__table__, EmployeeORM.__table__):
+        await session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {table.name}), 0) + 1, false)"
+        ))
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+from typing import Dict
+
+from fastapi import HTTPException, Depends, Request
+from sqlalchemy import delete, distinct, func, insert, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app import queries
+from app.database import get_read_db
+from app.models import EmployeeORM, ProjectORM, EmployeeProjectAssignmentORM, ProjectStatsORM
+from app.schemas.project import ForestStats, ProjectStats
+from app.utils.clock import utcnow
+
+logger = logging.getLogger("app.stats")
+
+# Ключ транзакционной advisory-блокировки пересчета project_stats (PostgreSQL)
+STATS_REFRESH_LOCK_KEY = 0x73746174
+
+
+def _headcount_by_rank(start_filter):
+    """
+    Число разных сотрудников каждого ранга в поддеревьях проектов, отобранных start_filter.
+    Один рекурсивный CTE помечает каждый узел идентификатором стартового проекта, дальше - один GROUP BY.
+    """
+    projects = ProjectORM.__table__
+    assignments = EmployeeProjectAssignmentORM.__table__
+    employees = EmployeeORM.__table__
+
+    tree = (
+        select(projects.c.id, projects.c.id.label("start_id"))
+        .where(start_filter)
+        .cte(name="subtree", recursive=True)
+    )
+    child = projects.alias("child")
+    # UNION вместо UNION ALL: рекурсия завершится даже на зацикленных данных
+    tree = tree.union(
+        select(child.c.id, tree.c.start_id).join(tree, child.c.parent_id == tree.c.id)
+    )
+    return (
+        select(tree.c.start_id, employees.c.rank, func.count(distinct(assignments.c.employee_id)).label("headcount"))
+        .join(assignments, assignments.c.project_id == tree.c.id)
+        .join(employees, employees.c.id == assignments.c.employee_id)
+        .group_by(tree.c.start_id, employees.c.rank)
+    )
+
+
+def _group(rows) -> Dict[int, Dict[str, int]]:
+    by_project: Dict[int, Dict[str, int]] = {}
+    for project_id, rank, headcount in rows:
+        by_project.setdefault(project_id, {})[rank] = headcount
+    return by_project
+
+
+class StatsService:
+
+    def __init__(self, db: AsyncSession, use_summary: bool = False):
+        self.db = db
+        self.use_summary = use_summary
+
+    @classmethod
+    def get_read_dependency(cls, request: Request, db: AsyncSession = Depends(get_read_db)):
+        settings = request.app.state.settings
+        return cls(db, use_summary=bool(settings and settings.project_stats_refresh_seconds))
+
+    async def get_project_stats(self, project_id: int) -> ProjectStats:
+        result = await self.db.execute(queries.project_by_id(project_id))
+        project = result.scalar_one_or_none()
+        if project is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+
+        result = await self.db.execute(_headcount_by_rank(ProjectORM.__table__.c.id == project_id))
+        by_rank = _group(result.all()).get(project_id, {})
+        return ProjectStats(project_id=project.id, name=project.name, headcount=sum(by_rank.values()),
+                            by_rank=by_rank)
+
+    async def get_forest_stats(self, live: bool = False) -> ForestStats:
+        """
+        Статистика по всем верхнеуровневым проектам. Если включен периодический пересчет,
+        данные берутся из сводной таблицы, иначе (или при live) считаются по живым данным.
+        """
+        result = await self.db.execute(
+            select(ProjectORM.id, ProjectORM.name).filter(ProjectORM.parent_id.is_(None)).order_by(ProjectORM.id)
+        )
+        roots = result.all()
+
+        refreshed_at = None
+        if self.use_summary and not live:
+            result = await self.db.execute(
+                select(ProjectStatsORM.root_project_id, ProjectStatsORM.rank, ProjectStatsORM.headcount,
+                       ProjectStatsORM.refreshed_at)
+            )
+            rows = result.all()
+            refreshed_at = min((row.refreshed_at for row in rows), default=None)
+            by_project = _group((row.root_project_id, row.rank, row.headcount) for row in rows)
+        else:
+            result = await self.db.execute(_headcount_by_rank(ProjectORM.__table__.c.parent_id.is_(None)))
+            by_project = _group(result.all())
+
+        return ForestStats(
+            projects=[
+                ProjectStats(project_id=root_id, name=name, headcount=sum(by_project.get(root_id, {}).values()),
+                             by_rank=by_project.get(root_id, {}))
+                for root_id, name in roots
+            ],
+            refreshed_at=refreshed_at,
+        )
+
+
+async def refresh_project_stats(db: AsyncSession) -> bool:
+    """
+    Пересчитывает сводную таблицу одной транзакцией: читатели видят либо старую, либо новую сводку.
+    Пересчитывающий refresher запущен в каждом воркере; в PostgreSQL одновременные delete + insert
+    столкнулись бы по первичному ключу, поэтому пересчет идет под неблокирующей advisory-блокировкой,
+    и воркер, не получивший ее, пропускает свой раз. Возвращает False, если пересчет пропущен.
+    """
+    if db.bind.dialect.name == "postgresql":
+        result = await db.execute(select(func.pg_try_advisory_xact_lock(STATS_REFRESH_LOCK_KEY)))
+        if not result.scalar_one():
+            await db.rollback()
+            return False
+
+    headcount = _headcount_by_rank(ProjectORM.__table__.c.parent_id.is_(None)).subquery()
+    await db.execute(delete(ProjectStatsORM))
+    await db.execute(
+        insert(ProjectStatsORM).from_select(
+            ["root_project_id", "rank", "headcount", "refreshed_at"],
+            select(headcount.c.start_id, headcount.c.rank, headcount.c.headcount, literal(utcnow())),
+        )
+    )
+    await db.commit()
+    return True
+
+
+class ProjectStatsRefresher:
+    """
+    Фоновый пересчет сводной таблицы project_stats с заданным периодом.
+    """
+
+    def __init__(self, session_factory, interval: float):
+        self.session_factory = session_factory
+        self.interval = interval
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                async with self.session_factory() as db:
+                    if not await refresh_project_stats(db):
+                        logger.debug("Project stats refresh skipped: another worker is refreshing")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Project stats refresh failed")
+            await asyncio.sleep(self.interval)
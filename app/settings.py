@@ -0,0 +1,122 @@
+import json
+import os
+from typing import Dict, Literal, Mapping, Optional
+
+from dotenv import load_dotenv
+from pydantic import BaseModel, Field, field_validator
+
+
+class Settings(BaseModel):
+    """
+    Настройки приложения. Каждое поле читается из одноименной переменной окружения
+    в верхнем регистре (db_pool_size -> DB_POOL_SIZE) и проверяется при старте.
+    """
+    database_url: str
+    # Необязательная реплика для чтения: на неё уходят GET-запросы списков и карточек
+    database_replica_url: Optional[str] = None
+    # Сколько секунд после записи клиент читает с основной базы, чтобы видеть свои изменения
+    read_your_writes_seconds: float = Field(default=5.0, ge=0)
+
+    # Журналирование всех запросов (echo) дорогое, поэтому выключено по умолчанию
+    db_echo: bool = False
+
+    # Пул соединений. Размер, переполнение и таймаут применяются к пулам-очередям
+    db_pool_size: int = Field(default=5, ge=1)
+    db_max_overflow: int = Field(default=10, ge=0)
+    db_pool_timeout: float = Field(default=30.0, gt=0)
+    db_pool_pre_ping: bool = False
+    db_pool_recycle: int = Field(default=-1, ge=-1)
+
+    # Размер кэша подготовленных выражений asyncpg на одно соединение (0 - отключить)
+    db_statement_cache_size: int = Field(default=100, ge=0)
+
+    # PRAGMA, применяемые к каждому новому соединению SQLite
+    sqlite_journal_mode: Literal["DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"] = "WAL"
+    sqlite_synchronous: Literal["OFF", "NORMAL", "FULL", "EXTRA"] = "NORMAL"
+    # Положительное значение - число страниц, отрицательное - размер в КиБ
+    sqlite_cache_size: int = -20000
+
+    # Журнал медленных запросов
+    slow_query_log: bool = True
+    slow_query_threshold_ms: float = Field(default=200.0, ge=0)
+    slow_query_redact_params: bool = False
+    slow_query_explain: bool = True
+
+    # При старте открыть соединения пула и прогреть кэш компиляции горячих запросов
+    db_warm_up: bool = True
+
+    # Ограничение нагрузки по группам маршрутов. ADMISSION_LIMITS - JSON вида
+    # {"batch": {"concurrency": 2, "queue": 4}}, дополняющий лимиты по умолчанию
+    admission_enabled: bool = True
+    admission_limits: Dict[str, Dict[str, int]] = Field(default_factory=dict)
+    admission_queue_timeout_seconds: float = Field(default=5.0, gt=0)
+    admission_retry_after_seconds: int = Field(default=1, ge=0)
+
+    # Фоновые задания назначения по рангу (?async=true): размер порции сотрудников
+    # на одну транзакцию и число фоновых обработчиков в процессе
+    job_chunk_size: int = Field(default=500, ge=1)
+    job_workers: int = Field(default=1, ge=1)
+
+    # Поток изменений (SSE): период опроса журналов событий, буфер клиента в сообщениях
+    # (переполнивший его клиент отключается), лимит клиентов на процесс и период keep-alive
+    stream_poll_interval_seconds: float = Field(default=1.0, gt=0)
+    stream_buffer_size: int = Field(default=256, ge=1)
+    stream_max_clients: int = Field(default=1000, ge=1)
+    stream_heartbeat_seconds: float = Field(default=15.0, gt=0)
+
+    # Период пересчета сводной таблицы project_stats; 0 - статистика всегда по живым данным
+    project_stats_refresh_seconds: float = Field(default=0.0, ge=0)
+
+    # Индекс дерева проектов в памяти процесса и период, с которым он догоняет журнал project_events
+    # в фоне (0 - только при обращении путей чтения)
+    hierarchy_index_enabled: bool = True
+    hierarchy_reconcile_seconds: float = Field(default=30.0, ge=0)
+
+    # Сжатие ответов списков (gzip, br при установленном brotli): ответы меньше порога
+    # в байтах отдаются без сжатия; уровень - компромисс между CPU и объемом
+    compression_enabled: bool = True
+    compression_min_size: int = Field(default=1024, ge=0)
+    compression_level: int = Field(default=5, ge=1, le=9)
+
+    class Config:
+        frozen = True
+
+    @field_validator("sqlite_journal_mode", "sqlite_synchronous", mode="before")
+    @classmethod
+    def _upper(cls, value):
+        return value.upper() if isinstance(value, str) else value
+
+    @field_validator("admission_limits", mode="before")
+    @classmethod
+    def _parse_limits(cls, value):
+        return json.loads(value) if isinstance(value, str) else value
+
+    @field_validator("admission_limits")
+    @classmethod
+    def _check_limits(cls, value):
+        for group, limit in value.items():
+            if set(limit) != {"concurrency", "queue"} or limit["concurrency"] < 1 or limit["queue"] < 0:
+                raise ValueError(f"Некорректный лимит для группы {group!r}: {limit}")
+        return value
+
+    @classmethod
+    def from_env(cls, environ: Optional[Mapping[str, str]] = None, **overrides) -> "Settings":
+        """
+        Собирает настройки из переменных окружения. Пустые переменные считаются незаданными.
+        """
+        environ = os.environ if environ is None else environ
+        values = {}
+        for name in cls.model_fields:
+            value = environ.get(name.upper())
+            if value is not None and value.strip() != "":
+                values[name] = value.strip()
+        values.update(overrides)
+        return cls(**values)
+
+
+def load_settings(**overrides) -> Settings:
+    """
+    Читает настройки из окружения, предварительно подгрузив .env.
+    """
+    load_dotenv()
+    return Settings.from_env(**overrides)
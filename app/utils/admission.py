@@ -0,0 +1,157 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+
+from fastapi import HTTPException, Request
+
+# Группы маршрутов и лимиты по умолчанию: (одновременно выполняемых, ожидающих в очереди).
+# Тяжелые пакетные операции держат соединение секундами, поэтому им достаются единицы слотов,
+# а интерактивным запросам - практически неограниченная доля пула.
+DEFAULT_LIMITS = {
+    "batch": {"concurrency": 2, "queue": 4},
+    "list": {"concurrency": 8, "queue": 32},
+    "interactive": {"concurrency": 64, "queue": 256},
+}
+
+
+class Overloaded(Exception):
+    pass
+
+
+class AdmissionLimiter:
+    """
+    Ограничивает число одновременно выполняемых запросов группы и длину очереди ожидающих.
+    Запросы сверх очереди или дождавшиеся таймаута сразу отклоняются.
+    """
+
+    def __init__(self, name: str, concurrency: int, queue: int, queue_timeout: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue = queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    @asynccontextmanager
+    async def admit(self):
+        if self._semaphore.locked():
+            if self.waiting >= self.queue:
+                raise Overloaded(self.name)
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise Overloaded(self.name)
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+
+class AdmissionController:
+    def __init__(self, limits: Dict[str, dict], queue_timeout: float, retry_after: int):
+        self.retry_after = retry_after
+        self.limiters = {
+            name: AdmissionLimiter(name, limit["concurrency"], limit["queue"], queue_timeout)
+            for name, limit in {**DEFAULT_LIMITS, **limits}.items()
+        }
+
+    @classmethod
+    def from_settings(cls, settings) -> "AdmissionController":
+        return cls(settings.admission_limits, settings.admission_queue_timeout_seconds,
+                   settings.admission_retry_after_seconds)
+
+
+def admission(group: str):
+    """
+    Зависимость маршрута: пропускает запрос в пределах лимитов группы,
+    иначе отвечает 503 с Retry-After, не занимая соединение с базой.
+    """
+
+    async def dependency(request: Request):
+        controller = getattr(request.app.state, "admission", None)
+        if controller is None:
+            yield
+            return
+
+        limiter = controller.limiters[group]
+        try:
+            async with limiter.admit():
+                yield
+        except Overloaded:
+            raise HTTPException(
+                status_code=503,
+                detail=f"Service overloaded, retry later ({group})",
+                headers={"Retry-After": str(controller.retry_after)},
+            )
+
+    return dependency
+
+
+class AdmissionSlot:
+    """
+    Слот группы, который потоковый ответ удерживает до конца отдачи тела.
+    Освобождение идемпотентно: его вызывают и конец потока, и выход зависимости, если поток не начался.
+    """
+
+    def __init__(self, context=None):
+        self._context = context
+        self.handed_off = False
+
+    async def release(self):
+        if self._context is not None:
+            context, self._context = self._context, None
+            await context.__aexit__(None, None, None)
+
+    def wrap(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        # Передача отмечается при вызове, а не при первой итерации: выход зависимости наступает раньше
+        self.handed_off = True
+        return self._stream(chunks)
+
+    async def _stream(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        try:
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            await self.release()
+
+
+def streaming_admission(group: str):
+    """
+    Зависимость потокового маршрута. Выход yield-зависимости выполняется до отправки тела
+    StreamingResponse, поэтому admission() освободил бы слот раньше, чем начнется работа.
+    Здесь слот передается телу ответа через AdmissionSlot.wrap и освобождается, когда поток
+    закончился, оборвался или клиент отключился (фоновой задачей ответа).
+    """
+
+    async def dependency(request: Request):
+        controller = getattr(request.app.state, "admission", None)
+        if controller is None:
+            yield AdmissionSlot()
+            return
+
+        context = controller.limiters[group].admit()
+        try:
+            await context.__aenter__()
+        except Overloaded:
+            raise HTTPException(
+                status_code=503,
+                detail=f"Service overloaded, retry later ({group})",
+                headers={"Retry-After": str(controller.retry_after)},
+            )
+        slot = AdmissionSlot(context)
+        try:
+            yield slot
+        finally:
+            if not slot.handed_off:
+                await slot.release()
+
+    return dependency
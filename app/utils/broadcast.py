@@ -0,0 +1,61 @@
+import asyncio
+from typing import Optional, Set
+
+
+class Subscription:
+    """
+    Ограниченный буфер сообщений одного клиента. Клиент, не успевающий забирать сообщения,
+    отключается (dropped), а не замедляет остальных и не раздувает память процесса.
+    """
+
+    def __init__(self, buffer_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(buffer_size)
+        self.dropped = False
+
+    async def get(self, timeout: float) -> Optional[dict]:
+        """
+        Следующее сообщение или None, если за timeout ничего не пришло.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Broadcaster:
+    """
+    Раздача сообщений подписчикам внутри процесса. publish не ждет клиентов:
+    сообщение кладется в буфер каждого подписчика без ожидания.
+    """
+
+    def __init__(self, buffer_size: int = 256, max_subscribers: int = 1000):
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self.subscribers: Set[Subscription] = set()
+        self.dropped_total = 0
+        self._has_subscribers = asyncio.Event()
+
+    def subscribe(self) -> Optional[Subscription]:
+        if len(self.subscribers) >= self.max_subscribers:
+            return None
+        subscription = Subscription(self.buffer_size)
+        self.subscribers.add(subscription)
+        self._has_subscribers.set()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscribers.discard(subscription)
+        if not self.subscribers:
+            self._has_subscribers.clear()
+
+    async def wait_for_subscribers(self):
+        await self._has_subscribers.wait()
+
+    def publish(self, message: dict):
+        for subscription in list(self.subscribers):
+            try:
+                subscription.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                subscription.dropped = True
+                self.dropped_total += 1
+                self.unsubscribe(subscription)
@@ -0,0 +1,8 @@
+from datetime import datetime, timezone
+
+
+def utcnow() -> datetime:
+    """
+    Текущее время UTC без часового пояса: так его хранят колонки DateTime.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
@@ -0,0 +1,177 @@
+import zlib
+from typing import List, Optional, Tuple
+
+from starlette.requests import Request
+
+try:
+    import brotli
+except ImportError:  # brotli указан в requirements.txt, но без него сервис работает и отдает gzip
+    brotli = None
+
+# Ключ в scope запроса, которым маршрут разрешает сжатие своего ответа
+COMPRESS_SCOPE_KEY = "compress_response"
+
+
+def compressible(request: Request):
+    """
+    Зависимость маршрута: ответ можно сжимать. Ставится на списки и выгрузки, где JSON большой
+    и повторяющийся; на короткие карточки и потоковые ответы (SSE) не ставится.
+    """
+    request.scope[COMPRESS_SCOPE_KEY] = True
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Выбирает кодировку по Accept-Encoding: наибольший q среди поддерживаемых, при равенстве br.
+    """
+    supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+    weights = {}
+    for item in accept_encoding.split(","):
+        token, _, params = item.strip().partition(";")
+        token = token.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if token == "*":
+            for encoding in supported:
+                weights.setdefault(encoding, q)
+        elif token in supported:
+            weights[token] = q
+
+    candidates = [(q, -supported.index(encoding), encoding) for encoding, q in weights.items() if q > 0]
+    return max(candidates)[2] if candidates else None
+
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        # wbits=31: поток в контейнере gzip
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+ENCODERS = {"gzip": _GzipEncoder, "br": _BrotliEncoder}
+
+
+def _without(headers: List[Tuple[bytes, bytes]], *names: bytes) -> List[Tuple[bytes, bytes]]:
+    return [(name, value) for name, value in headers if name.lower() not in names]
+
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Сжимает ответы маршрутов с зависимостью compressible, если клиент принимает gzip или br
+    и ответ не меньше compression_min_size байт. Сжатие потоковое: тело до порога копится,
+    дальше каждая порция сжимается и отправляется сразу, так что большой ответ не держится
+    в памяти второй раз. Настройки берутся из app.state.settings.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        settings = getattr(scope["app"].state, "settings", None) if scope["type"] == "http" else None
+        if settings is None or not settings.compression_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = _header(scope["headers"], b"accept-encoding") or b""
+        encoding = negotiate_encoding(accept_encoding.decode("latin-1"))
+        responder = _CompressingResponder(scope, send, encoding, settings.compression_min_size,
+                                          settings.compression_level)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressingResponder:
+
+    def __init__(self, scope, send, encoding: Optional[str], min_size: int, level: int):
+        self.scope = scope
+        self._send = send
+        self.encoding = encoding
+        self.min_size = min_size
+        self.level = level
+        self.start_message = None
+        self.buffer = bytearray()
+        self.encoder = None
+        # Ответ уходит как есть: маршрут не разрешил сжатие, клиент его не принимает или ответ мал
+        self.passthrough = False
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            await self._on_start(message)
+        elif message["type"] == "http.response.body" and not self.passthrough:
+            await self._on_body(message)
+        else:
+            await self._send(message)
+
+    async def _on_start(self, message):
+        if not self.scope.get(COMPRESS_SCOPE_KEY):
+            self.passthrough = True
+            await self._send(message)
+            return
+
+        headers = list(message.get("headers", []))
+        # Представление зависит от Accept-Encoding: кэши должны различать варианты
+        headers.append((b"vary", b"Accept-Encoding"))
+        message = {**message, "headers": headers}
+
+        content_length = _header(headers, b"content-length")
+        too_small = content_length is not None and int(content_length) < self.min_size
+        if (self.encoding is None or message["status"] != 200 or too_small
+                or _header(headers, b"content-encoding") is not None):
+            self.passthrough = True
+            await self._send(message)
+            return
+
+        self.start_message = message
+
+    async def _on_body(self, message):
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.encoder is None:
+            self.buffer.extend(body)
+            if len(self.buffer) < self.min_size:
+                if more_body:
+                    return
+                # Ответ целиком меньше порога: сжатие не окупается
+                await self._send(self.start_message)
+                await self._send({"type": "http.response.body", "body": bytes(self.buffer)})
+                return
+
+            headers = _without(self.start_message["headers"], b"content-length")
+            headers.append((b"content-encoding", self.encoding.encode()))
+            await self._send({**self.start_message, "headers": headers})
+            self.encoder = ENCODERS[self.encoding](self.level)
+            body, self.buffer = bytes(self.buffer), bytearray()
+
+        chunk = self.encoder.compress(body)
+        if not more_body:
+            chunk += self.encoder.finish()
+        if chunk or not more_body:
+            await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
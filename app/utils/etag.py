@@ -0,0 +1,31 @@
+from typing import List, Optional
+
+from fastapi import HTTPException
+
+
+def etag(version: int) -> str:
+    """
+    ETag ресурса по номеру версии строки.
+    """
+    return f'"{version}"'
+
+
+def parse_if_match(header: Optional[str]) -> Optional[List[int]]:
+    """
+    Версии из заголовка If-Match. None - условия нет (заголовок не передан или равен "*").
+    Слабые метки W/"..." принимаются наравне с сильными: версия строки у них одна и та же.
+    """
+    if header is None or header.strip() == "*":
+        return None
+
+    versions = []
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        value = tag.strip('"')
+        if not value.isdigit():
+            # Метка, которую сервер никогда не выдавал, не может совпасть с текущей версией
+            raise HTTPException(status_code=412, detail="Precondition Failed")
+        versions.append(int(value))
+    return versions
@@ -0,0 +1,85 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from ..models import ProjectORM
+
+
+class Forest:
+    """
+    Дерево проектов в памяти: родитель и корень каждого проекта.
+    Корни вычисляются один раз за линейное время; проекты в зацикленных цепочках корня не имеют.
+    """
+
+    def __init__(self, parents: Dict[int, Optional[int]]):
+        self.parents = parents
+        self.roots: Dict[int, Optional[int]] = {}
+        for project_id in parents:
+            self._resolve_root(project_id)
+
+    def _resolve_root(self, project_id: int) -> Optional[int]:
+        path = []
+        on_path = set()
+        current = project_id
+        while current not in self.roots:
+            if current in on_path or current not in self.parents:
+                # Цикл или ссылка на несуществующий проект
+                root = None
+                break
+            path.append(current)
+            on_path.add(current)
+            parent_id = self.parents[current]
+            if parent_id is None:
+                root = current
+                break
+            current = parent_id
+        else:
+            root = self.roots[current]
+
+        for node in path:
+            self.roots[node] = root
+        return root
+
+    def contains(self, project_id: int) -> bool:
+        return project_id in self.parents
+
+    def root_of(self, project_id: int) -> Optional[int]:
+        return self.roots.get(project_id)
+
+    def parent_of(self, project_id: int) -> Optional[int]:
+        return self.parents.get(project_id)
+
+    def subtree(self, project_id: int) -> List[int]:
+        """
+        Проект и все его потомки.
+        """
+        children: Dict[int, List[int]] = {}
+        for child_id, parent_id in self.parents.items():
+            if parent_id is not None:
+                children.setdefault(parent_id, []).append(child_id)
+
+        result, stack, seen = [], [project_id], {project_id}
+        while stack:
+            current = stack.pop()
+            result.append(current)
+            for child_id in children.get(current, ()):
+                if child_id not in seen:
+                    seen.add(child_id)
+                    stack.append(child_id)
+        return result
+
+    def moved(self, project_id: int, parent_id: Optional[int]) -> "Forest":
+        """
+        Копия леса, в которой проект перенесен под другого родителя.
+        """
+        return Forest({**self.parents, project_id: parent_id})
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[int, Optional[int]]]) -> "Forest":
+        return cls({project_id: parent_id for project_id, parent_id in rows})
+
+
+async def load_forest(db: AsyncSession) -> Forest:
+    result = await db.execute(select(ProjectORM.id, ProjectORM.parent_id))
+    return Forest.from_rows(result.all())
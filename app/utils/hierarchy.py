@@ -0,0 +1,389 @@
+import asyncio
+import logging
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from ..models import ProjectEventORM, ProjectORM
+from .forest import load_forest
+
+logger = logging.getLogger("app.hierarchy")
+
+# Значения parent: проекта нет в индексе / проект верхнеуровневый. Идентификаторы проектов положительны
+ABSENT = -1
+TOP_LEVEL = 0
+# Значение root для проекта, корень которого неизвестен (цикл, ссылка на неизвестного родителя)
+NO_ROOT = 0
+# Сколько событий project_events индекс догоняет по одному; при большем отставании он перечитывается целиком
+SYNC_BATCH_SIZE = 1000
+
+
+class HierarchyIndex:
+    """
+    Дерево проектов процесса в параллельных массивах parent, root и depth, индексированных
+    id проекта, и списки детей каждого проекта: корень находится за O(1), проверка предка -
+    подъемом на разницу глубин, перенос и удаление обходят только само поддерево.
+    Загружается при старте и обновляется сервисами после коммита создания, удаления и переноса проекта.
+    Изменения других воркеров, импорта и restore-snapshot индекс узнает из журнала project_events:
+    перед использованием его догоняют по журналу (sync), и он соответствует базе на момент запроса.
+    Проект, записанный в обход журнала, индексу неизвестен - тогда вызывающий читает лес из базы.
+    Добавление назначений берет корень проекта из базы в своей транзакции записи.
+
+    Все изменения синхронны (без await), поэтому в одном цикле событий запросы не видят
+    наполовину обновленный индекс. Изменения, пришедшие во время чтения базы при сверке,
+    накапливаются и повторяются поверх свежих массивов.
+    """
+
+    def __init__(self):
+        self.parent = array("q")
+        self.root = array("q")
+        self.depth = array("l")
+        # id родителя -> его дети; ключом может быть и неизвестный индексу родитель
+        self.children: Dict[int, Set[int]] = {}
+        self.size = 0
+        self.loaded = False
+        # id последнего учтенного события project_events
+        self.cursor = 0
+        self.reconciled_at: Optional[float] = None
+        self._pending: Optional[List[Tuple[str, tuple]]] = None
+
+    # Чтение
+
+    def contains(self, project_id: int) -> bool:
+        return 0 < project_id < len(self.parent) and self.parent[project_id] != ABSENT
+
+    def parent_of(self, project_id: int) -> Optional[int]:
+        if not self.contains(project_id) or self.parent[project_id] == TOP_LEVEL:
+            return None
+        return self.parent[project_id]
+
+    def root_of(self, project_id: int) -> Optional[int]:
+        if not self.contains(project_id) or self.root[project_id] == NO_ROOT:
+            return None
+        return self.root[project_id]
+
+    def depth_of(self, project_id: int) -> Optional[int]:
+        return self.depth[project_id] if self.contains(project_id) else None
+
+    def ancestor_ids(self, project_id: int) -> Set[int]:
+        """
+        Все предки проекта, O(depth).
+        """
+        ancestors = set()
+        current = self.parent_of(project_id)
+        while current is not None and current not in ancestors:
+            ancestors.add(current)
+            current = self.parent_of(current)
+        return ancestors
+
+    def is_ancestor(self, ancestor_id: int, project_id: int) -> bool:
+        """
+        Является ли ancestor_id предком project_id: подъем от проекта на разницу глубин, O(depth).
+        """
+        if self.root_of(project_id) is None or self.root_of(project_id) != self.root_of(ancestor_id):
+            return False
+        current = project_id
+        for _ in range(self.depth[project_id] - self.depth[ancestor_id]):
+            current = self.parent[current]
+        return current == ancestor_id and current != project_id
+
+    # Изменения
+
+    def add(self, project_id: int, parent_id: Optional[int]):
+        """
+        Новый проект. Если родитель индексу неизвестен, корень остается неизвестным до его появления.
+        Повтор для известного проекта (событие из журнала, уже примененное сервисом) равносилен переносу.
+        """
+        if self._record("add", project_id, parent_id):
+            return
+        self._grow(project_id)
+        if not self.contains(project_id):
+            self.size += 1
+        self._attach(project_id, parent_id)
+
+    def remove(self, project_id: int):
+        """
+        Удаляет проект вместе с поддеревом (в базе подпроекты удаляются каскадом).
+        """
+        if self._record("remove", project_id) or not self.contains(project_id):
+            return
+        subtree = self._subtree(project_id)
+        self._detach(project_id)
+        for node in subtree:
+            self.parent[node], self.root[node], self.depth[node] = ABSENT, NO_ROOT, 0
+            self.children.pop(node, None)
+            self.size -= 1
+
+    def move(self, project_id: int, parent_id: Optional[int]):
+        """
+        Переносит поддерево под другого родителя.
+        """
+        if self._record("move", project_id, parent_id) or not self.contains(project_id):
+            return
+        self._attach(project_id, parent_id)
+
+    def moved(self, project_id: int, parent_id: Optional[int]) -> "MovedHierarchy":
+        """
+        Вид индекса, в котором проект перенесен под другого родителя; сам индекс не меняется.
+        """
+        return MovedHierarchy(self, project_id, parent_id)
+
+    def _attach(self, project_id: int, parent_id: Optional[int]):
+        # Родитель проекта меняется, корень и глубина пересчитываются по поддереву сверху вниз
+        self._detach(project_id)
+        self.parent[project_id] = TOP_LEVEL if parent_id is None else parent_id
+        if parent_id is not None:
+            self.children.setdefault(parent_id, set()).add(project_id)
+
+        subtree = self._subtree(project_id)
+        if parent_id is None:
+            self.root[project_id], self.depth[project_id] = project_id, 0
+        elif self.root_of(parent_id) is not None and parent_id not in subtree:
+            self.root[project_id], self.depth[project_id] = self.root[parent_id], self.depth[parent_id] + 1
+        else:
+            # Цикл или неизвестный родитель: корня у поддерева нет
+            self.root[project_id], self.depth[project_id] = NO_ROOT, 0
+        for node in subtree[1:]:
+            parent = self.parent[node]
+            self.root[node] = self.root[parent]
+            self.depth[node] = self.depth[parent] + 1 if self.root[parent] != NO_ROOT else 0
+
+    def _detach(self, project_id: int):
+        parent = self.parent[project_id]
+        if parent > TOP_LEVEL:
+            siblings = self.children.get(parent)
+            if siblings is not None:
+                siblings.discard(project_id)
+                if not siblings:
+                    del self.children[parent]
+
+    def _subtree(self, project_id: int) -> List[int]:
+        """
+        Проект и его потомки в порядке обхода в ширину (родитель раньше детей), O(размер поддерева).
+        """
+        nodes, seen = [project_id], {project_id}
+        for node in nodes:
+            for child in self.children.get(node, ()):
+                if child not in seen:
+                    seen.add(child)
+                    nodes.append(child)
+        return nodes
+
+    def _grow(self, project_id: int):
+        missing = project_id + 1 - len(self.parent)
+        if missing > 0:
+            self.parent.extend([ABSENT] * missing)
+            self.root.extend([NO_ROOT] * missing)
+            self.depth.extend([0] * missing)
+
+    def _record(self, operation: str, *args) -> bool:
+        # Во время чтения базы изменения копятся, чтобы повториться поверх новых массивов
+        if self._pending is None:
+            return False
+        self._pending.append((operation, args))
+        self._apply(operation, args)
+        return True
+
+    def _apply(self, operation: str, args: tuple):
+        pending, self._pending = self._pending, None
+        try:
+            getattr(self, operation)(*args)
+        finally:
+            self._pending = pending
+
+    # Загрузка
+
+    def replace(self, rows: Iterable[Tuple[int, Optional[int]]]):
+        """
+        Заменяет содержимое индекса деревом из пар (id, parent_id) за линейное время.
+        """
+        parents = dict(rows)
+        size = max(parents, default=0) + 1
+        parent = array("q", [ABSENT]) * size
+        root = array("q", [NO_ROOT]) * size
+        depth = array("l", [0]) * size
+        resolved = array("b", [0]) * size
+        children: Dict[int, Set[int]] = {}
+        for project_id, parent_id in parents.items():
+            parent[project_id] = TOP_LEVEL if parent_id is None else parent_id
+            if parent_id is not None:
+                children.setdefault(parent_id, set()).add(project_id)
+
+        for project_id in parents:
+            path, on_path, current = [], set(), project_id
+            while True:
+                if current in on_path or current not in parents:
+                    # Цикл или ссылка на несуществующий проект: корня нет
+                    node_root, node_depth = NO_ROOT, 0
+                    break
+                if resolved[current]:
+                    node_root, node_depth = root[current], depth[current]
+                    break
+                path.append(current)
+                on_path.add(current)
+                if parents[current] is None:
+                    node_root, node_depth = current, -1
+                    break
+                current = parents[current]
+
+            for node in reversed(path):
+                node_depth = node_depth + 1 if node_root != NO_ROOT else 0
+                root[node], depth[node], resolved[node] = node_root, node_depth, 1
+
+        self.parent, self.root, self.depth, self.size = parent, root, depth, len(parents)
+        self.children = children
+        self.loaded = True
+
+    async def reload(self, db: AsyncSession) -> int:
+        """
+        Перечитывает дерево из базы и возвращает число проектов. Курсор журнала читается до проектов:
+        события, попавшие между запросами, будут применены повторно, что безопасно. Изменения,
+        примененные сервисами, пока шел запрос, повторяются поверх прочитанного.
+        """
+        self._pending = pending = []
+        try:
+            result = await db.execute(select(func.coalesce(func.max(ProjectEventORM.id), 0)))
+            cursor = result.scalar_one()
+            result = await db.execute(select(ProjectORM.id, ProjectORM.parent_id))
+            rows = result.all()
+        finally:
+            self._pending = None
+        self.replace(rows)
+        for operation, args in pending:
+            getattr(self, operation)(*args)
+        self.cursor = max(self.cursor, cursor)
+        self.reconciled_at = time.monotonic()
+        return self.size
+
+    async def sync(self, db: AsyncSession) -> bool:
+        """
+        Догоняет индекс по журналу project_events: применяет события после курсора по порядку id
+        (id растут в порядке коммитов, см. lock_event_log). При отставании больше SYNC_BATCH_SIZE
+        событий или после restore-snapshot индекс перечитывается целиком. Когда индекс уже догнан,
+        это один запрос по первичному ключу журнала. Возвращает False, если индекс не загружен.
+        """
+        if not self.loaded:
+            return False
+        events = ProjectEventORM.__table__
+        result = await db.execute(
+            select(events.c.id, events.c.action, events.c.project_id, events.c.parent_id)
+            .where(events.c.id > self.cursor)
+            .order_by(events.c.id)
+            .limit(SYNC_BATCH_SIZE + 1)
+        )
+        rows = result.all()
+        if len(rows) > SYNC_BATCH_SIZE or any(action == "restored" for _, action, _, _ in rows):
+            await self.reload(db)
+            return True
+
+        for event_id, action, project_id, parent_id in rows:
+            # Событие могла уже применить параллельная синхронизация, пока шел запрос
+            if event_id <= self.cursor:
+                continue
+            match action:
+                case "created":
+                    self.add(project_id, parent_id)
+                case "moved":
+                    self.move(project_id, parent_id)
+                case "deleted":
+                    self.remove(project_id)
+            self.cursor = event_id
+        return True
+
+    async def load(self, session_factory):
+        """
+        Первая загрузка при старте. Ошибка не мешает запуску: пока индекс не загружен,
+        пути чтения берут лес из базы, а сверка повторяет загрузку.
+        """
+        try:
+            async with session_factory() as db:
+                count = await self.reload(db)
+            logger.info("Hierarchy index loaded: %s projects", count)
+        except Exception:
+            logger.exception("Hierarchy index load failed, the project forest is read from the database")
+
+
+class MovedHierarchy:
+    """
+    Индекс с поддеревом, перенесенным под другого родителя: отвечает на parent_of и root_of
+    так, как ответил бы индекс после переноса. Нужен для сравнения сводок до и после переноса.
+    """
+
+    def __init__(self, index: HierarchyIndex, project_id: int, parent_id: Optional[int]):
+        self.index = index
+        self.project_id = project_id
+        self.parent_id = parent_id
+        self.subtree = set(index._subtree(project_id))
+        if parent_id is None:
+            self.new_root = project_id
+        elif parent_id in self.subtree:
+            self.new_root = None
+        else:
+            self.new_root = index.root_of(parent_id)
+
+    def contains(self, project_id: int) -> bool:
+        return self.index.contains(project_id)
+
+    def parent_of(self, project_id: int) -> Optional[int]:
+        return self.parent_id if project_id == self.project_id else self.index.parent_of(project_id)
+
+    def root_of(self, project_id: int) -> Optional[int]:
+        return self.new_root if project_id in self.subtree else self.index.root_of(project_id)
+
+
+async def current_forest(db: AsyncSession, index: Optional[HierarchyIndex]):
+    """
+    Лес проектов для проверок в памяти: индекс процесса, догнанный по журналу, а если индекса нет
+    или он не загружен - лес, прочитанный из базы. Встретив проект, которого индекс не знает,
+    вызывающий читает лес из базы (load_forest).
+    """
+    if index is not None and await index.sync(db):
+        return index
+    return await load_forest(db)
+
+
+def get_hierarchy(request) -> Optional[HierarchyIndex]:
+    """
+    Индекс иерархии процесса; None, если он выключен или приложение запущено без lifespan.
+    """
+    return getattr(request.app.state, "hierarchy", None)
+
+
+class HierarchyReconciler:
+    """
+    Периодически догоняет индекс по журналу project_events, чтобы запросам оставалось применить
+    лишь последние события; если загрузка при старте не удалась, повторяет ее.
+    """
+
+    def __init__(self, session_factory, index: HierarchyIndex, interval: float):
+        self.session_factory = session_factory
+        self.index = index
+        self.interval = interval
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                async with self.session_factory() as db:
+                    if self.index.loaded:
+                        await self.index.sync(db)
+                    else:
+                        await self.index.reload(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Hierarchy index reconciliation failed")
@@ -0,0 +1,104 @@
+from typing import Dict, Iterable, NamedTuple, Optional, Set, Tuple
+
+
+class RankLimits(NamedTuple):
+    """
+    Ограничения ранга: верхнеуровневых проектов, прямых подпроектов в каждом из них
+    (None - без ограничения) и обязательность верхнеуровневого проекта для подпроектов.
+    """
+    max_top_level: Optional[int]
+    max_subprojects: Optional[int]
+    requires_top_level: bool
+
+
+# Действующая политика, которую реализуют is_assignment_allowed и check_assignment
+DEFAULT_POLICY: Dict[str, RankLimits] = {
+    "1": RankLimits(None, None, False),
+    "2": RankLimits(3, None, False),
+    "3": RankLimits(2, 2, True),
+    "4": RankLimits(1, 1, True),
+}
+
+
+class AssignmentProfile:
+    """
+    Сводка назначений сотрудника, которой достаточно для проверки правил ранга без обращения к базе:
+    число назначений, назначенные верхнеуровневые проекты и число прямых подпроектов каждого из них.
+    """
+    __slots__ = ("assigned", "top_level", "subproject_count")
+
+    def __init__(self):
+        self.assigned = 0
+        self.top_level: Set[int] = set()
+        self.subproject_count: Dict[int, int] = {}
+
+    def add(self, project_id: int, parent_id: Optional[int], root_id: int):
+        self.assigned += 1
+        if parent_id is None:
+            self.top_level.add(project_id)
+        elif parent_id == root_id:
+            self.subproject_count[root_id] = self.subproject_count.get(root_id, 0) + 1
+
+    @classmethod
+    def from_counters(cls, rows: Iterable[Tuple[int, bool, int, int]]) -> "AssignmentProfile":
+        """
+        Сводка из счетчиков employee_load: (корень, участвует в корне, прямых подпроектов, назначений в дереве).
+        """
+        profile = cls()
+        for root_id, is_top_level, subproject_count, assignment_count in rows:
+            profile.assigned += assignment_count
+            if is_top_level:
+                profile.top_level.add(root_id)
+            if subproject_count:
+                profile.subproject_count[root_id] = subproject_count
+        return profile
+
+
+def check_assignment(rank: str, profile: AssignmentProfile, parent_id: Optional[int],
+                     root_id: int) -> Tuple[bool, str]:
+    """
+    Проверяет назначение на проект по сводке назначений сотрудника.
+    Повторяет is_assignment_allowed: проект описывается родителем и корнем своего дерева.
+    """
+    if not profile.assigned:
+        return True, ""
+
+    top_level = profile.top_level
+    is_root = parent_id is None
+    # Проект на любой глубине под верхнеуровневым проектом, в котором участвует сотрудник
+    under_top = not is_root and root_id in top_level
+
+    match rank:
+        case "1":
+            return True, ""
+
+        case "2":
+            is_valid = len(top_level) < 3 or under_top
+            return is_valid, (
+                "" if is_valid else "Ранг 2: нельзя участвовать более чем в 3 верхнеуровневых проектах"
+            )
+
+        case "3":
+            if is_root:
+                is_valid = len(top_level) < 2
+                return is_valid, (
+                    "" if is_valid else "Ранг 3: нельзя участвовать более чем в 2 верхнеуровневых проектах"
+                )
+            if under_top:
+                is_valid = profile.subproject_count.get(root_id, 0) < 2
+                return is_valid, (
+                    "" if is_valid else "Ранг 3: нельзя участвовать более чем в 2 подпроектах одного верхнеуровневого проекта"
+                )
+            return False, "Ранг 3: подпроект не принадлежит верхнеуровневому проекту, в котором участвует сотрудник"
+
+        case "4":
+            if top_level:
+                if under_top and profile.subproject_count.get(root_id, 0) < 1:
+                    return True, ""
+                return False, "Ранг 4: нельзя участвовать более чем в 1 верхнеуровневом проекте и 1 подпроекте"
+            if is_root:
+                return True, ""
+            return False, "Ранг 4: нельзя назначить проект без основного верхнеуровневого проекта"
+
+        case _:
+            return False, "Неподдерживаемый ранг сотрудника"
@@ -0,0 +1,57 @@
+import time
+from http.cookies import SimpleCookie
+
+from starlette.requests import Request
+
+LAST_WRITE_COOKIE = "last_write_at"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class ReadYourWritesMiddleware:
+    """
+    После успешного изменяющего запроса ставит клиенту cookie с временем записи.
+    Пока окно не истекло, чтение для этого клиента идет с основной базы, а не с реплики.
+    Длительность окна берется из настроек приложения (app.state.settings).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        settings = getattr(scope["app"].state, "settings", None)
+        window_seconds = settings.read_your_writes_seconds if settings is not None else 0
+        if window_seconds <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                cookie = SimpleCookie()
+                cookie[LAST_WRITE_COOKIE] = f"{time.time():.3f}"
+                cookie[LAST_WRITE_COOKIE]["max-age"] = max(1, int(window_seconds + 0.999))
+                cookie[LAST_WRITE_COOKIE]["path"] = "/"
+                cookie[LAST_WRITE_COOKIE]["httponly"] = True
+                cookie[LAST_WRITE_COOKIE]["samesite"] = "lax"
+                header = cookie.output(header="").strip().encode("latin-1")
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", header)]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def wrote_recently(request: Request, window_seconds: float) -> bool:
+    """
+    Проверяет, делал ли клиент запись в пределах окна read-your-writes.
+    """
+    value = request.cookies.get(LAST_WRITE_COOKIE)
+    if not value:
+        return False
+    try:
+        written_at = float(value)
+    except ValueError:
+        return False
+    return time.time() - written_at < window_seconds
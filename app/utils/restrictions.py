@@ -1,20 +1,24 @@
+from typing import Optional, Sequence
+
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
+
+from .. import queries
 from ..models import EmployeeORM, ProjectORM, EmployeeProjectAssignmentORM
 
 
-async def is_assignment_allowed(db: AsyncSession, employee: EmployeeORM, project: ProjectORM):
+async def is_assignment_allowed(db: AsyncSession, employee: EmployeeORM, project: ProjectORM,
+                                assignments: Optional[Sequence[EmployeeProjectAssignmentORM]] = None,
+                                ancestor_ids: Optional[set] = None):
     """
     Проверяет, может ли сотрудник быть назначен на проект с учётом ранга и текущих назначений.
+
+    Пакетные операции могут передать заранее загруженные назначения сотрудника (с проектами)
+    и предков проекта, тогда проверка не обращается к базе.
     """
-    # Загружаем текущие назначения сотрудника с проектами
-    result = await db.execute(
-        select(EmployeeProjectAssignmentORM)
-        .filter(EmployeeProjectAssignmentORM.employee_id == employee.id)
-        .options(selectinload(EmployeeProjectAssignmentORM.project))
-    )
-    assignments = result.scalars().all()
+    if assignments is None:
+        # Загружаем текущие назначения сотрудника с проектами
+        result = await db.execute(queries.assignments_with_projects(employee.id))
+        assignments = result.scalars().all()
 
     if not assignments:
         # Если назначений нет, любой проект разрешен
@@ -35,7 +39,8 @@ async def is_assignment_allowed(db: AsyncSession, employee: EmployeeORM, project
 
         case "2":
             # До 3 верхнеуровневых проектов, подпроекты не ограничены
-            is_valid = len(top_level_projects) < 3 or await is_subproject_of_any(project, top_level_projects, db)
+            is_valid = len(top_level_projects) < 3 or await is_subproject_of_any(project, top_level_projects, db,
+                                                                                 ancestor_ids)
             return is_valid, (
                 "" if is_valid else "Ранг 2: нельзя участвовать более чем в 3 верхнеуровневых проектах"
             )
@@ -48,8 +53,10 @@ async def is_assignment_allowed(db: AsyncSession, employee: EmployeeORM, project
                     "" if is_valid else "Ранг 3: нельзя участвовать более чем в 2 верхнеуровневых проектах"
                 )
 
+            if ancestor_ids is None:
+                ancestor_ids = await get_ancestor_ids(project, db)
             for top_level_project in top_level_projects:
-                if await is_subproject(project, top_level_project, db):
+                if await is_subproject(project, top_level_project, db, ancestor_ids):
                     is_valid = subprojects_count.get(top_level_project.id, 0) < 2
                     return is_valid, (
                         "" if is_valid else "Ранг 3: нельзя участвовать более чем в 2 подпроектах одного верхнеуровневого проекта"
@@ -62,7 +69,7 @@ async def is_assignment_allowed(db: AsyncSession, employee: EmployeeORM, project
             if len(top_level_projects) >= 1:
                 # Если есть верхнеуровневый проект, проверяем подпроект
                 is_valid_subproject = await is_subproject_with_limit(project, top_level_projects, subprojects_count, 1,
-                                                                     db)
+                                                                     db, ancestor_ids)
                 if is_valid_subproject:
                     return True, ""
                 else:
@@ -78,29 +85,42 @@ async def is_assignment_allowed(db: AsyncSession, employee: EmployeeORM, project
             return False, "Неподдерживаемый ранг сотрудника"
 
 
-async def is_subproject_with_limit(project, top_level_projects, subprojects_count, limit, db):
+async def is_subproject_with_limit(project, top_level_projects, subprojects_count, limit, db, ancestor_ids=None):
     """
     Проверяет, является ли проект подпроектом одного из верхнеуровневых проектов
     и не превышает ли ограничение на количество подпроектов.
     """
+    if ancestor_ids is None:
+        ancestor_ids = await get_ancestor_ids(project, db)
     for top_level_project in top_level_projects:
-        if await is_subproject(project, top_level_project, db):
+        if await is_subproject(project, top_level_project, db, ancestor_ids):
             return subprojects_count.get(top_level_project.id, 0) < limit
     return False
 
 
-async def is_subproject(project, top_level_project, db):
+async def get_ancestor_ids(project, db) -> set:
     """
-    Рекурсивно проверяет, является ли проект подпроектом верхнеуровневого проекта.
+    Возвращает идентификаторы всех предков проекта одним рекурсивным запросом,
+    чтобы число обращений к базе не зависело от глубины дерева.
     """
-    while project:
-        if project.parent_id == top_level_project.id:
-            return True
-        result = await db.execute(select(ProjectORM).filter(ProjectORM.id == project.parent_id))
-        project = result.scalar_one_or_none()
-    return False
+    if project.parent_id is None:
+        return set()
+
+    result = await db.execute(queries.ancestor_ids(project.parent_id))
+    return set(result.scalars().all())
+
+
+async def is_subproject(project, top_level_project, db, ancestor_ids=None):
+    """
+    Проверяет, является ли проект подпроектом (на любой глубине) верхнеуровневого проекта.
+    """
+    if ancestor_ids is None:
+        ancestor_ids = await get_ancestor_ids(project, db)
+    return top_level_project.id in ancestor_ids
 
 
-async def is_subproject_of_any(project: ProjectORM, top_level_projects: set, db: AsyncSession):
-    results = [await is_subproject(project, top_level_project, db) for top_level_project in top_level_projects]
-    return any(results)
+async def is_subproject_of_any(project: ProjectORM, top_level_projects: set, db: AsyncSession,
+                               ancestor_ids: Optional[set] = None):
+    if ancestor_ids is None:
+        ancestor_ids = await get_ancestor_ids(project, db)
+    return any(top_level_project.id in ancestor_ids for top_level_project in top_level_projects)
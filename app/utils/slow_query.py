@@ -0,0 +1,139 @@
+import logging
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger("app.slow_query")
+
+# ASGI scope текущего запроса: маршрут в нём появляется после роутинга, поэтому храним сам scope
+_request_scope: ContextVar[Optional[dict]] = ContextVar("request_scope", default=None)
+
+EXPLAIN_PREFIXES = {
+    "sqlite": "EXPLAIN QUERY PLAN ",
+    "postgresql": "EXPLAIN ",
+}
+EXPLAINABLE_STATEMENTS = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+
+class RequestContextMiddleware:
+    """
+    ASGI middleware, запоминающий текущий запрос, чтобы медленные запросы к базе
+    можно было связать с маршрутом, который их породил.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = _request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_scope.reset(token)
+
+
+def current_route() -> Optional[str]:
+    """
+    Возвращает маршрут текущего запроса в виде "GET /api/employees/{employee_id}".
+    """
+    scope = _request_scope.get()
+    if scope is None:
+        return None
+    route = scope.get("route")
+    path = getattr(route, "path", None) or scope.get("path")
+    return f"{scope.get('method')} {path}"
+
+
+def redact(parameters):
+    """
+    Скрывает значения параметров, сохраняя их структуру (имена и количество).
+    """
+    if isinstance(parameters, dict):
+        return {key: "?" for key in parameters}
+    if isinstance(parameters, (list, tuple)):
+        return ["?"] * len(parameters)
+    return "?"
+
+
+class SlowQueryLogger:
+    """
+    Пишет в лог запросы, выполнявшиеся дольше порога: длительность, параметры,
+    маршрут-источник и план выполнения (EXPLAIN на PostgreSQL и SQLite).
+    """
+
+    def __init__(self, threshold_ms: float, redact_params: bool = False, explain: bool = True):
+        self.threshold_ms = threshold_ms
+        self.redact_params = redact_params
+        self.explain = explain
+
+    def install(self, engine: AsyncEngine):
+        event.listen(engine.sync_engine, "before_cursor_execute", self.before_cursor_execute)
+        event.listen(engine.sync_engine, "after_cursor_execute", self.after_cursor_execute)
+
+    def uninstall(self, engine: AsyncEngine):
+        event.remove(engine.sync_engine, "before_cursor_execute", self.before_cursor_execute)
+        event.remove(engine.sync_engine, "after_cursor_execute", self.after_cursor_execute)
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # Время старта хранится в контексте выполнения, а не в соединении: если запрос упадет
+        # и after_cursor_execute не будет вызван, запись исчезнет вместе с контекстом
+        if context is not None:
+            context._slow_query_started = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_slow_query_started", None)
+        if started is None:
+            return
+        duration_ms = (time.perf_counter() - started) * 1000
+        if duration_ms < self.threshold_ms:
+            return
+
+        plan = None
+        if self.explain and not executemany:
+            plan = self.explain_plan(conn, statement, parameters)
+
+        logger.warning(
+            "Slow query (%.1f ms) route=%s\n%s\nparameters: %r%s",
+            duration_ms,
+            current_route(),
+            statement,
+            redact(parameters) if self.redact_params else parameters,
+            f"\nplan:\n{plan}" if plan else "",
+        )
+
+    @staticmethod
+    def explain_plan(conn, statement: str, parameters) -> Optional[str]:
+        """
+        Получает план запроса отдельным курсором DBAPI, не затрагивая результат исходного запроса.
+        """
+        prefix = EXPLAIN_PREFIXES.get(conn.dialect.name)
+        if prefix is None or not statement.lstrip().upper().startswith(EXPLAINABLE_STATEMENTS):
+            return None
+
+        cursor = conn.connection.cursor()
+        # На PostgreSQL ошибка внутри транзакции сломала бы её целиком, поэтому изолируем EXPLAIN точкой сохранения
+        use_savepoint = conn.dialect.name == "postgresql" and conn.in_transaction()
+        try:
+            if use_savepoint:
+                cursor.execute("SAVEPOINT slow_query_explain")
+            cursor.execute(prefix + statement, parameters)
+            rows = cursor.fetchall()
+            if use_savepoint:
+                cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+        except Exception as e:
+            if use_savepoint:
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            logger.debug("EXPLAIN failed: %s", e)
+            return None
+        finally:
+            cursor.close()
+
+        # SQLite: (id, parent, notused, detail); PostgreSQL: одна строка плана в каждой записи
+        return "\n".join(str(row[-1]) for row in rows)
@@ -0,0 +1,87 @@
+import csv
+import json
+from typing import AsyncIterable, AsyncIterator, IO, NamedTuple, Optional
+
+
+class Row(NamedTuple):
+    line: int
+    record: Optional[dict]
+    error: Optional[str] = None
+
+
+async def iter_lines(chunks: AsyncIterable[bytes], encoding: str = "utf-8") -> AsyncIterator[str]:
+    """
+    Режет поток байтов на строки, держа в памяти только незавершенный хвост.
+    """
+    tail = b""
+    async for chunk in chunks:
+        tail += chunk
+        *lines, tail = tail.split(b"\n")
+        for line in lines:
+            yield line.decode(encoding).rstrip("\r")
+    if tail:
+        yield tail.decode(encoding).rstrip("\r")
+
+
+async def iter_file_chunks(file: IO[bytes], chunk_size: int = 1 << 16) -> AsyncIterator[bytes]:
+    while chunk := file.read(chunk_size):
+        yield chunk
+
+
+async def parse_ndjson(lines: AsyncIterable[str]) -> AsyncIterator[Row]:
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield Row(line_number, None, f"Invalid JSON: {exc}")
+            continue
+        if not isinstance(record, dict):
+            yield Row(line_number, None, "Expected a JSON object")
+            continue
+        yield Row(line_number, record)
+
+
+async def parse_csv(lines: AsyncIterable[str]) -> AsyncIterator[Row]:
+    """
+    Разбирает CSV с заголовком по одной записи. Поле в кавычках может занимать несколько строк:
+    запись считается законченной, когда число кавычек в ней четное.
+    Пустые значения превращаются в None.
+    """
+    header = None
+    buffer = []
+    quotes = 0
+    line_number = 0
+    first_line = 0
+    async for line in lines:
+        line_number += 1
+        if not buffer:
+            if not line.strip():
+                continue
+            first_line = line_number
+        buffer.append(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            continue
+
+        values = next(csv.reader(["\n".join(buffer)]))
+        buffer, quotes = [], 0
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield Row(first_line, None, f"Expected {len(header)} columns, got {len(values)}")
+            continue
+        yield Row(first_line, {name: value if value != "" else None for name, value in zip(header, values)})
+
+    if buffer:
+        yield Row(first_line, None, "Unterminated quoted field")
+
+
+PARSERS = {
+    "ndjson": parse_ndjson,
+    "csv": parse_csv,
+}
@@ -0,0 +1,6 @@
+"""
+Нагрузочные тесты и бенчмарки сервиса.
+
+seed  - генератор синтетической организации (сотрудники, лес проектов, назначения);
+load  - асинхронный нагрузочный стенд, гоняющий ASGI-приложение в процессе через httpx.
+"""
@@ -0,0 +1,117 @@
+"""
+Сжатие ответа GET /api/employees/: объем, время сервера на запрос и оценка полного времени
+доставки клиенту на каналах разной пропускной способности - без сжатия и с gzip/br
+на нескольких уровнях. Время передачи оценивается как размер / пропускная способность;
+compress_ms - чистое время сжатия тела ответа без работы с базой и сериализации.
+
+    python -m benchmarks.compression --employees 2000 --projects 5 --requests 5
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.main import create_app
+from app.models import Base, EmployeeORM, ProjectORM, EmployeeProjectAssignmentORM
+from app.settings import Settings
+from app.utils.compression import ENCODERS, brotli
+
+BANDWIDTHS_MBIT = (10, 100, 1000)
+
+
+async def seed(database_url: str, employees: int, projects: int):
+    engine = create_async_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        result = await conn.execute(insert(ProjectORM).returning(ProjectORM.id, sort_by_parameter_order=True),
+                                    [{"name": f"Project {i}"} for i in range(max(projects * 4, 1))])
+        project_ids = result.scalars().all()
+        result = await conn.execute(insert(EmployeeORM).returning(EmployeeORM.id, sort_by_parameter_order=True),
+                                    [{"name": f"Employee {i}", "rank": "1"} for i in range(employees)])
+        employee_ids = result.scalars().all()
+        await conn.execute(insert(EmployeeProjectAssignmentORM), [
+            {"employee_id": employee_id, "project_id": project_ids[(index + offset) % len(project_ids)]}
+            for index, employee_id in enumerate(employee_ids)
+            for offset in range(projects)
+        ])
+    await engine.dispose()
+
+
+async def measure(client: AsyncClient, accept_encoding: str, requests: int) -> dict:
+    # Прогрев: первый запрос заполняет кэши компиляции и пул
+    await client.get("/employees/", headers={"Accept-Encoding": accept_encoding})
+
+    timings, size = [], 0
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = await client.get("/employees/", headers={"Accept-Encoding": accept_encoding})
+        response.raise_for_status()
+        timings.append(time.perf_counter() - started)
+        size = response.num_bytes_downloaded
+
+    server_ms = statistics.median(timings) * 1000
+    return {
+        "bytes": size,
+        "server_ms": round(server_ms, 1),
+        "delivery_ms": {
+            f"{bandwidth}mbit": round(server_ms + size * 8 / (bandwidth * 1e6) * 1000, 1)
+            for bandwidth in BANDWIDTHS_MBIT
+        },
+    }
+
+
+def compress_ms(body: bytes, encoding: str, level: int, repeats: int = 5) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        encoder = ENCODERS[encoding](level)
+        encoder.compress(body)
+        encoder.finish()
+        timings.append(time.perf_counter() - started)
+    return round(statistics.median(timings) * 1000, 2)
+
+
+async def run(employees: int, projects: int, requests: int, levels) -> dict:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        database_url = f"sqlite+aiosqlite:///{temp_dir}/compression.db"
+        await seed(database_url, employees, projects)
+
+        settings = Settings.from_env(database_url=database_url, slow_query_log=False)
+        app = create_app(settings)
+        results = {}
+        async with app.router.lifespan_context(app):
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench/api") as client:
+                results["identity"] = await measure(client, "identity", requests)
+                body = (await client.get("/employees/", headers={"Accept-Encoding": "identity"})).content
+                encodings = ["gzip", "br"] if brotli is not None else ["gzip"]
+                for encoding in encodings:
+                    for level in levels:
+                        app.state.settings = settings.model_copy(update={"compression_level": level})
+                        result = await measure(client, encoding, requests)
+                        result["compress_ms"] = compress_ms(body, encoding, level)
+                        results[f"{encoding}-{level}"] = result
+
+    plain = results["identity"]["bytes"]
+    for name, result in results.items():
+        result["ratio"] = round(plain / result["bytes"], 1)
+    return {"employees": employees, "projects_per_employee": projects, "results": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Объем и время доставки списка сотрудников со сжатием и без")
+    parser.add_argument("--employees", type=int, default=2000)
+    parser.add_argument("--projects", type=int, default=5, help="Назначений на сотрудника")
+    parser.add_argument("--requests", type=int, default=5, help="Запросов на вариант (берется медиана)")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 5, 9])
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(run(args.employees, args.projects, args.requests, args.levels)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
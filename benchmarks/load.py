@@ -0,0 +1,298 @@
+"""
+Нагрузочный стенд: поднимает приложение в процессе, заполняет базу синтетической организацией
+и прогоняет каждый маршрут API, измеряя пропускную способность и задержки p50/p95/p99.
+
+Пример запуска:
+
+    python -m benchmarks.load --employees 2000 --requests 300 --concurrency 16 --output run.json
+    python -m benchmarks.load --output new.json --baseline run.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import insert
+from sqlalchemy.engine import make_url
+
+from app.main import create_app
+from app.models import Base, EmployeeORM, ProjectORM
+from app.settings import Settings
+from benchmarks.seed import OrgConfig, Org, seed_org, parse_rank_weights
+
+# Маршрут -> (метод, построитель запроса). Построитель возвращает путь и тело запроса.
+RequestBuilder = Callable[[random.Random], Tuple[str, Optional[dict]]]
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    build: RequestBuilder
+
+
+@dataclass
+class Fixtures:
+    """
+    Объекты, заранее созданные для разрушающих и пишущих маршрутов,
+    чтобы повторные запросы не упирались в уже удалённые или уже назначенные записи.
+    """
+    target_projects: List[int]
+    disposable_projects: List[int]
+    disposable_employees: List[int]
+    removable_assignments: List[Tuple[int, int]]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """
+    Перцентиль по методу ближайшего ранга для уже отсортированной выборки.
+    """
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: List[float], statuses: Dict[int, int], elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": sum(n for status, n in statuses.items() if status >= 500),
+        "statuses": {str(status): n for status, n in sorted(statuses.items())},
+        "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / count * 1000, 3) if count else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3) if count else 0.0,
+    }
+
+
+async def _create_fixtures(session_factory, org: Org, requests: int, rng: random.Random) -> Fixtures:
+    async with session_factory() as db:
+        project_table = ProjectORM.__table__
+        rows = [{"name": f"Bench target {i}", "parent_id": rng.choice(org.root_ids)} for i in range(requests)]
+        result = await db.execute(insert(project_table).returning(project_table.c.id, sort_by_parameter_order=True),
+                                  rows)
+        target_projects = result.scalars().all()
+
+        rows = [{"name": f"Bench disposable {i}", "parent_id": None} for i in range(requests)]
+        result = await db.execute(insert(project_table).returning(project_table.c.id, sort_by_parameter_order=True),
+                                  rows)
+        disposable_projects = result.scalars().all()
+
+        employee_table = EmployeeORM.__table__
+        rows = [{"name": f"Bench disposable {i}", "rank": "1"} for i in range(requests)]
+        result = await db.execute(insert(employee_table).returning(employee_table.c.id, sort_by_parameter_order=True),
+                                  rows)
+        disposable_employees = result.scalars().all()
+        await db.commit()
+
+    removable = list(org.assignments)
+    rng.shuffle(removable)
+    return Fixtures(
+        target_projects=list(target_projects),
+        disposable_projects=list(disposable_projects),
+        disposable_employees=list(disposable_employees),
+        removable_assignments=removable[:requests],
+    )
+
+
+def build_scenarios(org: Org, fixtures: Fixtures) -> List[Scenario]:
+    """
+    Сценарии в порядке прогона: сначала чтение, затем удаление одноразовых объектов, затем запись.
+    Одноразовые сотрудники удаляются до массовых назначений по рангу, которые их бы затронули.
+    """
+    target_projects = iter(fixtures.target_projects)
+    disposable_projects = iter(fixtures.disposable_projects)
+    disposable_employees = iter(fixtures.disposable_employees)
+    removable_assignments = iter(fixtures.removable_assignments)
+    ranks = sorted(set(org.employee_ranks.values())) or ["1"]
+
+    def assignment(pair):
+        employee_id, project_id = pair
+        return {"employee_id": employee_id, "project_id": project_id}
+
+    return [
+        Scenario("GET /projects/", "GET", lambda rng: ("/projects/", None)),
+        Scenario("GET /projects/{id}", "GET",
+                 lambda rng: (f"/projects/{rng.choice(org.project_ids)}", None)),
+        Scenario("GET /employees/", "GET", lambda rng: ("/employees/", None)),
+        Scenario("GET /employees/{id}", "GET",
+                 lambda rng: (f"/employees/{rng.choice(org.employee_ids)}", None)),
+        Scenario("DELETE /employees/{id}", "DELETE",
+                 lambda rng: (f"/employees/{next(disposable_employees)}", None)),
+        Scenario("DELETE /projects/{id}", "DELETE",
+                 lambda rng: (f"/projects/{next(disposable_projects)}", None)),
+        Scenario("POST /projects/", "POST",
+                 lambda rng: ("/projects/", {"name": "Bench project", "parent_id": rng.choice(org.root_ids)})),
+        Scenario("POST /employees/", "POST",
+                 lambda rng: ("/employees/", {"name": "Bench employee", "rank": rng.choice(ranks)})),
+        Scenario("PUT /employees/{id}", "PUT",
+                 lambda rng: (lambda employee_id: (f"/employees/{employee_id}", {
+                     "name": f"Employee {employee_id}", "rank": org.employee_ranks[employee_id]}))(
+                     rng.choice(org.employee_ids))),
+        Scenario("POST /add-employee-to-project", "POST",
+                 lambda rng: ("/add-employee-to-project", assignment(
+                     (rng.choice(org.employee_ids), rng.choice(org.project_ids))))),
+        Scenario("POST /assign-employees-by-rank/", "POST",
+                 lambda rng: ("/assign-employees-by-rank/", {
+                     "project_id": next(target_projects), "rank": rng.choice(ranks)})),
+        Scenario("DELETE /delete-employee-to-project", "DELETE",
+                 lambda rng: ("/delete-employee-to-project", assignment(next(removable_assignments)))),
+    ]
+
+
+async def run_scenario(client: AsyncClient, scenario: Scenario, requests: int, concurrency: int,
+                       rng: random.Random) -> dict:
+    # Запросы строятся заранее, чтобы генерация данных не попадала в замер
+    planned = [scenario.build(rng) for _ in range(requests)]
+    queue = iter(planned)
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+
+    async def worker():
+        for path, body in queue:
+            started = time.perf_counter()
+            response = await client.request(scenario.method, path, json=body)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, statuses, time.perf_counter() - started)
+
+
+async def run(args) -> dict:
+    temp_dir = None
+    database_url = args.database_url
+    if database_url is None:
+        temp_dir = tempfile.TemporaryDirectory()
+        database_url = f"sqlite+aiosqlite:///{temp_dir.name}/bench.db"
+
+    # Журнал медленных запросов с EXPLAIN исказил бы замеры; прогрев выполняется после создания схемы
+    settings = Settings.from_env(database_url=database_url, slow_query_log=False, db_warm_up=False)
+    app = create_app(settings)
+
+    config = OrgConfig(
+        employees=args.employees,
+        rank_weights=args.rank_weights,
+        roots=args.roots,
+        breadth=args.breadth,
+        depth=args.depth,
+        assignments_per_employee=args.assignments_per_employee,
+        seed=args.seed,
+    )
+    rng = random.Random(args.seed)
+
+    routes = {}
+    try:
+        async with app.router.lifespan_context(app):
+            database = app.state.database
+            async with database.engine.begin() as conn:
+                await conn.run_sync(Base.metadata.drop_all)
+                await conn.run_sync(Base.metadata.create_all)
+
+            seed_started = time.perf_counter()
+            async with database.session_factory() as db:
+                org = await seed_org(db, config)
+            seed_seconds = time.perf_counter() - seed_started
+            fixtures = await _create_fixtures(database.session_factory, org, args.requests, rng)
+            await database.warm_up()
+
+            transport = ASGITransport(app=app, raise_app_exceptions=False)
+            async with AsyncClient(transport=transport, base_url="http://bench/api") as client:
+                for scenario in build_scenarios(org, fixtures):
+                    if args.routes and not any(pattern in scenario.name for pattern in args.routes):
+                        continue
+                    routes[scenario.name] = await run_scenario(client, scenario, args.requests, args.concurrency,
+                                                               rng)
+                    print(_format_row(scenario.name, routes[scenario.name]), file=sys.stderr)
+    finally:
+        if temp_dir is not None:
+            temp_dir.cleanup()
+
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "database": make_url(database_url).get_backend_name(),
+        "org": {
+            **asdict(config),
+            "projects": len(org.project_ids),
+            "assignments": len(org.assignments),
+            "seed_seconds": round(seed_seconds, 3),
+        },
+        "requests_per_route": args.requests,
+        "concurrency": args.concurrency,
+        "routes": routes,
+    }
+
+
+def _format_row(name: str, stats: dict) -> str:
+    return (f"{name:<38} {stats['throughput_rps']:>9.1f} rps  p50 {stats['p50_ms']:>8.2f} ms  "
+            f"p95 {stats['p95_ms']:>8.2f} ms  p99 {stats['p99_ms']:>8.2f} ms  5xx {stats['errors']}")
+
+
+def compare(current: dict, baseline: dict) -> List[str]:
+    """
+    Построчное сравнение прогона с базовым: изменение пропускной способности и p95 в процентах.
+    """
+    lines = []
+    for name, stats in current["routes"].items():
+        base = baseline.get("routes", {}).get(name)
+        if not base:
+            continue
+
+        def delta(key):
+            return (stats[key] - base[key]) / base[key] * 100 if base[key] else 0.0
+
+        lines.append(f"{name:<38} rps {delta('throughput_rps'):+7.1f}%  p50 {delta('p50_ms'):+7.1f}%  "
+                     f"p95 {delta('p95_ms'):+7.1f}%  p99 {delta('p99_ms'):+7.1f}%")
+    return lines
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон API на синтетической организации")
+    parser.add_argument("--database-url", help="База для прогона (будет пересоздана). По умолчанию временный SQLite")
+    parser.add_argument("--employees", type=int, default=1000)
+    parser.add_argument("--rank-weights", type=parse_rank_weights, default=None,
+                        help='Распределение рангов, например "1=0.1,2=0.3,3=0.35,4=0.25"')
+    parser.add_argument("--roots", type=int, default=20)
+    parser.add_argument("--breadth", type=int, default=3)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--assignments-per-employee", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=200, help="Количество запросов на каждый маршрут")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--routes", nargs="*", help="Прогонять только маршруты, содержащие указанные подстроки")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Сохранить результаты в JSON")
+    parser.add_argument("--baseline", help="JSON предыдущего прогона для сравнения")
+    args = parser.parse_args(argv)
+    if args.rank_weights is None:
+        args.rank_weights = OrgConfig().rank_weights
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = asyncio.run(run(args))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        print("\n".join(compare(results, baseline)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import random
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import EmployeeORM, ProjectORM, EmployeeProjectAssignmentORM
+
+DEFAULT_RANK_WEIGHTS = {"1": 0.10, "2": 0.30, "3": 0.35, "4": 0.25}
+
+BATCH_SIZE = 1000
+
+
+@dataclass
+class OrgConfig:
+    """
+    Параметры синтетической организации.
+
+    roots - количество верхнеуровневых проектов;
+    breadth - количество подпроектов у каждого узла;
+    depth - глубина дерева под корнем (0 - только корневые проекты);
+    assignments_per_employee - сколько назначений пытаемся выдать каждому сотруднику.
+    """
+    employees: int = 1000
+    rank_weights: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_RANK_WEIGHTS))
+    roots: int = 20
+    breadth: int = 3
+    depth: int = 2
+    assignments_per_employee: int = 3
+    seed: int = 42
+
+
+@dataclass
+class Org:
+    """
+    Идентификаторы созданных объектов: нужны нагрузочному стенду для построения запросов.
+    """
+    root_ids: List[int] = field(default_factory=list)
+    project_ids: List[int] = field(default_factory=list)
+    children: Dict[int, List[int]] = field(default_factory=dict)
+    employee_ids: List[int] = field(default_factory=list)
+    employee_ranks: Dict[int, str] = field(default_factory=dict)
+    assignments: List[Tuple[int, int]] = field(default_factory=list)
+
+
+def parse_rank_weights(value: str) -> Dict[str, float]:
+    """
+    Разбирает распределение рангов вида "1=0.1,2=0.3,3=0.35,4=0.25".
+    """
+    weights = {}
+    for item in value.split(","):
+        rank, _, weight = item.partition("=")
+        weights[rank.strip()] = float(weight)
+    if not weights or any(weight < 0 for weight in weights.values()) or sum(weights.values()) <= 0:
+        raise ValueError(f"Некорректное распределение рангов: {value!r}")
+    return weights
+
+
+async def _insert_returning_ids(db: AsyncSession, table, rows: List[dict]) -> List[int]:
+    ids = []
+    for start in range(0, len(rows), BATCH_SIZE):
+        result = await db.execute(
+            insert(table).returning(table.c.id, sort_by_parameter_order=True),
+            rows[start:start + BATCH_SIZE],
+        )
+        ids.extend(result.scalars().all())
+    return ids
+
+
+async def _seed_projects(db: AsyncSession, config: OrgConfig, org: Org):
+    table = ProjectORM.__table__
+
+    # Корни вставляем первыми, затем уровень за уровнем, чтобы parent_id уже существовал
+    org.root_ids = await _insert_returning_ids(
+        db, table, [{"name": f"Root {i}", "parent_id": None} for i in range(config.roots)]
+    )
+    org.project_ids.extend(org.root_ids)
+
+    level = org.root_ids
+    for depth in range(1, config.depth + 1):
+        rows = [
+            {"name": f"Project {parent_id}.{i}", "parent_id": parent_id}
+            for parent_id in level
+            for i in range(config.breadth)
+        ]
+        if not rows:
+            break
+        level = await _insert_returning_ids(db, table, rows)
+        for row, project_id in zip(rows, level):
+            org.children.setdefault(row["parent_id"], []).append(project_id)
+        org.project_ids.extend(level)
+
+
+def _descendants(org: Org, project_id: int) -> List[int]:
+    result = []
+    stack = list(org.children.get(project_id, []))
+    while stack:
+        current = stack.pop()
+        result.append(current)
+        stack.extend(org.children.get(current, []))
+    return result
+
+
+def _pick_projects(rng: random.Random, org: Org, rank: str, limit: int) -> List[int]:
+    """
+    Подбирает проекты для сотрудника так, чтобы итоговый набор не нарушал ограничений ранга.
+    """
+    if limit <= 0 or not org.root_ids:
+        return []
+
+    if rank == "1":
+        return rng.sample(org.project_ids, min(limit, len(org.project_ids)))
+
+    if rank == "2":
+        # До 3 верхнеуровневых проектов, подпроекты внутри них не ограничены
+        roots = rng.sample(org.root_ids, min(limit, 3, len(org.root_ids)))
+        pool = [project_id for root_id in roots for project_id in _descendants(org, root_id)]
+        return roots + rng.sample(pool, min(limit - len(roots), len(pool)))
+
+    if rank == "3":
+        # До 2 верхнеуровневых проектов и до 2 прямых подпроектов в каждом
+        roots = rng.sample(org.root_ids, min(limit, 2, len(org.root_ids)))
+        per_root = [rng.sample(org.children.get(root_id, []), min(2, len(org.children.get(root_id, []))))
+                    for root_id in roots]
+        pool = [project_id for picked in per_root for project_id in picked]
+        return roots + pool[:limit - len(roots)]
+
+    # Ранг 4: один верхнеуровневый проект и один его прямой подпроект
+    root_id = rng.choice(org.root_ids)
+    children = org.children.get(root_id, [])
+    if limit == 1 or not children:
+        return [root_id]
+    return [root_id, rng.choice(children)]
+
+
+async def seed_org(db: AsyncSession, config: OrgConfig) -> Org:
+    """
+    Заполняет пустую базу синтетической организацией и возвращает идентификаторы созданных объектов.
+    """
+    rng = random.Random(config.seed)
+    org = Org()
+
+    await _seed_projects(db, config, org)
+
+    ranks = list(config.rank_weights)
+    weights = [config.rank_weights[rank] for rank in ranks]
+    employee_rows = [
+        {"name": f"Employee {i}", "rank": rank}
+        for i, rank in enumerate(rng.choices(ranks, weights=weights, k=config.employees))
+    ]
+    org.employee_ids = await _insert_returning_ids(db, EmployeeORM.__table__, employee_rows)
+    org.employee_ranks = {
+        employee_id: row["rank"] for employee_id, row in zip(org.employee_ids, employee_rows)
+    }
+
+    for employee_id in org.employee_ids:
+        for project_id in _pick_projects(rng, org, org.employee_ranks[employee_id], config.assignments_per_employee):
+            org.assignments.append((employee_id, project_id))
+
+    assignment_rows = [{"employee_id": employee_id, "project_id": project_id}
+                       for employee_id, project_id in org.assignments]
+    for start in range(0, len(assignment_rows), BATCH_SIZE):
+        await db.execute(insert(EmployeeProjectAssignmentORM.__table__), assignment_rows[start:start + BATCH_SIZE])
+
+    await db.commit()
+    return org
@@ -0,0 +1,81 @@
+"""
+Замер старта процесса: время импорта app.main (python -X importtime, самые тяжелые модули)
+и время create_app + lifespan (создание движка, прогрев пула и кэшей).
+
+    python -m benchmarks.startup
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import tempfile
+import time
+
+from sqlalchemy.ext.asyncio import create_async_engine
+
+
+def measure_import(module: str, top: int) -> dict:
+    """
+    Запускает чистый интерпретатор с -X importtime и разбирает кумулятивное время по модулям.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True,
+    )
+    modules = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        modules.append((name, int(self_us), int(cumulative_us)))
+
+    total_us = next(cumulative for name, _, cumulative in modules if name == module)
+    heaviest = sorted(modules, key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "module": module,
+        "total_ms": round(total_us / 1000, 1),
+        "heaviest_self_ms": {name: round(self_us / 1000, 1) for name, self_us, _ in heaviest},
+    }
+
+
+async def measure_lifespan() -> dict:
+    from app.main import create_app
+    from app.models import Base
+    from app.settings import Settings
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        database_url = f"sqlite+aiosqlite:///{temp_dir}/startup.db"
+        engine = create_async_engine(database_url)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await engine.dispose()
+
+        started = time.perf_counter()
+        app = create_app(Settings.from_env(database_url=database_url))
+        created = time.perf_counter()
+        async with app.router.lifespan_context(app):
+            ready = time.perf_counter()
+        stopped = time.perf_counter()
+
+    return {
+        "create_app_ms": round((created - started) * 1000, 1),
+        "lifespan_startup_ms": round((ready - created) * 1000, 1),
+        "lifespan_shutdown_ms": round((stopped - ready) * 1000, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Время импорта и старта приложения")
+    parser.add_argument("--top", type=int, default=10, help="Сколько самых тяжелых модулей показать")
+    args = parser.parse_args(argv)
+
+    results = {
+        "import": measure_import("app.main", args.top),
+        "startup": asyncio.run(measure_lifespan()),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Микробенчмарк пути назначения сотрудника: сравнивает запросы, собираемые заново на каждый вызов,
+с заранее объявленными lambda_stmt из app.queries. Замеряется процессорное время на вызов.
+
+    python -m benchmarks.statements --iterations 2000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import sessionmaker, selectinload, aliased
+
+from app import queries
+from app.models import Base, EmployeeORM, ProjectORM, EmployeeProjectAssignmentORM
+
+
+def constructed_ancestors(parent_id: int):
+    ancestors = (
+        select(ProjectORM.id, ProjectORM.parent_id)
+        .filter(ProjectORM.id == parent_id)
+        .cte(name="ancestors", recursive=True)
+    )
+    parent = aliased(ProjectORM)
+    ancestors = ancestors.union(
+        select(parent.id, parent.parent_id).join(ancestors, parent.id == ancestors.c.parent_id)
+    )
+    return select(ancestors.c.id)
+
+
+# Запросы add_employee_to_project + is_assignment_allowed в том виде, в каком они собирались на каждый вызов
+CONSTRUCTED = [
+    lambda employee_id, project_id, parent_id: select(ProjectORM).filter(ProjectORM.id == project_id),
+    lambda employee_id, project_id, parent_id: select(EmployeeORM).filter(EmployeeORM.id == employee_id),
+    lambda employee_id, project_id, parent_id: (
+        select(EmployeeProjectAssignmentORM)
+        .filter(EmployeeProjectAssignmentORM.project_id == project_id,
+                EmployeeProjectAssignmentORM.employee_id == employee_id)
+    ),
+    lambda employee_id, project_id, parent_id: (
+        select(EmployeeProjectAssignmentORM)
+        .filter(EmployeeProjectAssignmentORM.employee_id == employee_id)
+        .options(selectinload(EmployeeProjectAssignmentORM.project))
+    ),
+    lambda employee_id, project_id, parent_id: constructed_ancestors(parent_id),
+]
+
+CACHED = [
+    lambda employee_id, project_id, parent_id: queries.project_by_id(project_id),
+    lambda employee_id, project_id, parent_id: queries.employee_by_id(employee_id),
+    lambda employee_id, project_id, parent_id: queries.assignment_by_key(employee_id, project_id),
+    lambda employee_id, project_id, parent_id: queries.assignments_with_projects(employee_id),
+    lambda employee_id, project_id, parent_id: queries.ancestor_ids(parent_id),
+]
+
+
+async def measure(session_factory, builders, iterations: int, ids) -> dict:
+    employee_ids, project_ids = ids
+    async with session_factory() as db:
+        # Прогрев: первый вызов заполняет кэши компиляции
+        for build in builders:
+            await db.execute(build(employee_ids[0], project_ids[1], project_ids[0]))
+
+        cpu_started, wall_started = time.process_time(), time.perf_counter()
+        for i in range(iterations):
+            employee_id = employee_ids[i % len(employee_ids)]
+            project_id = project_ids[1 + i % (len(project_ids) - 1)]
+            for build in builders:
+                result = await db.execute(build(employee_id, project_id, project_ids[0]))
+                result.scalars().all()
+            db.expunge_all()
+        cpu, wall = time.process_time() - cpu_started, time.perf_counter() - wall_started
+
+    return {
+        "cpu_us_per_call": round(cpu / iterations * 1e6, 1),
+        "wall_us_per_call": round(wall / iterations * 1e6, 1),
+    }
+
+
+async def run(iterations: int) -> dict:
+    engine = create_async_engine("sqlite+aiosqlite://")
+    session_factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with session_factory() as db:
+        root = (await db.execute(insert(ProjectORM).returning(ProjectORM.id), [{"name": "Root"}])).scalar_one()
+        result = await db.execute(insert(ProjectORM).returning(ProjectORM.id, sort_by_parameter_order=True),
+                                  [{"name": f"Sub {i}", "parent_id": root} for i in range(20)])
+        project_ids = [root, *result.scalars().all()]
+        result = await db.execute(insert(EmployeeORM).returning(EmployeeORM.id, sort_by_parameter_order=True),
+                                  [{"name": f"Employee {i}", "rank": "3"} for i in range(50)])
+        employee_ids = result.scalars().all()
+        await db.execute(insert(EmployeeProjectAssignmentORM),
+                         [{"employee_id": employee_id, "project_id": root} for employee_id in employee_ids])
+        await db.commit()
+
+    ids = (employee_ids, project_ids)
+    constructed = await measure(session_factory, CONSTRUCTED, iterations, ids)
+    cached = await measure(session_factory, CACHED, iterations, ids)
+    await engine.dispose()
+
+    saved = constructed["cpu_us_per_call"] - cached["cpu_us_per_call"]
+    return {
+        "iterations": iterations,
+        "constructed": constructed,
+        "lambda_stmt": cached,
+        "cpu_us_saved_per_call": round(saved, 1),
+        "cpu_saved_percent": round(saved / constructed["cpu_us_per_call"] * 100, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CPU на вызов для запросов пути назначения")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(run(args.iterations)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,13 @@
 import tempfile
+from contextlib import contextmanager
 
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.main import app
 from app.models import Base
 
@@ -44,8 +46,41 @@ async def client(db_session):
         yield db_session
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
 
     async with AsyncClient(app=app, base_url="http://127.0.0.1:8000/api") as ac:
         yield ac
 
     app.dependency_overrides.clear()
+
+
+class QueryRecorder:
+    """
+    Собирает SQL-выражения, отправленные в базу внутри блока record().
+    """
+
+    def __init__(self):
+        self.statements = None
+
+    def on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.statements is not None:
+            self.statements.append(statement)
+
+    @contextmanager
+    def record(self):
+        self.statements = []
+        statements = self.statements
+        try:
+            yield statements
+        finally:
+            self.statements = None
+
+
+# Фикстура для подсчёта запросов, которые выполняет обработчик
+@pytest.fixture
+def sql_queries(db_session):
+    recorder = QueryRecorder()
+    engine = db_session.bind.sync_engine
+    event.listen(engine, "before_cursor_execute", recorder.on_execute)
+    yield recorder
+    event.remove(engine, "before_cursor_execute", recorder.on_execute)
@@ -0,0 +1,109 @@
+import asyncio
+import tempfile
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.main import create_app
+from app.models import Base
+from app.settings import Settings
+from app.utils.admission import AdmissionLimiter, Overloaded
+
+
+async def test_limiter_rejects_beyond_queue():
+    limiter = AdmissionLimiter("batch", concurrency=1, queue=1, queue_timeout=5)
+    release = asyncio.Event()
+
+    async def hold():
+        async with limiter.admit():
+            await release.wait()
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    queued = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    assert limiter.active == 1 and limiter.waiting == 1
+
+    # Очередь заполнена: третий запрос отклоняется сразу
+    with pytest.raises(Overloaded):
+        async with limiter.admit():
+            pass
+
+    release.set()
+    await asyncio.gather(holder, queued)
+    assert limiter.active == 0 and limiter.waiting == 0
+
+
+async def test_limiter_rejects_after_queue_timeout():
+    limiter = AdmissionLimiter("batch", concurrency=1, queue=10, queue_timeout=0.01)
+    async with limiter.admit():
+        with pytest.raises(Overloaded):
+            async with limiter.admit():
+                pass
+    assert limiter.waiting == 0
+
+
+@pytest.fixture
+async def limited_app():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        database_url = f"sqlite+aiosqlite:///{temp_dir}/test.db"
+        engine = create_async_engine(database_url)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await engine.dispose()
+
+        app = create_app(Settings.from_env({
+            "DATABASE_URL": database_url,
+            "ADMISSION_LIMITS": '{"batch": {"concurrency": 1, "queue": 0}}',
+            "ADMISSION_RETRY_AFTER_SECONDS": "3",
+        }))
+        async with app.router.lifespan_context(app):
+            yield app
+
+
+async def test_batch_route_shed_while_interactive_served(limited_app):
+    # Единственный слот пакетной группы занят долгой операцией
+    async with limited_app.state.admission.limiters["batch"].admit():
+        async with AsyncClient(transport=ASGITransport(app=limited_app), base_url="http://test/api") as client:
+            response = await client.post("/assign-employees-by-rank/", json={"project_id": 1, "rank": "1"})
+            assert response.status_code == 503
+            assert response.headers["Retry-After"] == "3"
+
+            response = await client.post("/employees/", json={"name": "John Doe", "rank": "1"})
+            assert response.status_code == 200
+            response = await client.get(f"/employees/{response.json()['id']}")
+            assert response.status_code == 200
+
+
+async def test_snapshot_export_holds_batch_slot_while_streaming(limited_app):
+    first_chunk_sent, finish = asyncio.Event(), asyncio.Event()
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        await finish.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        # Клиент медленно читает выгрузку: после первой порции тела ответ повисает
+        if message["type"] == "http.response.body" and message.get("body"):
+            first_chunk_sent.set()
+            await finish.wait()
+
+    scope = {"type": "http", "method": "GET", "path": "/api/snapshot", "raw_path": b"/api/snapshot",
+             "query_string": b"", "headers": [], "app": limited_app, "http_version": "1.1",
+             "scheme": "http", "server": ("test", 80), "client": ("test", 1), "root_path": ""}
+    export = asyncio.create_task(limited_app(scope, receive, send))
+    await asyncio.wait_for(first_chunk_sent.wait(), timeout=5)
+
+    limiter = limited_app.state.admission.limiters["batch"]
+    assert limiter.active == 1
+    async with AsyncClient(transport=ASGITransport(app=limited_app), base_url="http://test/api") as client:
+        response = await client.post("/assign-employees-by-rank/", json={"project_id": 1, "rank": "1"})
+        assert response.status_code == 503
+
+    finish.set()
+    await asyncio.wait_for(export, timeout=5)
+    assert limiter.active == 0
@@ -176,3 +176,59 @@ async def test_is_assignment_allowed_rank_4(client: AsyncClient, db_session: Asy
     assert response.status_code == 400
     assert response.json() == {
         "detail": "Ранг 4: нельзя участвовать более чем в 1 верхнеуровневом проекте и 1 подпроекте"}
+
+
+async def test_assignment_changes_feed(client: AsyncClient, db_session: AsyncSession):
+    project = ProjectORM(name="Project", parent_id=None)
+    employees = [EmployeeORM(name=f"Employee {i}", rank="1") for i in range(3)]
+    db_session.add_all([project, *employees])
+    await db_session.commit()
+
+    for employee in employees:
+        await client.post("/add-employee-to-project", json={"employee_id": employee.id, "project_id": project.id})
+    await client.request("DELETE", "/delete-employee-to-project",
+                         json={"employee_id": employees[0].id, "project_id": project.id})
+
+    response = await client.get("/assignments/changes", params={"since": 0, "limit": 3})
+    assert response.status_code == 200
+    first_page = response.json()
+    assert [event["action"] for event in first_page["events"]] == ["assigned"] * 3
+    assert first_page["has_more"] is True
+
+    response = await client.get("/assignments/changes", params={"since": first_page["next_cursor"]})
+    second_page = response.json()
+    assert [(event["action"], event["employee_id"]) for event in second_page["events"]] == [
+        ("removed", employees[0].id)
+    ]
+    assert second_page["has_more"] is False
+
+    # Без новых событий курсор не сдвигается
+    response = await client.get("/assignments/changes", params={"since": second_page["next_cursor"]})
+    assert response.json() == {"events": [], "next_cursor": second_page["next_cursor"], "has_more": False}
+
+
+async def test_cascaded_removals_reach_changes_feed(client: AsyncClient, db_session: AsyncSession):
+    top = ProjectORM(name="Top", parent_id=None)
+    other = ProjectORM(name="Other", parent_id=None)
+    db_session.add_all([top, other])
+    await db_session.commit()
+    sub = ProjectORM(name="Sub", parent_id=top.id)
+    employees = [EmployeeORM(name=f"Employee {i}", rank="1") for i in range(2)]
+    db_session.add_all([sub, *employees])
+    await db_session.commit()
+
+    for project_id in (top.id, sub.id, other.id):
+        await client.post("/add-employee-to-project", json={"employee_id": employees[0].id, "project_id": project_id})
+    await client.post("/add-employee-to-project", json={"employee_id": employees[1].id, "project_id": other.id})
+    cursor = (await client.get("/assignments/changes")).json()["next_cursor"]
+
+    # Удаление проекта снимает назначения всего поддерева, удаление сотрудника - все его назначения
+    assert (await client.delete(f"/projects/{top.id}")).status_code == 200
+    assert (await client.delete(f"/employees/{employees[1].id}")).status_code == 200
+
+    events = (await client.get("/assignments/changes", params={"since": cursor})).json()["events"]
+    assert [(event["action"], event["employee_id"], event["project_id"]) for event in events] == [
+        ("removed", employees[0].id, top.id),
+        ("removed", employees[0].id, sub.id),
+        ("removed", employees[1].id, other.id),
+    ]
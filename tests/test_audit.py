@@ -0,0 +1,57 @@
+from httpx import AsyncClient
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import ProjectORM, EmployeeORM, EmployeeProjectAssignmentORM
+
+
+async def test_audit_reports_every_violation(client: AsyncClient, db_session: AsyncSession):
+    roots = [ProjectORM(name=f"Root {i}") for i in range(4)]
+    db_session.add_all(roots)
+    await db_session.commit()
+    children = [ProjectORM(name=f"Child {i}", parent_id=roots[0].id) for i in range(3)]
+    other_child = ProjectORM(name="Other child", parent_id=roots[1].id)
+    db_session.add_all([*children, other_child])
+    await db_session.commit()
+    grandchild = ProjectORM(name="Grandchild", parent_id=children[0].id)
+    db_session.add(grandchild)
+
+    employees = {
+        "ok_rank_1": EmployeeORM(name="Anyone", rank="1"),
+        "too_many_tops": EmployeeORM(name="Rank 2", rank="2"),
+        "too_many_subs": EmployeeORM(name="Rank 3", rank="3"),
+        "outside": EmployeeORM(name="Rank 4", rank="4"),
+        "single_sub": EmployeeORM(name="Lonely rank 4", rank="4"),
+        "unknown": EmployeeORM(name="Rank 7", rank="7"),
+    }
+    db_session.add_all(employees.values())
+    await db_session.commit()
+
+    def ids(name, projects):
+        return [{"employee_id": employees[name].id, "project_id": project.id} for project in projects]
+
+    await db_session.execute(insert(EmployeeProjectAssignmentORM.__table__), [
+        *ids("ok_rank_1", [*roots, *children, grandchild]),
+        *ids("too_many_tops", roots),
+        # Внук не считается прямым подпроектом
+        *ids("too_many_subs", [roots[0], *children, grandchild]),
+        *ids("outside", [roots[0], other_child]),
+        *ids("single_sub", [grandchild]),
+        *ids("unknown", [roots[0]]),
+    ])
+    await db_session.commit()
+
+    response = await client.get("/audit/rank-rules")
+    assert response.status_code == 200
+    report = response.json()
+
+    found = [(violation["employee_id"], violation["rule"], violation["project_id"], violation["observed"],
+              violation["limit"]) for violation in report["violations"]]
+    assert found == [
+        (employees["too_many_tops"].id, "top_level_limit", None, 4, 3),
+        (employees["too_many_subs"].id, "subproject_limit", roots[0].id, 3, 2),
+        (employees["outside"].id, "subproject_outside_top_level", other_child.id, None, None),
+        (employees["unknown"].id, "unsupported_rank", None, 1, None),
+    ]
+    assert report["employees"] == 4
+    assert report["violations"][2]["message"].startswith("Ранг 4")
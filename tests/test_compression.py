@@ -0,0 +1,126 @@
+import asyncio
+import gzip
+import tempfile
+
+import pytest
+from fastapi import APIRouter, Depends, FastAPI
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.responses import StreamingResponse
+
+from app.main import create_app
+from app.models import Base
+from app.settings import Settings
+from app.utils.compression import CompressionMiddleware, compressible, negotiate_encoding
+
+
+@pytest.fixture
+async def compression_app():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        database_url = f"sqlite+aiosqlite:///{temp_dir}/test.db"
+        engine = create_async_engine(database_url)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await engine.dispose()
+
+        app = create_app(Settings.from_env({"DATABASE_URL": database_url, "COMPRESSION_MIN_SIZE": "2048"}))
+        async with app.router.lifespan_context(app):
+            yield app
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("*") is not None
+    assert negotiate_encoding("gzip;q=0, identity") is None
+    assert negotiate_encoding("") is None
+
+
+async def test_list_routes_compressed_above_threshold(compression_app):
+    async with AsyncClient(transport=ASGITransport(app=compression_app), base_url="http://test/api") as client:
+        response = await client.post("/employees/", json={"name": "Single", "rank": "1"})
+        employee_id = response.json()["id"]
+
+        # Список меньше порога уходит без сжатия, но с Vary
+        response = await client.get("/employees/", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+        assert response.headers["vary"] == "Accept-Encoding"
+
+        for i in range(100):
+            await client.post("/employees/", json={"name": f"Employee number {i}", "rank": "2"})
+
+        plain = await client.get("/employees/", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in plain.headers
+
+        compressed = await client.get("/employees/", headers={"Accept-Encoding": "gzip"})
+        assert compressed.headers["content-encoding"] == "gzip"
+        assert "content-length" not in compressed.headers or \
+            int(compressed.headers["content-length"]) < len(plain.content)
+        assert compressed.json() == plain.json()
+
+        # Карточка сотрудника не относится к спискам и не сжимается при любом размере
+        response = await client.get(f"/employees/{employee_id}", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+        assert "vary" not in response.headers
+
+
+async def test_brotli_round_trip(compression_app):
+    brotli = pytest.importorskip("brotli")
+    assert negotiate_encoding("gzip, br") == "br"
+
+    async with AsyncClient(transport=ASGITransport(app=compression_app), base_url="http://test/api") as client:
+        for i in range(100):
+            await client.post("/employees/", json={"name": f"Employee number {i}", "rank": "2"})
+
+        plain = await client.get("/employees/", headers={"Accept-Encoding": "identity"})
+        # Транспорт httpx отдает тело как есть: декодирование проверяется явно
+        request = client.build_request("GET", "/employees/", headers={"Accept-Encoding": "br"})
+        response = await client.send(request, stream=True)
+        raw = b"".join([chunk async for chunk in response.aiter_raw()])
+        await response.aclose()
+
+    assert response.headers["content-encoding"] == "br"
+    assert len(raw) < len(plain.content)
+    assert brotli.decompress(raw) == plain.content
+
+
+async def test_streaming_body_compressed_chunk_by_chunk():
+    router = APIRouter()
+    chunk = b'{"name": "Employee", "projects": [1, 2, 3]}\n' * 100
+
+    @router.get("/export", dependencies=[Depends(compressible)])
+    async def export():
+        async def body():
+            for _ in range(50):
+                yield chunk
+        return StreamingResponse(body(), media_type="application/x-ndjson")
+
+    app = FastAPI()
+    app.state.settings = Settings.from_env({"DATABASE_URL": "sqlite+aiosqlite://", "COMPRESSION_MIN_SIZE": "1024"})
+    app.add_middleware(CompressionMiddleware)
+    app.include_router(router)
+
+    sent = []
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+    disconnected = asyncio.Event()
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        # StreamingResponse слушает отключение клиента, пока отдает тело
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/export", "raw_path": b"/export", "query_string": b"",
+             "headers": [(b"accept-encoding", b"gzip")], "app": app, "http_version": "1.1",
+             "scheme": "http", "server": ("test", 80), "client": ("test", 1), "root_path": ""}
+    await app(scope, receive, send)
+
+    headers = dict(sent[0]["headers"])
+    assert headers[b"content-encoding"] == b"gzip"
+    bodies = [message["body"] for message in sent[1:]]
+    # Тело отправляется несколькими порциями по мере сжатия, а не одним буфером в конце
+    assert len(bodies) > 1
+    assert gzip.decompress(b"".join(bodies)) == chunk * 50
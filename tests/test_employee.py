@@ -2,8 +2,9 @@ from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
-from app.models import EmployeeORM
+from app.models import EmployeeORM, ProjectORM, EmployeeProjectAssignmentORM
 from app.schemas.employee import EmployeeCreate
+from app.utils.restrictions import is_assignment_allowed
 
 
 async def test_create_employee(client: AsyncClient, db_session: AsyncSession):
@@ -136,3 +137,67 @@ async def test_delete_employee(client: AsyncClient, db_session: AsyncSession):
     result = await db_session.execute(select(EmployeeORM).filter_by(id=employee.id))
     db_employee = result.scalar_one_or_none()
     assert db_employee is None
+
+
+async def test_assignable_projects_agree_with_assignment_rules(client: AsyncClient, db_session: AsyncSession):
+    roots = [ProjectORM(name=f"Root {i}") for i in range(3)]
+    db_session.add_all(roots)
+    await db_session.commit()
+    children = [ProjectORM(name=f"Child {i}", parent_id=roots[0].id) for i in range(3)]
+    db_session.add_all(children)
+    await db_session.commit()
+    grandchild = ProjectORM(name="Grandchild", parent_id=children[0].id)
+    employee = EmployeeORM(name="Employee", rank="3")
+    db_session.add_all([grandchild, employee])
+    await db_session.commit()
+
+    for project in (roots[0], roots[1], children[0]):
+        db_session.add(EmployeeProjectAssignmentORM(employee_id=employee.id, project_id=project.id))
+    await db_session.commit()
+
+    response = await client.get(f"/employees/{employee.id}/assignable-projects", params={"include_rejected": True})
+    assert response.status_code == 200
+    body = response.json()
+    assert {project["id"] for project in body["assignable"]} == {children[1].id, children[2].id, grandchild.id}
+    assert {project["id"] for project in body["rejected"]} == {roots[2].id}
+
+    await db_session.refresh(employee)
+    for project in body["assignable"] + body["rejected"]:
+        db_project = await db_session.get(ProjectORM, project["id"])
+        is_allowed, reason = await is_assignment_allowed(db_session, employee, db_project)
+        assert (project["reason"] is None) == is_allowed
+        if not is_allowed:
+            assert project["reason"] == reason
+
+    response = await client.get(f"/employees/{employee.id}/assignable-projects")
+    assert response.json()["rejected"] is None
+
+    response = await client.get("/employees/999/assignable-projects")
+    assert response.status_code == 404
+
+
+async def test_update_employee_with_stale_if_match_is_rejected(client: AsyncClient, db_session: AsyncSession):
+    employee = EmployeeORM(name="Jane", rank="2")
+    db_session.add(employee)
+    await db_session.commit()
+
+    response = await client.get(f"/employees/{employee.id}")
+    etag = response.headers["ETag"]
+    assert etag == '"1"'
+
+    response = await client.put(f"/employees/{employee.id}", json={"name": "Jane A", "rank": "2"},
+                                headers={"If-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"2"'
+
+    # Второй редактор прочитал сотрудника до первого изменения
+    response = await client.put(f"/employees/{employee.id}", json={"name": "Jane B", "rank": "3"},
+                                headers={"If-Match": etag})
+    assert response.status_code == 412
+
+    response = await client.get(f"/employees/{employee.id}")
+    assert response.json()["name"] == "Jane A"
+    assert response.headers["ETag"] == '"2"'
+
+    response = await client.put("/employees/999999", json={"name": "Nobody", "rank": "1"}, headers={"If-Match": '"1"'})
+    assert response.status_code == 404
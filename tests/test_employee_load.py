@@ -0,0 +1,118 @@
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models import ProjectORM, EmployeeORM, EmployeeLoadORM
+from app.services.load_service import rebuild_employee_load
+
+
+async def load_rows(db_session: AsyncSession):
+    result = await db_session.execute(
+        select(EmployeeLoadORM.employee_id, EmployeeLoadORM.root_project_id, EmployeeLoadORM.is_top_level,
+               EmployeeLoadORM.subproject_count, EmployeeLoadORM.assignment_count)
+        .order_by(EmployeeLoadORM.employee_id, EmployeeLoadORM.root_project_id)
+    )
+    return [tuple(row) for row in result.all()]
+
+
+async def test_employee_load_maintained_on_writes_matches_rebuild(client: AsyncClient, db_session: AsyncSession):
+    root = ProjectORM(name="Root", parent_id=None)
+    other_root = ProjectORM(name="Other root", parent_id=None)
+    db_session.add_all([root, other_root])
+    await db_session.flush()
+    child = ProjectORM(name="Child", parent_id=root.id)
+    db_session.add(child)
+    await db_session.flush()
+    grandchild = ProjectORM(name="Grandchild", parent_id=child.id)
+    db_session.add(grandchild)
+    first = EmployeeORM(name="First", rank="2")
+    second = EmployeeORM(name="Second", rank="1")
+    db_session.add_all([first, second])
+    await db_session.commit()
+
+    for employee_id, project_id in [(first.id, root.id), (first.id, child.id), (first.id, grandchild.id),
+                                    (second.id, child.id), (second.id, other_root.id)]:
+        response = await client.post("/add-employee-to-project",
+                                     json={"employee_id": employee_id, "project_id": project_id})
+        assert response.status_code == 200
+
+    assert await load_rows(db_session) == [
+        (first.id, root.id, True, 1, 3),
+        (second.id, root.id, False, 1, 1),
+        (second.id, other_root.id, True, 0, 1),
+    ]
+
+    response = await client.request("DELETE", "/delete-employee-to-project",
+                                    json={"employee_id": second.id, "project_id": child.id})
+    assert response.status_code == 200
+    response = await client.patch(f"/projects/{child.id}", json={"parent_id": other_root.id, "ignore_conflicts": True})
+    assert response.status_code == 200
+
+    maintained = await load_rows(db_session)
+    assert maintained == [
+        (first.id, root.id, True, 0, 1),
+        (first.id, other_root.id, False, 1, 2),
+        (second.id, other_root.id, True, 0, 1),
+    ]
+
+    await rebuild_employee_load(db_session)
+    await db_session.commit()
+    assert await load_rows(db_session) == maintained
+
+
+async def test_rebuild_fixes_drift_and_rank_check_uses_counters(client: AsyncClient, db_session: AsyncSession):
+    roots = [ProjectORM(name=f"Root {i}", parent_id=None) for i in range(3)]
+    db_session.add_all(roots)
+    employee = EmployeeORM(name="Lead", rank="3")
+    db_session.add(employee)
+    await db_session.commit()
+
+    for project in roots[:2]:
+        response = await client.post("/add-employee-to-project",
+                                     json={"employee_id": employee.id, "project_id": project.id})
+        assert response.status_code == 200
+
+    # Счетчики потеряны в обход сервисов; после пересчета проверка ранга снова видит оба проекта
+    await db_session.execute(EmployeeLoadORM.__table__.delete())
+    await db_session.commit()
+    await rebuild_employee_load(db_session)
+    await db_session.commit()
+
+    response = await client.post("/add-employee-to-project",
+                                 json={"employee_id": employee.id, "project_id": roots[2].id})
+    assert response.status_code == 400
+
+
+async def test_assign_by_rank_checks_rules_by_counters(client: AsyncClient, db_session: AsyncSession):
+    root = ProjectORM(name="Root", parent_id=None)
+    db_session.add(root)
+    await db_session.flush()
+    done, target = ProjectORM(name="Done", parent_id=root.id), ProjectORM(name="Target", parent_id=root.id)
+    db_session.add_all([done, target])
+    busy, free, newcomer = (EmployeeORM(name=name, rank="4") for name in ("Busy", "Free", "Newcomer"))
+    db_session.add_all([busy, free, newcomer])
+    await db_session.commit()
+
+    for employee_id, project_id in [(busy.id, root.id), (busy.id, done.id), (free.id, root.id)]:
+        response = await client.post("/add-employee-to-project",
+                                     json={"employee_id": employee_id, "project_id": project_id})
+        assert response.status_code == 200
+
+    # Ранг 4: у Busy подпроект уже есть; у Newcomer назначений нет, ему доступен любой проект
+    response = await client.post("/assign-employees-by-rank/", json={"project_id": target.id, "rank": "4"})
+    assert response.status_code == 200
+    skipped = response.json()["skipped_employees"]
+    assert [employee["employee_id"] for employee in skipped] == [busy.id]
+    assert skipped[0]["conflict_details"].startswith("Ранг 4")
+
+    expected = [
+        (busy.id, root.id, True, 1, 2),
+        (free.id, root.id, True, 1, 2),
+        (newcomer.id, root.id, False, 1, 1),
+    ]
+    assert await load_rows(db_session) == expected
+
+    # Повторный вызов пропускает уже назначенных и не меняет счетчики
+    response = await client.post("/assign-employees-by-rank/", json={"project_id": target.id, "rank": "4"})
+    assert [employee["employee_id"] for employee in response.json()["skipped_employees"]] == [busy.id]
+    assert await load_rows(db_session) == expected
@@ -0,0 +1,203 @@
+import asyncio
+import tempfile
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.main import create_app
+from app.models import Base, EmployeeLoadORM, ProjectEventORM, ProjectORM
+from app.settings import Settings
+from app.utils.clock import utcnow
+from app.utils.hierarchy import HierarchyIndex
+
+
+def test_index_roots_depths_and_ancestors():
+    index = HierarchyIndex()
+    # 5 и 6 ссылаются друг на друга, 7 - на несуществующий проект
+    index.replace([(1, None), (2, 1), (3, 2), (4, None), (5, 6), (6, 5), (7, 99)])
+
+    assert [index.root_of(project_id) for project_id in (1, 2, 3, 4)] == [1, 1, 1, 4]
+    assert [index.depth_of(project_id) for project_id in (1, 2, 3)] == [0, 1, 2]
+    assert index.ancestor_ids(3) == {1, 2}
+    assert index.is_ancestor(1, 3) and not index.is_ancestor(3, 1) and not index.is_ancestor(4, 3)
+    assert index.root_of(5) is None and index.root_of(7) is None
+    assert index.size == 7
+
+    index.move(2, 4)
+    assert index.root_of(3) == 4 and index.depth_of(3) == 2 and index.ancestor_ids(3) == {2, 4}
+
+    index.add(8, 3)
+    assert index.root_of(8) == 4 and index.depth_of(8) == 3
+
+    # Перенос и удаление обходят только поддерево по спискам детей
+    assert index._subtree(2) == [2, 3, 8] and index.children[4] == {2}
+
+    index.remove(2)
+    assert not index.contains(2) and not index.contains(3) and not index.contains(8)
+    assert index.contains(4) and index.size == 5 and 4 not in index.children
+
+    # Появился родитель, на которого ссылался 7: поддерево получает корень
+    index.add(99, None)
+    assert index.root_of(7) == 99 and index.depth_of(7) == 1
+
+    # Повтор события создания для проекта с детьми переносит все поддерево
+    index.add(9, 7)
+    index.add(7, 4)
+    assert index.root_of(9) == 4 and index.depth_of(9) == 2 and index.children.get(99) is None
+
+
+def test_moved_view_leaves_index_untouched():
+    index = HierarchyIndex()
+    index.replace([(1, None), (2, 1), (3, 2), (4, None)])
+
+    moved = index.moved(2, 4)
+    assert moved.parent_of(2) == 4 and moved.root_of(3) == 4 and moved.root_of(1) == 1
+    assert index.root_of(3) == 1 and index.parent_of(2) == 1
+    assert index.moved(2, 3).root_of(3) is None
+
+
+async def test_reload_replays_updates_made_while_reading():
+    index = HierarchyIndex()
+
+    class SlowSession:
+        async def execute(self, statement):
+            # Пока сверка читает базу, сервис создает проект, которого в прочитанных строках нет
+            await asyncio.sleep(0)
+            index.add(3, 1)
+
+            class Result:
+                def scalar_one(self):
+                    return 0
+
+                def all(self):
+                    return [(1, None), (2, 1)]
+
+            return Result()
+
+    assert await index.reload(SlowSession()) == 3
+    assert index.root_of(3) == 1 and index.ancestor_ids(3) == {1}
+
+
+@pytest.fixture
+async def database_url():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        database_url = f"sqlite+aiosqlite:///{temp_dir}/test.db"
+        engine = create_async_engine(database_url)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(ProjectORM), [{"id": 1, "name": "Seeded", "parent_id": None},
+                                                    {"id": 2, "name": "Child", "parent_id": 1}])
+        await engine.dispose()
+        yield database_url
+
+
+async def test_index_follows_service_writes_and_reconciles(database_url):
+    app = create_app(Settings.from_env({"DATABASE_URL": database_url, "HIERARCHY_RECONCILE_SECONDS": "0.05"}))
+    async with app.router.lifespan_context(app):
+        index = app.state.hierarchy
+        assert index.root_of(2) == 1
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test/api") as client:
+            top = (await client.post("/projects/", json={"name": "Top"})).json()
+            sub = (await client.post("/projects/", json={"name": "Sub", "parent_id": top["id"]})).json()
+            assert index.root_of(sub["id"]) == top["id"]
+
+            response = await client.patch(f"/projects/{top['id']}", json={"parent_id": 2})
+            assert response.status_code == 200
+            assert index.root_of(sub["id"]) == 1 and index.ancestor_ids(sub["id"]) == {top["id"], 2, 1}
+
+            employee = (await client.post("/employees/", json={"name": "Ann", "rank": "1"})).json()
+            response = await client.post("/add-employee-to-project",
+                                         json={"employee_id": employee["id"], "project_id": sub["id"]})
+            assert response.status_code == 200
+
+            response = await client.delete(f"/projects/{top['id']}")
+            assert response.status_code == 200
+            assert not index.contains(top["id"]) and not index.contains(sub["id"])
+
+        # Запись другого воркера: индекс узнает о ней из журнала при сверке
+        engine = create_async_engine(database_url)
+        async with engine.begin() as conn:
+            await conn.execute(insert(ProjectORM).values(id=50, name="Elsewhere", parent_id=2))
+            await conn.execute(update(ProjectORM).where(ProjectORM.id == 2).values(parent_id=None))
+            await conn.execute(insert(ProjectEventORM), [
+                {"project_id": 50, "parent_id": 2, "action": "created", "created_at": utcnow()},
+                {"project_id": 2, "parent_id": None, "action": "moved", "created_at": utcnow()},
+            ])
+        await engine.dispose()
+        assert not index.contains(50)
+
+        for _ in range(100):
+            if index.contains(50):
+                break
+            await asyncio.sleep(0.02)
+        assert index.root_of(50) == 2 and index.parent_of(2) is None
+
+        # После restore-snapshot индекс перечитывается целиком
+        engine = create_async_engine(database_url)
+        async with engine.begin() as conn:
+            await conn.execute(insert(ProjectORM).values(id=60, name="Restored", parent_id=None))
+            await conn.execute(insert(ProjectEventORM).values(project_id=0, parent_id=None, action="restored",
+                                                              created_at=utcnow()))
+        await engine.dispose()
+
+        for _ in range(100):
+            if index.contains(60):
+                break
+            await asyncio.sleep(0.02)
+        assert index.root_of(60) == 60 and index.root_of(50) == 2
+
+
+async def test_read_paths_catch_up_from_event_log(database_url):
+    app = create_app(Settings.from_env({"DATABASE_URL": database_url, "HIERARCHY_RECONCILE_SECONDS": "0"}))
+    async with app.router.lifespan_context(app):
+        index = app.state.hierarchy
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test/api") as client:
+            top = (await client.post("/projects/", json={"name": "Top"})).json()
+
+            # Другой воркер переносит проект 2 под новый корень (с событием в журнале) и создает под ним
+            # проект в обход журнала; сверка выключена, индекс об этом пока не знает
+            engine = create_async_engine(database_url)
+            async with engine.begin() as conn:
+                await conn.execute(update(ProjectORM).where(ProjectORM.id == 2).values(parent_id=top["id"]))
+                await conn.execute(insert(ProjectEventORM).values(project_id=2, parent_id=top["id"], action="moved",
+                                                                  created_at=utcnow()))
+                await conn.execute(insert(ProjectORM).values(id=50, name="Elsewhere", parent_id=2))
+            await engine.dispose()
+            assert index.root_of(2) == 1 and not index.contains(50)
+
+            employee = (await client.post("/employees/", json={"name": "Ann", "rank": "3"})).json()
+            for project_id in (top["id"], 2, 50):
+                response = await client.post("/add-employee-to-project",
+                                             json={"employee_id": employee["id"], "project_id": project_id})
+                assert response.status_code == 200
+
+            # Счетчики записаны по корню из базы, а не по устаревшему индексу
+            engine = create_async_engine(database_url)
+            async with engine.connect() as conn:
+                rows = (await conn.execute(select(EmployeeLoadORM.root_project_id, EmployeeLoadORM.subproject_count,
+                                                  EmployeeLoadORM.assignment_count))).all()
+            await engine.dispose()
+            assert rows == [(top["id"], 1, 3)]
+
+            # Путь чтения догоняет индекс по журналу, проект 50 ему по-прежнему неизвестен:
+            # список проектов строит лес из прочитанных строк
+            response = await client.get(f"/employees/{employee['id']}/assignable-projects?include_rejected=true")
+            assert response.status_code == 200
+            assert index.root_of(2) == top["id"] and not index.contains(50)
+            assert [project["id"] for project in response.json()["assignable"]] == [1]
+
+            # Моделирование встречает неизвестный индексу проект и читает лес из базы
+            result = (await client.post("/rank-policy/simulate", json={})).json()
+            assert result["assignments_evaluated"] == 3
+            assert result["violating_before"] == 0
+
+            # Доукомплектование берет корень проекта 2 из догнанного индекса
+            bob = (await client.post("/employees/", json={"name": "Bob", "rank": "3"})).json()
+            response = await client.post("/add-employee-to-project",
+                                         json={"employee_id": bob["id"], "project_id": top["id"]})
+            assert response.status_code == 200
+            response = await client.post("/projects/2/auto-staff", json={"targets": {"3": 2}, "dry_run": True})
+            assert response.json()["ranks"][0]["selected"] == [bob["id"]]
@@ -0,0 +1,83 @@
+import json
+
+from httpx import AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import ProjectORM, EmployeeORM, EmployeeProjectAssignmentORM, ProjectEventORM, AssignmentEventORM
+
+
+def ndjson(*records):
+    return "\n".join(json.dumps(record, ensure_ascii=False) for record in records)
+
+
+async def test_import_ndjson(client: AsyncClient, db_session: AsyncSession):
+    body = ndjson(
+        {"type": "project", "key": "root", "name": "Root"},
+        {"type": "project", "key": "a", "name": "A", "parent_key": "root"},
+        {"type": "project", "key": "b", "name": "B", "parent_key": "root"},
+        {"type": "project", "key": "c", "name": "C", "parent_key": "root"},
+        {"type": "project", "key": "orphan", "name": "Orphan", "parent_key": "missing"},
+        {"type": "employee", "key": "e1", "name": "Ivan", "rank": "4"},
+        {"type": "employee", "key": "e2", "name": "Petr", "rank": "9"},
+        {"type": "assignment", "employee_key": "e1", "project_key": "root"},
+        {"type": "assignment", "employee_key": "e1", "project_key": "a"},
+        # Ранг 4: второй подпроект запрещен
+        {"type": "assignment", "employee_key": "e1", "project_key": "b"},
+        {"type": "assignment", "employee_key": "e1", "project_key": "c", "ignore_conflicts": True},
+        {"type": "project", "key": "late", "name": "Late"},
+    )
+
+    response = await client.post("/import?format=ndjson", content=body)
+    assert response.status_code == 200
+    summary = response.json()
+    assert (summary["projects"], summary["employees"], summary["assignments"]) == (4, 1, 3)
+    assert summary["rejected"] == 4
+    assert [row["line"] for row in summary["rejected_rows"]] == [5, 7, 10, 12]
+    assert summary["rejected_rows"][2]["reason"].startswith("Ранг 4")
+
+    result = await db_session.execute(select(ProjectORM).filter(ProjectORM.name == "A"))
+    project_a = result.scalar_one()
+    result = await db_session.execute(select(ProjectORM).filter(ProjectORM.name == "Root"))
+    assert project_a.parent_id == result.scalar_one().id
+
+    result = await db_session.execute(select(EmployeeProjectAssignmentORM))
+    assert len(result.scalars().all()) == 3
+
+    # Импортированные проекты попадают в ленту событиями created раньше назначений на них
+    result = await db_session.execute(select(ProjectEventORM.project_id, ProjectEventORM.parent_id,
+                                             ProjectEventORM.action, ProjectEventORM.created_at))
+    project_events = result.all()
+    result = await db_session.execute(select(ProjectORM.id, ProjectORM.parent_id).order_by(ProjectORM.id))
+    assert [(project_id, parent_id, action) for project_id, parent_id, action, _ in project_events] == [
+        (project_id, parent_id, "created") for project_id, parent_id in result.all()
+    ]
+    result = await db_session.execute(select(func.min(AssignmentEventORM.created_at)))
+    assert max(created_at for *_, created_at in project_events) <= result.scalar_one()
+
+
+async def test_import_csv(client: AsyncClient, db_session: AsyncSession):
+    body = "\n".join([
+        "type,key,name,parent_key,rank,employee_key,project_key",
+        "project,p1,Root,,,,",
+        'project,p2,"Sub, with comma",p1,,,',
+        'project,p3,"Multi',
+        'line",p2,,,',
+        "employee,e1,Anna,,3,,",
+        "assignment,,,,,e1,p1",
+        "assignment,,,,,e1,p3",
+        "assignment,,,,,e1,p3",
+    ])
+
+    response = await client.post("/import?format=csv", content=body)
+    assert response.status_code == 200
+    summary = response.json()
+    assert (summary["projects"], summary["employees"], summary["assignments"]) == (3, 1, 2)
+    assert summary["rejected_rows"] == [
+        {"line": 9, "type": "assignment", "reason": "Employee already assigned to this project"}
+    ]
+
+    result = await db_session.execute(select(ProjectORM.name).order_by(ProjectORM.id))
+    assert result.scalars().all() == ["Root", "Sub, with comma", "Multi\nline"]
+    result = await db_session.execute(select(EmployeeORM.rank))
+    assert result.scalars().all() == ["3"]
@@ -0,0 +1,71 @@
+import asyncio
+import tempfile
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.main import create_app
+from app.models import Base
+from app.settings import Settings
+
+
+@pytest.fixture
+async def jobs_app():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        database_url = f"sqlite+aiosqlite:///{temp_dir}/test.db"
+        engine = create_async_engine(database_url)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await engine.dispose()
+
+        app = create_app(Settings.from_env({"DATABASE_URL": database_url, "JOB_CHUNK_SIZE": "2"}))
+        async with app.router.lifespan_context(app):
+            yield app
+
+
+async def wait_for_job(client, job_id):
+    for _ in range(100):
+        response = await client.get(f"/jobs/{job_id}")
+        assert response.status_code == 200
+        if response.json()["status"] in ("done", "failed", "interrupted"):
+            return response.json()
+        await asyncio.sleep(0.02)
+    raise AssertionError("Job did not finish")
+
+
+async def test_async_assign_by_rank_reports_progress(jobs_app):
+    async with AsyncClient(transport=ASGITransport(app=jobs_app), base_url="http://test/api") as client:
+        top_ids = []
+        for i in range(3):
+            response = await client.post("/projects/", json={"name": f"Top {i}"})
+            top_ids.append(response.json()["id"])
+
+        # Сотрудник 3 ранга уже в двух верхнеуровневых проектах - третий ему недоступен
+        busy = (await client.post("/employees/", json={"name": "Busy", "rank": "3"})).json()
+        for project_id in top_ids[:2]:
+            await client.post("/add-employee-to-project", json={"employee_id": busy["id"], "project_id": project_id})
+        for i in range(4):
+            await client.post("/employees/", json={"name": f"Free {i}", "rank": "3"})
+
+        response = await client.post("/assign-employees-by-rank/?async=true",
+                                     json={"project_id": top_ids[2], "rank": "3"})
+        assert response.status_code == 202
+        job = await wait_for_job(client, response.json()["job_id"])
+
+    assert job["status"] == "done"
+    assert job["total"] == 5
+    assert job["processed"] == 5
+    assert job["assigned"] == 4
+    assert job["progress_percent"] == 100.0
+    assert job["throughput_per_second"] is not None
+    assert [skipped["employee_id"] for skipped in job["skipped_employees"]] == [busy["id"]]
+
+
+async def test_async_assign_by_rank_validates_before_queueing(jobs_app):
+    async with AsyncClient(transport=ASGITransport(app=jobs_app), base_url="http://test/api") as client:
+        response = await client.post("/assign-employees-by-rank/?async=true", json={"project_id": 999, "rank": "1"})
+        assert response.status_code == 404
+
+        response = await client.get("/jobs/999")
+        assert response.status_code == 404
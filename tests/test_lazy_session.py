@@ -0,0 +1,71 @@
+import tempfile
+
+import pytest
+from fastapi import APIRouter, Depends, FastAPI
+from httpx import AsyncClient, ASGITransport
+from pydantic import BaseModel, field_validator
+from sqlalchemy import text
+
+from app.database import Database, LazySession, SessionScopedRoute, get_db
+from app.settings import Settings
+
+
+@pytest.fixture
+async def pooled_database():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        database = Database(Settings.from_env({"DATABASE_URL": f"sqlite+aiosqlite:///{temp_dir}/test.db"}))
+        yield database
+        await database.dispose()
+
+
+async def test_connection_checked_out_only_on_first_statement(pooled_database):
+    pooled_engine = pooled_database.engine
+    session = LazySession(pooled_database.session_factory)
+    assert pooled_engine.pool.checkedout() == 0
+
+    assert (await session.execute(text("SELECT 1"))).scalar() == 1
+    assert pooled_engine.pool.checkedout() == 1
+
+    await session.release()
+    assert pooled_engine.pool.checkedout() == 0
+
+    # После освобождения прокси снова открывает сессию по требованию
+    assert (await session.execute(text("SELECT 2"))).scalar() == 2
+    await session.release()
+
+
+async def test_connection_released_before_response_serialization(pooled_database):
+    pooled_engine = pooled_database.engine
+    checked_out_during_serialization = []
+
+    class Out(BaseModel):
+        value: int
+
+        @field_validator("value")
+        @classmethod
+        def record_pool(cls, value):
+            checked_out_during_serialization.append(pooled_engine.pool.checkedout())
+            return value
+
+    router = APIRouter(route_class=SessionScopedRoute)
+
+    @router.get("/value", response_model=Out)
+    async def get_value(db=Depends(get_db)):
+        return {"value": (await db.execute(text("SELECT 42"))).scalar()}
+
+    @router.get("/idle")
+    async def idle(db=Depends(get_db)):
+        return {"checked_out": pooled_engine.pool.checkedout()}
+
+    app = FastAPI()
+    app.state.database = pooled_database
+    app.include_router(router)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/value")
+        assert response.json() == {"value": 42}
+        assert checked_out_during_serialization == [0]
+
+        # Запрос, не обращавшийся к базе, не занимает соединение вовсе
+        response = await client.get("/idle")
+        assert response.json() == {"checked_out": 0}
@@ -0,0 +1,69 @@
+import random
+
+from httpx import AsyncClient
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import ProjectORM, EmployeeORM, EmployeeProjectAssignmentORM
+
+
+async def create_org(db_session: AsyncSession):
+    rng = random.Random(3)
+    roots = [ProjectORM(name=f"Root {i}") for i in range(4)]
+    db_session.add_all(roots)
+    await db_session.commit()
+    children = [ProjectORM(name=f"Child {root.id}.{i}", parent_id=root.id) for root in roots for i in range(3)]
+    db_session.add_all(children)
+    await db_session.commit()
+    projects = roots + children
+
+    employees = [EmployeeORM(name=f"Employee {i}", rank=rng.choice("1234")) for i in range(60)]
+    db_session.add_all(employees)
+    await db_session.commit()
+    await db_session.execute(insert(EmployeeProjectAssignmentORM.__table__), [
+        {"employee_id": employee.id, "project_id": project.id}
+        for employee in employees
+        for project in rng.sample(projects, rng.randint(0, 5))
+    ])
+    await db_session.commit()
+    return employees
+
+
+async def test_simulation_without_changes_matches_audit(client: AsyncClient, db_session: AsyncSession):
+    await create_org(db_session)
+
+    audit = (await client.get("/audit/rank-rules")).json()
+    response = await client.post("/rank-policy/simulate", json={})
+    assert response.status_code == 200
+    result = response.json()
+
+    assert result["violating_before"] == result["violating_after"] == audit["employees"]
+    assert result["newly_violating"] == [] and result["resolved"] == []
+
+
+async def test_simulation_reports_rank_change_and_limit_impact(client: AsyncClient, db_session: AsyncSession):
+    roots = [ProjectORM(name=f"Root {i}") for i in range(3)]
+    employee = EmployeeORM(name="Employee", rank="1")
+    db_session.add_all([*roots, employee])
+    await db_session.commit()
+    await db_session.execute(insert(EmployeeProjectAssignmentORM.__table__),
+                             [{"employee_id": employee.id, "project_id": root.id} for root in roots])
+    await db_session.commit()
+
+    # Понижение до ранга 3: три верхнеуровневых проекта при лимите 2
+    response = await client.post("/rank-policy/simulate", json={"rank_changes": {str(employee.id): "3"}})
+    result = response.json()
+    assert result["violating_after_by_rank"] == {"3": 1}
+    assert result["newly_violating"] == [
+        {"employee_id": employee.id, "rank_before": "1", "rank_after": "3", "rules": ["top_level_limit"]}
+    ]
+
+    # Тот же перевод при поднятом лимите ранга 3 ничего не нарушает
+    response = await client.post("/rank-policy/simulate", json={
+        "rank_changes": {str(employee.id): "3"},
+        "limits": {"3": {"max_top_level": 3}},
+    })
+    assert response.json()["violating_after"] == 0
+
+    response = await client.post("/rank-policy/simulate", json={"rank_changes": {"999": "2"}})
+    assert response.status_code == 400
@@ -1,8 +1,15 @@
+import pytest
+from fastapi import HTTPException
 from httpx import AsyncClient
+from sqlalchemy import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.orm import sessionmaker
 
-from app.models import ProjectORM
+from app.models import ProjectORM, EmployeeORM, EmployeeProjectAssignmentORM
+from app.schemas.project import ProjectMove
+from app.services.project_service import ProjectService
+from app.services.stats_service import StatsService, refresh_project_stats
 
 
 # Тестируем создание проекта
@@ -160,3 +167,221 @@ async def test_delete_project_not_found(client: AsyncClient):
     response = await client.delete(f"/projects/{9999}")
     assert response.status_code == 404
     assert response.json() == {"detail": "Project not found"}
+
+
+async def test_project_stats_count_distinct_employees_in_subtree(client: AsyncClient, db_session: AsyncSession):
+    root = ProjectORM(name="Root")
+    other_root = ProjectORM(name="Other root")
+    db_session.add_all([root, other_root])
+    await db_session.commit()
+    child = ProjectORM(name="Child", parent_id=root.id)
+    db_session.add(child)
+    await db_session.commit()
+    grandchild = ProjectORM(name="Grandchild", parent_id=child.id)
+    db_session.add(grandchild)
+    await db_session.commit()
+
+    senior = EmployeeORM(name="Senior", rank="2")
+    junior = EmployeeORM(name="Junior", rank="4")
+    db_session.add_all([senior, junior])
+    await db_session.commit()
+    # Сотрудник в нескольких узлах одного дерева считается один раз
+    db_session.add_all([
+        EmployeeProjectAssignmentORM(employee_id=senior.id, project_id=root.id),
+        EmployeeProjectAssignmentORM(employee_id=senior.id, project_id=grandchild.id),
+        EmployeeProjectAssignmentORM(employee_id=junior.id, project_id=child.id),
+    ])
+    await db_session.commit()
+
+    response = await client.get(f"/projects/{child.id}/stats")
+    assert response.status_code == 200
+    assert response.json() == {"project_id": child.id, "name": "Child", "headcount": 2,
+                               "by_rank": {"2": 1, "4": 1}}
+
+    response = await client.get("/projects/stats")
+    assert response.status_code == 200
+    assert response.json() == {
+        "projects": [
+            {"project_id": root.id, "name": "Root", "headcount": 2, "by_rank": {"2": 1, "4": 1}},
+            {"project_id": other_root.id, "name": "Other root", "headcount": 0, "by_rank": {}},
+        ],
+        "refreshed_at": None,
+    }
+
+    response = await client.get("/projects/999/stats")
+    assert response.status_code == 404
+
+
+async def test_forest_stats_from_refreshed_summary(db_session: AsyncSession):
+    root = ProjectORM(name="Root")
+    employee = EmployeeORM(name="Employee", rank="3")
+    db_session.add_all([root, employee])
+    await db_session.commit()
+    db_session.add(EmployeeProjectAssignmentORM(employee_id=employee.id, project_id=root.id))
+    await db_session.commit()
+
+    service = StatsService(db_session, use_summary=True)
+    stale = await service.get_forest_stats()
+    assert stale.projects[0].headcount == 0 and stale.refreshed_at is None
+
+    assert await refresh_project_stats(db_session)
+    fresh = await service.get_forest_stats()
+    assert fresh.projects[0].by_rank == {"3": 1}
+    assert fresh.refreshed_at is not None
+
+
+async def test_auto_staff_picks_least_loaded_valid_candidates(client: AsyncClient, db_session: AsyncSession):
+    root = ProjectORM(name="Root", parent_id=None)
+    db_session.add(root)
+    await db_session.flush()
+    child = ProjectORM(name="Child", parent_id=root.id)
+    other_child = ProjectORM(name="Other child", parent_id=root.id)
+    db_session.add_all([child, other_child])
+    busy = EmployeeORM(name="Busy", rank="4")
+    free = EmployeeORM(name="Free", rank="4")
+    full = EmployeeORM(name="Full", rank="4")
+    lead = EmployeeORM(name="Lead", rank="3")
+    db_session.add_all([busy, free, full, lead])
+    await db_session.flush()
+    db_session.add_all([
+        EmployeeProjectAssignmentORM(employee_id=busy.id, project_id=root.id),
+        EmployeeProjectAssignmentORM(employee_id=full.id, project_id=root.id),
+        EmployeeProjectAssignmentORM(employee_id=full.id, project_id=other_child.id),
+        EmployeeProjectAssignmentORM(employee_id=lead.id, project_id=child.id),
+    ])
+    await db_session.commit()
+
+    # Ранг 4 с подпроектом уже занят, поэтому подходят двое; назначенный ранг 3 засчитывается в цель
+    request = {"targets": {"4": 3, "3": 1}, "dry_run": True}
+    response = await client.post(f"/projects/{child.id}/auto-staff", json=request)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["assigned"] == 0
+    by_rank = {item["rank"]: item for item in body["ranks"]}
+    assert by_rank["4"]["selected"] == [free.id, busy.id]
+    assert by_rank["4"]["shortfall"] == 1
+    assert by_rank["3"] == {"rank": "3", "target": 1, "already_assigned": 1, "selected": [], "shortfall": 0}
+
+    response = await client.post(f"/projects/{child.id}/auto-staff",
+                                 json={"targets": {"4": 1}, "candidate_ids": [busy.id, full.id, lead.id]})
+    assert response.status_code == 200
+    assert response.json()["ranks"][0]["selected"] == [busy.id]
+
+    result = await db_session.execute(
+        select(EmployeeProjectAssignmentORM.employee_id).filter_by(project_id=child.id)
+    )
+    assert set(result.scalars().all()) == {lead.id, busy.id}
+
+    response = await client.post(f"/projects/{child.id}/auto-staff",
+                                 json={"targets": {"4": 1}, "candidate_ids": [999999]})
+    assert response.status_code == 400
+
+
+async def test_move_project_reports_conflicts_and_applies_with_override(client: AsyncClient,
+                                                                        db_session: AsyncSession):
+    root_a = ProjectORM(name="A", parent_id=None)
+    root_c = ProjectORM(name="C", parent_id=None)
+    db_session.add_all([root_a, root_c])
+    await db_session.flush()
+    a1 = ProjectORM(name="A1", parent_id=root_a.id)
+    a2 = ProjectORM(name="A2", parent_id=root_a.id)
+    db_session.add_all([a1, a2])
+    lead = EmployeeORM(name="Lead", rank="3")
+    db_session.add(lead)
+    await db_session.flush()
+    db_session.add_all([
+        EmployeeProjectAssignmentORM(employee_id=lead.id, project_id=project_id)
+        for project_id in (root_a.id, a1.id, a2.id, root_c.id)
+    ])
+    await db_session.commit()
+
+    response = await client.patch(f"/projects/{root_a.id}", json={"parent_id": a1.id})
+    assert response.status_code == 400
+
+    response = await client.patch(f"/projects/{root_c.id}", json={"parent_id": 999999})
+    assert response.status_code == 404
+
+    # C станет третьим прямым подпроектом A: у ранга 3 лимит 2
+    response = await client.patch(f"/projects/{root_c.id}", json={"parent_id": root_a.id})
+    assert response.status_code == 409
+    conflicts = response.json()["detail"]["conflicts"]
+    assert [(conflict["employee_id"], conflict["rules"]) for conflict in conflicts] == [(lead.id, ["subproject_limit"])]
+
+    await db_session.refresh(root_c)
+    assert root_c.parent_id is None
+
+    response = await client.patch(f"/projects/{root_c.id}", json={"parent_id": root_a.id, "ignore_conflicts": True})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["moved"] is True
+    assert body["employees_checked"] == 1
+    assert body["project"]["parent_id"] == root_a.id
+
+    await db_session.refresh(root_c)
+    assert root_c.parent_id == root_a.id
+
+    response = await client.patch(f"/projects/{root_c.id}", json={"parent_id": None})
+    assert response.status_code == 200
+    assert response.json()["conflicts"] == []
+
+
+async def test_move_project_honours_if_match(client: AsyncClient, db_session: AsyncSession):
+    root = ProjectORM(name="Root", parent_id=None)
+    other = ProjectORM(name="Other", parent_id=None)
+    db_session.add_all([root, other])
+    await db_session.commit()
+
+    response = await client.get(f"/projects/{other.id}")
+    etag = response.headers["ETag"]
+
+    response = await client.patch(f"/projects/{other.id}", json={"parent_id": root.id}, headers={"If-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+    response = await client.patch(f"/projects/{other.id}", json={"parent_id": None}, headers={"If-Match": etag})
+    assert response.status_code == 412
+
+
+async def test_concurrent_opposite_moves_cannot_create_cycle(db_session: AsyncSession):
+    a = ProjectORM(name="A", parent_id=None)
+    b = ProjectORM(name="B", parent_id=None)
+    db_session.add_all([a, b])
+    await db_session.commit()
+    session_factory = sessionmaker(bind=db_session.bind, class_=AsyncSession, expire_on_commit=False)
+
+    class RacingProjectService(ProjectService):
+        async def find_move_conflicts(self, project_id, parent_id):
+            # Пока этот запрос переносит A под B, другой успевает перенести B под A
+            async with session_factory() as other:
+                await ProjectService(other).move_project(b.id, ProjectMove(parent_id=a.id))
+            return await super().find_move_conflicts(project_id, parent_id)
+
+    async with session_factory() as session:
+        with pytest.raises(HTTPException) as error:
+            await RacingProjectService(session).move_project(a.id, ProjectMove(parent_id=b.id))
+    assert error.value.status_code == 409
+
+    async with session_factory() as session:
+        result = await session.execute(select(ProjectORM.id, ProjectORM.parent_id).order_by(ProjectORM.id))
+        assert result.all() == [(a.id, None), (b.id, a.id)]
+
+
+async def test_move_project_does_not_bind_subtree_ids(client: AsyncClient, db_session: AsyncSession, sql_queries):
+    # Поддерево отбирается в базе: число параметров запроса не растет с размером поддерева,
+    # иначе большие поддеревья упираются в лимит параметров (32766 в SQLite, 32767 в asyncpg)
+    root = ProjectORM(name="Root", parent_id=None)
+    target = ProjectORM(name="Target", parent_id=None)
+    db_session.add_all([root, target])
+    await db_session.flush()
+    await db_session.execute(insert(ProjectORM), [{"name": f"Leaf {i}", "parent_id": root.id} for i in range(2000)])
+    employee = EmployeeORM(name="Lead", rank="1")
+    db_session.add(employee)
+    await db_session.flush()
+    db_session.add(EmployeeProjectAssignmentORM(employee_id=employee.id, project_id=root.id))
+    await db_session.commit()
+
+    with sql_queries.record() as statements:
+        response = await client.patch(f"/projects/{root.id}", json={"parent_id": target.id})
+    assert response.status_code == 200
+    assert response.json()["employees_checked"] == 1
+    assert max(statement.count("?") for statement in statements) < 100
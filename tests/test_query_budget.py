@@ -0,0 +1,163 @@
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import ProjectORM, EmployeeORM, EmployeeProjectAssignmentORM
+from app.services.load_service import rebuild_employee_load
+
+# Допустимое число SQL-запросов на один вызов маршрута. Бюджет не должен зависеть от объёма данных.
+# Изменения назначений и дерева проектов дополнительно пишут одну пачку событий в журнал
+# и обновляют счетчики employee_load (корень проекта, upsert, при снятии - удаление пустых строк).
+QUERY_BUDGETS = {
+    "GET /projects/": 2,
+    "GET /projects/{id}": 3,
+    "POST /projects/": 3,
+    "DELETE /projects/{id}": 5,
+    "GET /employees/": 3,
+    "GET /employees/{id}": 3,
+    "POST /employees/": 2,
+    "PUT /employees/{id}": 5,
+    "DELETE /employees/{id}": 3,
+    "POST /add-employee-to-project": 8,
+    "DELETE /delete-employee-to-project": 7,
+    "POST /assign-employees-by-rank/": 8,
+}
+
+
+async def create_chain(db_session: AsyncSession, depth: int):
+    """
+    Создает цепочку проектов заданной глубины и возвращает её целиком, начиная с корня.
+    """
+    chain = [ProjectORM(name="Root", parent_id=None)]
+    db_session.add(chain[0])
+    await db_session.commit()
+    for level in range(depth):
+        project = ProjectORM(name=f"Level {level + 1}", parent_id=chain[-1].id)
+        db_session.add(project)
+        await db_session.commit()
+        chain.append(project)
+    return chain
+
+
+async def assert_within_budget(sql_queries, route: str, request):
+    with sql_queries.record() as statements:
+        response = await request
+    assert response.status_code < 500
+    assert len(statements) <= QUERY_BUDGETS[route], statements
+    return response, len(statements)
+
+
+async def test_get_projects_constant_in_number_of_roots(client: AsyncClient, db_session: AsyncSession, sql_queries):
+    counts = []
+    for roots in (1, 10):
+        for i in range(roots):
+            root = ProjectORM(name=f"Root {i}", parent_id=None)
+            db_session.add(root)
+            await db_session.commit()
+            db_session.add(ProjectORM(name=f"Sub {i}", parent_id=root.id))
+            await db_session.commit()
+
+        _, count = await assert_within_budget(sql_queries, "GET /projects/", client.get("/projects/"))
+        counts.append(count)
+
+    assert counts[0] == counts[1]
+
+
+async def test_project_routes_within_budget(client: AsyncClient, db_session: AsyncSession, sql_queries):
+    chain = await create_chain(db_session, 2)
+
+    await assert_within_budget(sql_queries, "GET /projects/{id}", client.get(f"/projects/{chain[1].id}"))
+    await assert_within_budget(sql_queries, "POST /projects/",
+                               client.post("/projects/", json={"name": "New", "parent_id": chain[0].id}))
+    await assert_within_budget(sql_queries, "DELETE /projects/{id}", client.delete(f"/projects/{chain[2].id}"))
+
+
+async def test_get_employees_constant_in_number_of_employees(client: AsyncClient, db_session: AsyncSession,
+                                                             sql_queries):
+    project = ProjectORM(name="Project", parent_id=None)
+    db_session.add(project)
+    await db_session.commit()
+
+    counts = []
+    for employees in (1, 10):
+        for i in range(employees):
+            employee = EmployeeORM(name=f"Employee {i}", rank="1")
+            db_session.add(employee)
+            await db_session.commit()
+            db_session.add(EmployeeProjectAssignmentORM(employee_id=employee.id, project_id=project.id))
+            await db_session.commit()
+
+        _, count = await assert_within_budget(sql_queries, "GET /employees/", client.get("/employees/"))
+        counts.append(count)
+
+    assert counts[0] == counts[1]
+
+
+async def test_employee_routes_within_budget(client: AsyncClient, db_session: AsyncSession, sql_queries):
+    response, _ = await assert_within_budget(sql_queries, "POST /employees/",
+                                             client.post("/employees/", json={"name": "John Doe", "rank": "2"}))
+    employee_id = response.json()["id"]
+
+    await assert_within_budget(sql_queries, "GET /employees/{id}", client.get(f"/employees/{employee_id}"))
+    await assert_within_budget(sql_queries, "PUT /employees/{id}",
+                               client.put(f"/employees/{employee_id}", json={"name": "Jane Doe", "rank": "3"}))
+    await assert_within_budget(sql_queries, "DELETE /employees/{id}", client.delete(f"/employees/{employee_id}"))
+
+
+async def test_rank_3_assignment_constant_in_tree_depth(client: AsyncClient, db_session: AsyncSession, sql_queries):
+    counts = []
+    for depth in (2, 8):
+        chain = await create_chain(db_session, depth)
+        employee = EmployeeORM(name=f"Employee {depth}", rank="3")
+        db_session.add(employee)
+        await db_session.commit()
+        db_session.add(EmployeeProjectAssignmentORM(employee_id=employee.id, project_id=chain[0].id))
+        await rebuild_employee_load(db_session, [employee.id])
+        await db_session.commit()
+
+        response, count = await assert_within_budget(
+            sql_queries, "POST /add-employee-to-project",
+            client.post("/add-employee-to-project", json={"employee_id": employee.id, "project_id": chain[-1].id}),
+        )
+        assert response.status_code == 200
+        counts.append(count)
+
+    assert counts[0] == counts[1]
+
+
+async def test_remove_assignment_within_budget(client: AsyncClient, db_session: AsyncSession, sql_queries):
+    chain = await create_chain(db_session, 0)
+    employee = EmployeeORM(name="John Doe", rank="1")
+    db_session.add(employee)
+    await db_session.commit()
+    db_session.add(EmployeeProjectAssignmentORM(employee_id=employee.id, project_id=chain[0].id))
+    await rebuild_employee_load(db_session, [employee.id])
+    await db_session.commit()
+
+    response, _ = await assert_within_budget(
+        sql_queries, "DELETE /delete-employee-to-project",
+        client.request("DELETE", "/delete-employee-to-project",
+                       json={"employee_id": employee.id, "project_id": chain[0].id}),
+    )
+    assert response.status_code == 200
+
+
+async def test_assign_by_rank_constant_in_number_of_employees(client: AsyncClient, db_session: AsyncSession,
+                                                              sql_queries):
+    counts = []
+    for employees in (1, 10):
+        chain = await create_chain(db_session, 3)
+        for i in range(employees):
+            employee = EmployeeORM(name=f"Employee {i}", rank="3")
+            db_session.add(employee)
+            await db_session.commit()
+            db_session.add(EmployeeProjectAssignmentORM(employee_id=employee.id, project_id=chain[0].id))
+            await db_session.commit()
+
+        response, count = await assert_within_budget(
+            sql_queries, "POST /assign-employees-by-rank/",
+            client.post("/assign-employees-by-rank/", json={"project_id": chain[-1].id, "rank": "3"}),
+        )
+        assert response.status_code == 200
+        counts.append(count)
+
+    assert counts[0] == counts[1]
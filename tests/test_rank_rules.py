@@ -0,0 +1,67 @@
+import random
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import ProjectORM, EmployeeORM, EmployeeProjectAssignmentORM
+from app.utils.forest import Forest
+from app.utils.rank_rules import AssignmentProfile, check_assignment
+from app.utils.restrictions import is_assignment_allowed
+
+
+async def test_check_assignment_matches_is_assignment_allowed(db_session: AsyncSession):
+    rng = random.Random(7)
+
+    # Два дерева глубины 2: корень, по два прямых подпроекта и по одному внуку у каждого
+    parents = {}
+    for root_index in range(2):
+        root = ProjectORM(name=f"Root {root_index}")
+        db_session.add(root)
+        await db_session.flush()
+        parents[root.id] = None
+        for child_index in range(2):
+            child = ProjectORM(name=f"Child {root_index}.{child_index}", parent_id=root.id)
+            db_session.add(child)
+            await db_session.flush()
+            grandchild = ProjectORM(name=f"Grandchild {root_index}.{child_index}", parent_id=child.id)
+            db_session.add(grandchild)
+            await db_session.flush()
+            parents[child.id] = root.id
+            parents[grandchild.id] = child.id
+    await db_session.commit()
+
+    def root_of(project_id):
+        while parents[project_id] is not None:
+            project_id = parents[project_id]
+        return project_id
+
+    projects = {project.id: project for project in (await db_session.execute(
+        ProjectORM.__table__.select())).all()}
+
+    for rank in ["1", "2", "3", "4", "5"]:
+        for _ in range(15):
+            employee = EmployeeORM(name="Employee", rank=rank)
+            db_session.add(employee)
+            await db_session.flush()
+            assigned = rng.sample(sorted(parents), rng.randint(0, 4))
+            if assigned:
+                await db_session.execute(insert(EmployeeProjectAssignmentORM.__table__),
+                                         [{"employee_id": employee.id, "project_id": p} for p in assigned])
+            await db_session.commit()
+
+            profile = AssignmentProfile()
+            for project_id in assigned:
+                profile.add(project_id, parents[project_id], root_of(project_id))
+
+            for project_id in sorted(set(parents) - set(assigned)):
+                project = await db_session.get(ProjectORM, project_id)
+                expected = await is_assignment_allowed(db_session, employee, project)
+                actual = check_assignment(rank, profile, parents[project_id], root_of(project_id))
+                assert actual == expected, (rank, assigned, project_id)
+
+
+def test_forest_resolves_roots_and_ignores_cycles():
+    forest = Forest({1: None, 2: 1, 3: 2, 4: 3, 5: 6, 6: 5, 7: 99})
+    assert [forest.root_of(project_id) for project_id in (1, 2, 3, 4)] == [1, 1, 1, 1]
+    assert forest.root_of(5) is None and forest.root_of(6) is None
+    assert forest.root_of(7) is None
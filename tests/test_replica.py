@@ -0,0 +1,62 @@
+import tempfile
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.main import create_app
+from app.models import Base
+from app.settings import Settings
+
+
+@pytest.fixture
+def database_files():
+    """
+    Основная база и реплика - два разных файла SQLite, поэтому запись в основную
+    не видна при чтении с реплики.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        yield f"sqlite+aiosqlite:///{temp_dir}/primary.db", f"sqlite+aiosqlite:///{temp_dir}/replica.db"
+
+
+async def start_app(database_files, **env):
+    for url in database_files:
+        engine = create_async_engine(url)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await engine.dispose()
+
+    primary_url, replica_url = database_files
+    return create_app(Settings.from_env({"DATABASE_URL": primary_url, "DATABASE_REPLICA_URL": replica_url, **env}))
+
+
+async def test_reads_go_to_replica(database_files):
+    app = await start_app(database_files)
+    async with app.router.lifespan_context(app):
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://127.0.0.1:8000/api") as writer:
+            response = await writer.post("/employees/", json={"name": "John Doe", "rank": "1"})
+            assert response.status_code == 200
+            employee_id = response.json()["id"]
+            assert "last_write_at" in response.cookies
+
+            # Клиент, который только что записал, читает с основной базы и видит свою запись
+            response = await writer.get(f"/employees/{employee_id}")
+            assert response.status_code == 200
+
+        # Другой клиент читает с реплики, куда запись еще не доехала
+        async with AsyncClient(transport=transport, base_url="http://127.0.0.1:8000/api") as reader:
+            response = await reader.get(f"/employees/{employee_id}")
+            assert response.status_code == 404
+
+
+async def test_read_your_writes_window_disabled(database_files):
+    app = await start_app(database_files, READ_YOUR_WRITES_SECONDS="0")
+    async with app.router.lifespan_context(app):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://127.0.0.1:8000/api") as client:
+            response = await client.post("/projects/", json={"name": "Project"})
+            assert response.status_code == 200
+            assert "last_write_at" not in response.cookies
+
+            response = await client.get(f"/projects/{response.json()['id']}")
+            assert response.status_code == 404
@@ -0,0 +1,59 @@
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import ProjectORM, EmployeeORM
+
+
+async def test_employee_search_ranked_paginated_and_synced(client: AsyncClient, db_session: AsyncSession):
+    db_session.add_all([
+        EmployeeORM(name="Ivan Petrov", rank="1"),
+        EmployeeORM(name="Petr Petrovich Petrov", rank="2"),
+        EmployeeORM(name="John Smith", rank="3"),
+    ])
+    await db_session.commit()
+    response = await client.post("/employees/", json={"name": "Anna Petrova", "rank": "4"})
+    created_id = response.json()["id"]
+
+    response = await client.get("/employees/search", params={"q": "petr"})
+    assert response.status_code == 200
+    page = response.json()
+    names = [item["name"] for item in page["items"]]
+    assert sorted(names) == ["Anna Petrova", "Ivan Petrov", "Petr Petrovich Petrov"]
+    # Больше совпадений в имени - выше в выдаче
+    assert names[0] == "Petr Petrovich Petrov"
+    assert page["next_offset"] is None
+
+    response = await client.get("/employees/search", params={"q": "petr", "limit": 2})
+    first_page = response.json()
+    assert len(first_page["items"]) == 2
+    response = await client.get("/employees/search",
+                                params={"q": "petr", "limit": 2, "offset": first_page["next_offset"]})
+    second_page = response.json()
+    assert [item["name"] for item in first_page["items"] + second_page["items"]] == names
+    assert second_page["next_offset"] is None
+
+    # Индекс следует за изменениями имени и удалением
+    await client.put(f"/employees/{created_id}", json={"name": "Anna Ivanova", "rank": "4"})
+    response = await client.get("/employees/search", params={"q": "ivanov"})
+    assert [item["id"] for item in response.json()["items"]] == [created_id]
+    await client.delete(f"/employees/{created_id}")
+    response = await client.get("/employees/search", params={"q": "ivanov"})
+    assert response.json()["items"] == []
+
+
+async def test_project_search_short_and_special_queries(client: AsyncClient, db_session: AsyncSession):
+    db_session.add_all([ProjectORM(name="Data platform"), ProjectORM(name="100% uptime"), ProjectORM(name="QA")])
+    await db_session.commit()
+
+    response = await client.get("/projects/search", params={"q": "qa"})
+    assert [item["name"] for item in response.json()["items"]] == ["QA"]
+
+    response = await client.get("/projects/search", params={"q": "0% u"})
+    assert [item["name"] for item in response.json()["items"]] == ["100% uptime"]
+
+    response = await client.get("/projects/search", params={"q": '"or'})
+    assert response.status_code == 200
+    assert response.json()["items"] == []
+
+    response = await client.get("/projects/search", params={"q": ""})
+    assert response.status_code == 422
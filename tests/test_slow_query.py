@@ -0,0 +1,64 @@
+import logging
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import EmployeeORM
+from app.utils.slow_query import SlowQueryLogger
+
+
+@pytest.fixture
+def slow_query_log(db_session: AsyncSession, caplog):
+    # Нулевой порог: в лог попадает каждый запрос
+    slow_query_logger = SlowQueryLogger(threshold_ms=0, redact_params=True)
+    slow_query_logger.install(db_session.bind)
+    caplog.set_level(logging.WARNING, logger="app.slow_query")
+    yield caplog
+    slow_query_logger.uninstall(db_session.bind)
+
+
+async def test_slow_query_logged_with_route_and_plan(client: AsyncClient, db_session: AsyncSession, slow_query_log):
+    employee = EmployeeORM(name="John Doe", rank="1")
+    db_session.add(employee)
+    await db_session.commit()
+    slow_query_log.clear()
+
+    response = await client.get(f"/employees/{employee.id}")
+    assert response.status_code == 200
+
+    messages = [record.getMessage() for record in slow_query_log.records]
+    employee_queries = [message for message in messages if "FROM employees" in message]
+    assert employee_queries
+    message = employee_queries[0]
+    assert "route=GET /api/employees/{employee_id}" in message
+    assert "plan:" in message and "employees" in message.split("plan:")[1]
+    # Параметры скрыты, но их количество сохранено
+    assert "parameters: ['?']" in message
+
+
+async def test_fast_query_not_logged(client: AsyncClient, db_session: AsyncSession, caplog):
+    slow_query_logger = SlowQueryLogger(threshold_ms=60_000)
+    slow_query_logger.install(db_session.bind)
+    caplog.set_level(logging.WARNING, logger="app.slow_query")
+    try:
+        response = await client.get("/employees/")
+        assert response.status_code == 200
+    finally:
+        slow_query_logger.uninstall(db_session.bind)
+
+    assert not [record for record in caplog.records if record.name == "app.slow_query"]
+
+
+async def test_failed_statement_leaves_no_state_on_connection(db_session: AsyncSession, slow_query_log):
+    connection = await db_session.connection()
+    with pytest.raises(DBAPIError):
+        await connection.execute(text("SELECT * FROM missing_table"))
+    await db_session.rollback()
+
+    connection = await db_session.connection()
+    await connection.execute(text("SELECT 1"))
+    assert not [key for key in connection.info if key.startswith("slow_query")]
+    assert any("SELECT 1" in record.getMessage() for record in slow_query_log.records)
@@ -0,0 +1,88 @@
+import gzip
+import json
+import tempfile
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.main import create_app
+from app.models import Base, ProjectORM, EmployeeORM, EmployeeProjectAssignmentORM
+from app.services.snapshot_service import SnapshotError, SnapshotService
+from app.settings import Settings
+
+
+async def create_database(path):
+    database_url = f"sqlite+aiosqlite:///{path}"
+    engine = create_async_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await engine.dispose()
+    return database_url
+
+
+@pytest.fixture
+async def source_app():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        database_url = await create_database(f"{temp_dir}/source.db")
+        app = create_app(Settings.from_env({"DATABASE_URL": database_url}))
+        async with app.router.lifespan_context(app):
+            yield app
+
+
+async def chunks_of(data: bytes, size: int = 7):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def test_export_and_restore_round_trip(source_app):
+    async with source_app.state.database.session_factory() as db:
+        # Родитель с большим id, чем у подпроекта: восстановление не должно зависеть от порядка id
+        await db.execute(insert(ProjectORM.__table__), [
+            {"id": 1, "name": "Child", "parent_id": None},
+            {"id": 2, "name": "Parent", "parent_id": None},
+        ])
+        await db.execute(ProjectORM.__table__.update().where(ProjectORM.id == 1).values(parent_id=2))
+        await db.execute(insert(EmployeeORM.__table__), [
+            {"id": i, "name": f"Employee \"{i}\"", "rank": str(i % 4 + 1)} for i in range(1, 8)
+        ])
+        await db.execute(insert(EmployeeProjectAssignmentORM.__table__), [
+            {"employee_id": i, "project_id": 1 + i % 2} for i in range(1, 8)
+        ])
+        await db.commit()
+
+    async with AsyncClient(transport=ASGITransport(app=source_app), base_url="http://test/api") as client:
+        response = await client.get("/snapshot")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/gzip"
+    snapshot = response.content
+
+    lines = [json.loads(line) for line in gzip.decompress(snapshot).splitlines()]
+    assert lines[1] == {"table": "projects", "columns": ["id", "name", "parent_id", "version"]}
+    assert lines[2:4] == [[2, "Parent", None, 1], [1, "Child", 2, 1]]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        target_url = await create_database(f"{temp_dir}/target.db")
+        target_app = create_app(Settings.from_env({"DATABASE_URL": target_url}))
+        async with target_app.router.lifespan_context(target_app):
+            database = target_app.state.database
+            async with database.session_factory() as db:
+                db.add(EmployeeORM(name="Stale", rank="1"))
+                await db.commit()
+
+            restored = await SnapshotService(database, batch_size=3).restore(chunks_of(snapshot))
+            assert restored == {"projects": 2, "employees": 7, "employee_project_assignments": 7}
+
+            async with database.session_factory() as db:
+                result = await db.execute(select(EmployeeORM.name).order_by(EmployeeORM.id))
+                assert result.scalars().all() == [f"Employee \"{i}\"" for i in range(1, 8)]
+                result = await db.execute(select(ProjectORM.parent_id).where(ProjectORM.id == 1))
+                assert result.scalar_one() == 2
+
+            # Обрезанный снимок не применяется, прежние данные остаются
+            with pytest.raises(SnapshotError):
+                await SnapshotService(database).restore(chunks_of(snapshot[:len(snapshot) // 2]))
+            async with database.session_factory() as db:
+                result = await db.execute(select(EmployeeORM.id))
+                assert len(result.scalars().all()) == 7
@@ -0,0 +1,72 @@
+import asyncio
+import json
+import tempfile
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.main import create_app
+from app.models import Base
+from app.services.change_stream import sse_frames
+from app.settings import Settings
+from app.utils.broadcast import Broadcaster
+
+
+async def test_slow_subscriber_is_dropped():
+    broadcaster = Broadcaster(buffer_size=2)
+    slow = broadcaster.subscribe()
+    fast = broadcaster.subscribe()
+
+    for i in range(3):
+        broadcaster.publish({"n": i})
+        await fast.get(timeout=1)
+
+    assert slow.dropped and not fast.dropped
+    assert broadcaster.subscribers == {fast}
+    assert broadcaster.dropped_total == 1
+
+
+def parse_frame(frame: str) -> dict:
+    fields = dict(line.split(": ", 1) for line in frame.strip().splitlines())
+    return {"event": fields["event"], "data": json.loads(fields["data"])}
+
+
+@pytest.fixture
+async def stream_app():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        database_url = f"sqlite+aiosqlite:///{temp_dir}/test.db"
+        engine = create_async_engine(database_url)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await engine.dispose()
+
+        app = create_app(Settings.from_env({"DATABASE_URL": database_url, "STREAM_POLL_INTERVAL_SECONDS": "0.01"}))
+        async with app.router.lifespan_context(app):
+            yield app
+
+
+async def test_stream_delivers_project_and_assignment_changes(stream_app):
+    async with AsyncClient(transport=ASGITransport(app=stream_app), base_url="http://test/api") as client:
+        # Изменения до подключения в поток не попадают
+        await client.post("/projects/", json={"name": "Before"})
+
+        stream = stream_app.state.change_stream
+        subscription, cursors = await stream.subscribe()
+        frames = sse_frames(stream, subscription, cursors, heartbeat_seconds=5)
+        ready = parse_frame(await anext(frames))
+        assert ready == {"event": "ready", "data": {"project_cursor": 1, "assignment_cursor": 0}}
+
+        project = (await client.post("/projects/", json={"name": "After"})).json()
+        employee = (await client.post("/employees/", json={"name": "John Doe", "rank": "1"})).json()
+        await client.post("/add-employee-to-project", json={"employee_id": employee["id"], "project_id": project["id"]})
+
+        received = [parse_frame(await asyncio.wait_for(anext(frames), 5)) for _ in range(2)]
+        await frames.aclose()
+
+    assert received[0]["event"] == "project"
+    assert received[0]["data"]["project_id"] == project["id"]
+    assert received[0]["data"]["action"] == "created"
+    assert received[1]["event"] == "assignment"
+    assert received[1]["data"]["employee_id"] == employee["id"]
+    assert not stream.broadcaster.subscribers